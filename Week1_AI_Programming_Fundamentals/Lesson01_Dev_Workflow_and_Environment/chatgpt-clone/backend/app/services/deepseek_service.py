@@ -17,7 +17,8 @@ class DeepSeekService:
         
         self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url="https://api.deepseek.com"
+            # 压测时可通过 DEEPSEEK_BASE_URL 指向本地模拟服务（如 http://127.0.0.1:9000）
+            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
         )
         self.model = "deepseek-chat"  # 固定使用 deepseek-chat
     
@@ -0,0 +1,172 @@
+"""
+管理 API 路由（查询日志、索引顾问与批量导入）
+
+这些接口会读写数据库、回放查询负载，耗时较长，定义为同步函数由 FastAPI 放到线程池执行，
+不占用 Agent 工具线程池。
+"""
+import asyncio
+import gzip
+import io
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.core.agent import get_agent_runtime
+from app.core.index_advisor import get_index_advisor
+from app.db.connection import get_sql_database
+from app.db.ingest import FORMATS, MODE_APPEND, MODES, IngestError, ingest_stream
+from app.db.query_log import query_log
+from app.schemas.admin import ApplyIndexesRequest, IndexAdvisorRequest
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/query-log")
+def get_query_log(limit: int = 20):
+    """
+    获取已执行查询日志统计
+    
+    Args:
+        limit: 返回总耗时最高的多少条查询
+    
+    Returns:
+        日志统计与按查询指纹汇总的负载
+    """
+    return {**query_log.stats(), "workload": query_log.workload(limit)}
+
+
+@router.delete("/query-log")
+def clear_query_log():
+    """
+    清空查询日志
+    
+    Returns:
+        清空后的日志统计
+    """
+    query_log.clear()
+    return query_log.stats()
+
+
+@router.post("/index-advisor")
+def run_index_advisor(request: IndexAdvisorRequest = IndexAdvisorRequest()):
+    """
+    分析查询负载，在数据库临时副本上回放验证候选索引
+    
+    Args:
+        request: top_queries 为分析的查询数；apply 为 true 时直接应用推荐的索引
+    
+    Returns:
+        候选索引及其加速比例、建索引耗时、是否推荐；apply 时附带应用结果
+    """
+    advisor = get_index_advisor()
+    top_queries = request.top_queries or get_settings().index_advisor_top_queries
+    report = advisor.analyze(top_queries)
+    if request.apply and report.recommended:
+        report.applied = advisor.apply([(c.table, c.columns) for c in report.recommended])
+    return report.to_dict()
+
+
+@router.post("/indexes")
+def apply_indexes(request: ApplyIndexesRequest):
+    """
+    在正式数据库上创建索引（通常为索引顾问推荐并经人工确认的索引）
+    
+    Args:
+        request: 要创建的索引（表名与列名会与实际表结构核对）
+    
+    Returns:
+        每个索引的创建结果
+    """
+    advisor = get_index_advisor()
+    return advisor.apply([(spec.table, spec.columns) for spec in request.indexes])
+
+
+class _RequestBodyReader(io.RawIOBase):
+    """
+    把异步请求体包装成同步二进制流，供线程池中的导入逻辑顺序读取
+    
+    每次读取时才从事件循环取下一块数据，上传速度受导入速度约束，内存中只保留一块。
+    """
+    
+    def __init__(self, request: Request, loop: asyncio.AbstractEventLoop):
+        self._chunks = request.stream().__aiter__()
+        self._loop = loop
+        self._pending = memoryview(b"")
+        self.bytes_read = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            future = asyncio.run_coroutine_threadsafe(self._chunks.__anext__(), self._loop)
+            try:
+                self._pending = memoryview(future.result())
+            except StopAsyncIteration:
+                return 0
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        self.bytes_read += n
+        return n
+
+
+@router.post("/ingest")
+async def ingest_upload(
+    request: Request,
+    table: str = Query(..., min_length=1, description="目标表名"),
+    format: str = Query("csv", description="csv / jsonl"),
+    mode: str = Query(MODE_APPEND, description="append / replace / create"),
+    index: list[str] = Query(default=[], description="导入后创建的索引，逗号分隔的列名，可重复"),
+    delimiter: Optional[str] = Query(None, max_length=1, description="CSV 分隔符，为空则自动推测"),
+):
+    """
+    把请求体中的 CSV / JSONL 数据流式导入数据库
+    
+    请求体直接为文件内容（支持 Content-Encoding: gzip），边接收边写入，不在内存或磁盘中缓存整个文件。
+    
+    Args:
+        request: 请求（请求体为文件内容）
+        table: 目标表名
+        format: 文件格式
+        mode: 导入模式
+        index: 导入后创建的索引
+        delimiter: CSV 分隔符
+    
+    Returns:
+        导入结果（行数、跳过行数、各阶段耗时等）
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的文件格式: {format}")
+    if mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的导入模式: {mode}")
+    
+    body = _RequestBodyReader(request, asyncio.get_running_loop())
+    stream = io.BufferedReader(body, 1 << 20)
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        stream = gzip.GzipFile(fileobj=stream)
+    content_length = request.headers.get("content-length")
+    indexes = [[c.strip() for c in spec.split(",") if c.strip()] for spec in index]
+    
+    try:
+        result = await run_in_threadpool(
+            ingest_stream,
+            stream,
+            table,
+            format,
+            mode=mode,
+            indexes=[cols for cols in indexes if cols],
+            delimiter=delimiter,
+            total_bytes=int(content_length) if content_length and content_length.isdigit() else None,
+            bytes_read=lambda: body.bytes_read,
+        )
+    except (IngestError, UnicodeDecodeError, gzip.BadGzipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if result.created:
+        # 新表需要重新构建数据库工具与 Agent 运行时才能被 Agent 看到
+        get_sql_database.cache_clear()
+        get_agent_runtime.cache_clear()
+    return result.to_dict()
@@ -1,38 +1,91 @@
 """
 聊天 API 路由 - SSE 流式响应
 """
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+import time
+
+from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
 
+from app.config import get_settings
 from app.core.agent import run_sql_agent
-from app.db.session_store import session_store
-from app.schemas.chat import ChatRequest
+from app.core.deadline import Deadline
+from app.core.memory import memory_manager
+from app.core.metrics import RequestTrace, agent_metrics, current_trace
+from app.core.query_cache import plan_cache
+from app.core.sse import SSEEncoder
+from app.db.session_store import async_session_store
+from app.schemas.chat import ChatRequest, SSEEventType
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-async def event_generator(session_id: str, message: str):
+async def _watch_disconnect(request: Request, deadline: Deadline):
+    """等待客户端断开，断开时取消请求（停止 LLM 调用并中断正在执行的 SQL）"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            deadline.cancel()
+            return
+
+
+async def event_generator(
+    request: Request,
+    session_id: str,
+    message: str,
+    trace: RequestTrace,
+    wire_format: str = "rows"
+):
     """
     SSE 事件生成器
     
+    请求持有一个截止时间：超时由 Agent 自行结束并返回错误事件；
+    客户端断开时立即取消，不再继续消耗 LLM 配额与数据库资源。
+    序列化与写出每个事件的耗时计入 sse 阶段，DONE 事件附带本次请求的耗时分解。
+    
     Args:
+        request: 请求（用于监听客户端断开）
         session_id: 会话 ID
         message: 用户消息
+        trace: 请求耗时分解
+        wire_format: 查询结果的线上编码
     
     Yields:
-        SSE 格式的事件字符串
+        SSE 格式的事件（UTF-8 字节）
     """
-    async for event in run_sql_agent(session_id, message):
-        yield event.to_sse()
+    current_trace.set(trace)
+    agent_metrics.stream_started()
+    settings = get_settings()
+    encoder = SSEEncoder(
+        event_ids=settings.sse_event_ids,
+        retry_ms=settings.sse_retry_ms or None,
+    )
+    deadline = Deadline(settings.agent_request_timeout_seconds)
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+    events = run_sql_agent(session_id, message, deadline, trace, wire_format)
+    try:
+        async for event in events:
+            if event.event == SSEEventType.DONE and isinstance(event.data, dict):
+                event.data["timings"] = trace.summary()
+            start = time.perf_counter()
+            yield encoder.encode(event.event, event.data)
+            trace.add("sse", (time.perf_counter() - start) * 1000)
+    finally:
+        # 提前结束（响应被取消或写入失败）时关闭 Agent，由其中断仍在执行的工具
+        watcher.cancel()
+        await events.aclose()
+        agent_metrics.stream_finished()
+        agent_metrics.record_trace(trace)
 
 
 @router.post("")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     聊天接口 - 流式返回 AI 响应
     
     Args:
-        request: 聊天请求（session_id, message）
+        request: 聊天请求（session_id, message, wire_format）
+        http_request: 原始请求（用于检测客户端断开）
     
     Returns:
         SSE 流式响应
@@ -41,13 +94,16 @@ async def chat(request: ChatRequest):
     - thinking: AI 思考过程
     - text: 文本内容
     - sql: 生成的 SQL
-    - data: 查询结果数据
-    - chart: 图表配置
+    - data: 查询结果数据（columnar / msgpack 编码时为列数组与字典，见 app.core.wire）
+    - chart: 图表配置（columnar / msgpack 编码时只引用数据事件的 id 与列下标）
     - error: 错误信息
-    - done: 完成标记
+    - done: 完成标记（含本次请求的计划缓存命中情况、LLM 迭代次数、估算的输入 token 数与耗时分解 timings）
     """
+    trace = RequestTrace()
+    current_trace.set(trace)
+    
     # 验证会话是否存在
-    session = session_store.get_session(request.session_id)
+    session = await async_session_store.get_session(request.session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -55,7 +111,7 @@ async def chat(request: ChatRequest):
         )
     
     return StreamingResponse(
-        event_generator(request.session_id, request.message),
+        event_generator(http_request, request.session_id, request.message, trace, request.wire_format),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -65,6 +121,52 @@ async def chat(request: ChatRequest):
     )
 
 
+@router.get("/plan-cache")
+async def get_plan_cache_stats():
+    """
+    获取问题 -> SQL 计划缓存统计
+    
+    Returns:
+        条目数、命中率、累计节省的 LLM 耗时等
+    """
+    return plan_cache.stats()
+
+
+@router.delete("/plan-cache")
+async def clear_plan_cache():
+    """
+    清空计划缓存
+    
+    Returns:
+        清空后的缓存统计
+    """
+    plan_cache.clear()
+    return plan_cache.stats()
+
+
+@router.get("/metrics")
+async def get_agent_metrics():
+    """
+    获取 Agent 运行指标
+    
+    Returns:
+        按提示模式（discovery / schema）统计的问题数、平均迭代次数与平均工具调用次数
+        （Prometheus 文本格式见 /metrics）
+    """
+    return agent_metrics.snapshot()
+
+
+@router.get("/memory-cache")
+async def get_memory_cache_stats():
+    """
+    获取会话记忆缓存统计
+    
+    Returns:
+        缓存会话数、占用字节、命中率、淘汰与过期次数
+    """
+    return memory_manager.stats()
+
+
 @router.get("/test")
 async def test_chat():
     """
@@ -1,45 +1,61 @@
 """
 数据库信息 API 路由
 """
-from fastapi import APIRouter
+from typing import Any
 
-from app.db.connection import get_database_schema, get_sql_database
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+
+from app.core.agent import get_agent_runtime
+from app.core.query_cache import query_cache
+from app.db.catalog import schema_catalog
 from app.schemas.chat import DatabaseSchema
 
 router = APIRouter(prefix="/database", tags=["database"])
 
 
+def _conditional_response(request: Request, content: Any, etag: str) -> Response:
+    """
+    带 ETag 的条件响应：If-None-Match 匹配时返回 304，不重复传输内容
+    
+    Args:
+        request: 请求
+        content: 响应内容
+        etag: 当前内容的 ETag
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
+
 @router.get("/schema", response_model=DatabaseSchema)
-async def get_schema():
+def get_schema(request: Request):
     """
     获取数据库结构信息
     
     Returns:
-        数据库表结构
+        数据库表结构（支持 ETag / 304）
     """
-    schema = get_database_schema()
-    return schema
+    schema, etag = schema_catalog.get_schema()
+    return _conditional_response(request, schema, etag)
 
 
 @router.get("/tables")
-async def list_tables():
+def list_tables(request: Request):
     """
     获取数据库表列表
     
     Returns:
-        表名列表
+        表名列表（支持 ETag / 304）
     """
-    db = get_sql_database()
-    tables = db.get_usable_table_names()
-    
-    # 过滤内部表
-    public_tables = [t for t in tables if not t.startswith("chat_")]
-    
-    return {"tables": public_tables}
+    tables, etag = schema_catalog.get_table_names()
+    return _conditional_response(request, {"tables": tables}, etag)
 
 
 @router.get("/tables/{table_name}")
-async def get_table_info(table_name: str):
+def get_table_info(table_name: str, request: Request):
     """
     获取指定表的详细信息
     
@@ -47,18 +63,51 @@ async def get_table_info(table_name: str):
         table_name: 表名
     
     Returns:
-        表结构和示例数据
+        表结构和示例数据（支持 ETag / 304）
     """
-    db = get_sql_database()
+    result = schema_catalog.get_table(table_name)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Table {table_name} not found"
+        )
     
-    # 获取表结构
-    table_info = db.get_table_info([table_name])
+    detail, etag = result
+    return _conditional_response(request, detail, etag)
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    获取查询结果缓存统计
     
-    # 获取示例数据
-    sample_data = db.run(f"SELECT * FROM {table_name} LIMIT 5")
+    Returns:
+        条目数、占用字节、命中率、淘汰与失效次数
+    """
+    return query_cache.stats()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """
+    清空查询结果缓存
+    
+    Returns:
+        清空后的缓存统计
+    """
+    query_cache.clear()
+    return query_cache.stats()
+
+
+@router.get("/cost-guard")
+async def get_cost_guard_stats():
+    """
+    获取执行前成本检查统计
     
-    return {
-        "name": table_name,
-        "schema": table_info,
-        "sample_data": sample_data
-    }
+    Returns:
+        扫描行数上限、检查 / 拒绝 / 自动加 LIMIT 次数；未启用时 enabled 为 false
+    """
+    cost_guard = get_agent_runtime().executor.cost_guard
+    if cost_guard is None:
+        return {"enabled": False}
+    return {"enabled": True, **cost_guard.stats()}
@@ -1,28 +1,40 @@
 """
 会话管理 API 路由
 """
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, status
 
-from app.db.session_store import session_store
-from app.schemas.session import Session, SessionCreate, SessionUpdate, SessionWithMessages
+from app.core.memory import memory_manager
+from app.db.session_store import async_session_store
+from app.schemas.session import (
+    MessagePage,
+    Session,
+    SessionCreate,
+    SessionPage,
+    SessionUpdate,
+    SessionWithMessages,
+)
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
 
-@router.get("", response_model=list[Session])
-async def list_sessions(limit: int = 50, offset: int = 0):
+@router.get("", response_model=SessionPage)
+async def list_sessions(limit: int = 50, cursor: Optional[str] = None):
     """
-    获取会话列表
+    获取会话列表（按最近更新倒序，游标分页）
     
     Args:
-        limit: 返回数量限制（默认 50）
-        offset: 偏移量
+        limit: 每页数量（默认 50）
+        cursor: 上一页返回的 next_cursor / prev_cursor
     
     Returns:
-        会话列表
+        会话分页结果
     """
-    sessions = session_store.list_sessions(limit=limit, offset=offset)
-    return sessions
+    try:
+        return await async_session_store.list_sessions_page(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.post("", response_model=Session, status_code=status.HTTP_201_CREATED)
@@ -37,7 +49,7 @@ async def create_session(request: SessionCreate = None):
         新创建的会话
     """
     title = request.title if request else None
-    session = session_store.create_session(title=title)
+    session = await async_session_store.create_session(title=title)
     return session
 
 
@@ -52,7 +64,7 @@ async def get_session(session_id: str):
     Returns:
         会话详情
     """
-    session = session_store.get_session(session_id)
+    session = await async_session_store.get_session(session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -60,7 +72,7 @@ async def get_session(session_id: str):
         )
     
     # 获取消息
-    messages = session_store.get_messages(session_id)
+    messages = await async_session_store.get_messages(session_id)
     session["messages"] = messages
     
     return session
@@ -78,14 +90,14 @@ async def update_session(session_id: str, request: SessionUpdate):
     Returns:
         更新后的会话
     """
-    success = session_store.update_session(session_id, request.title)
+    success = await async_session_store.update_session(session_id, request.title)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Session {session_id} not found"
         )
     
-    session = session_store.get_session(session_id)
+    session = await async_session_store.get_session(session_id)
     return session
 
 
@@ -100,7 +112,8 @@ async def delete_session(session_id: str):
     Returns:
         无内容 (204 No Content)
     """
-    success = session_store.delete_session(session_id)
+    success = await async_session_store.delete_session(session_id)
+    memory_manager.clear_memory(session_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -110,24 +123,35 @@ async def delete_session(session_id: str):
     return None
 
 
-@router.get("/{session_id}/messages")
-async def get_session_messages(session_id: str, limit: int = 100):
+@router.get("/{session_id}/messages", response_model=MessagePage)
+async def get_session_messages(
+    session_id: str,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    tail: bool = False
+):
     """
-    获取会话消息列表
+    获取会话消息列表（按时间正序，游标分页）
     
     Args:
         session_id: 会话 ID
-        limit: 返回数量限制
+        limit: 每页数量
+        cursor: 上一页返回的 next_cursor / prev_cursor
+        tail: 无游标时从最新消息开始，配合 prev_cursor 向前懒加载
     
     Returns:
-        消息列表
+        消息分页结果
     """
-    session = session_store.get_session(session_id)
+    session = await async_session_store.get_session(session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Session {session_id} not found"
         )
     
-    messages = session_store.get_messages(session_id, limit=limit)
-    return messages
+    try:
+        return await async_session_store.get_messages_page(
+            session_id, limit=limit, cursor=cursor, from_tail=tail
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
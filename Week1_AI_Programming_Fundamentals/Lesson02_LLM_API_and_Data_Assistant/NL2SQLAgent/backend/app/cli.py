@@ -0,0 +1,194 @@
+"""
+命令行管理工具
+
+用法：
+    python -m app.cli query-log [--limit N]
+    python -m app.cli index-advisor [--top N] [--apply] [--json]
+    python -m app.cli ingest FILE [--table NAME] [--format csv|jsonl] [--mode append|replace|create]
+                             [--index COL[,COL...]] [--delimiter C] [--batch-rows N] [--json]
+    python -m app.cli generate-data [--scale 10k|1m|50m|N] [--seed N] [--db PATH] [--json]
+"""
+import argparse
+import json
+import sys
+
+from app.config import get_settings
+
+
+def _print_json(data):
+    print(json.dumps(data, ensure_ascii=False, indent=2, default=str))
+
+
+def cmd_query_log(args: argparse.Namespace) -> int:
+    """查看查询日志中总耗时最高的查询"""
+    from app.db.query_log import query_log
+
+    stats = query_log.stats()
+    workload = query_log.workload(args.limit)
+    if args.json:
+        _print_json({**stats, "workload": workload})
+        return 0
+
+    print(f"已记录 {stats['executions']} 次执行，{stats['queries']} 条不同查询，失败 {stats['errors']} 次")
+    print(f"\n{'次数':>6}{'平均 (ms)':>12}{'总计 (ms)':>12}  SQL")
+    print("-" * 80)
+    for row in workload:
+        sql = " ".join(row["sql"].split())
+        print(f"{row['executions']:>6}{row['avg_ms']:>12.2f}{row['total_ms']:>12.1f}  {sql[:120]}")
+    return 0
+
+
+def cmd_index_advisor(args: argparse.Namespace) -> int:
+    """分析查询负载并推荐索引"""
+    from app.core.index_advisor import get_index_advisor
+
+    advisor = get_index_advisor()
+    top = args.top or get_settings().index_advisor_top_queries
+    report = advisor.analyze(top)
+    if args.apply and report.recommended:
+        report.applied = advisor.apply([(c.table, c.columns) for c in report.recommended])
+
+    if args.json:
+        _print_json(report.to_dict())
+        return 0
+
+    print(f"分析 {report.queries} 条查询（{report.executions} 次执行），"
+          f"跳过 {report.skipped} 条，耗时 {report.elapsed_ms / 1000:.1f} 秒")
+    if not report.candidates:
+        print("没有可用的候选索引")
+        return 0
+
+    print(f"\n{'推荐':<6}{'加速':>8}{'基线 (ms)':>12}{'建索引后':>12}{'建索引 (ms)':>14}  索引")
+    print("-" * 90)
+    for c in report.candidates:
+        mark = "是" if c.recommended else ("-" if c.used else "未使用")
+        print(f"{mark:<6}{c.improvement:>8.0%}{c.baseline_ms:>12.1f}{c.indexed_ms:>12.1f}"
+              f"{c.build_ms:>14.1f}  {c.table}({', '.join(c.columns)})")
+
+    if report.recommended and not args.apply:
+        print("\n推荐的索引（使用 --apply 应用）：")
+        for c in report.recommended:
+            print(f"  {c.ddl};")
+    for item in report.applied:
+        status = f"已创建（{item['build_ms']} ms）" if item["created"] else f"失败：{item.get('error')}"
+        print(f"  {item['table']}({', '.join(item['columns'])}) {status}")
+    return 0
+
+
+def cmd_ingest(args: argparse.Namespace) -> int:
+    """把 CSV / JSONL 文件流式导入数据库"""
+    from app.db.ingest import BulkLoader, IngestError, IngestProgress, get_bulk_loader, ingest_file
+
+    loader = get_bulk_loader()
+    if args.batch_rows:
+        loader = BulkLoader(loader.db_path, batch_rows=args.batch_rows)
+    indexes = [[c.strip() for c in spec.split(",") if c.strip()] for spec in args.index]
+
+    def show(state: IngestProgress):
+        if args.json:
+            return
+        percent = f"{state.percent:5.1f}% " if state.percent is not None else ""
+        print(f"\r[{state.phase}] {percent}{state.rows:,} 行，{state.rows_per_second:,.0f} 行/秒，"
+              f"跳过 {state.skipped:,} 行", end="", file=sys.stderr, flush=True)
+
+    try:
+        result = ingest_file(
+            args.path,
+            table=args.table,
+            fmt=args.format,
+            mode=args.mode,
+            indexes=[cols for cols in indexes if cols],
+            delimiter=args.delimiter,
+            progress=show,
+            loader=loader,
+        )
+    except (IngestError, OSError) as e:
+        if not args.json:
+            print(file=sys.stderr)
+        print(f"导入失败: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        _print_json(result.to_dict())
+        return 0
+
+    print(file=sys.stderr)
+    print(f"{'新建' if result.created else '写入'}表 {result.table}：{result.rows:,} 行"
+          f"（跳过 {result.skipped:,} 行），{result.batches} 个批次，总耗时 {result.elapsed_ms / 1000:.1f} 秒")
+    print(f"  写入 {result.load_ms / 1000:.1f} 秒，建索引 {result.index_ms / 1000:.1f} 秒，"
+          f"ANALYZE {result.analyze_ms / 1000:.1f} 秒")
+    print(f"  列：{', '.join(c['name'] + ' ' + c['type'] for c in result.columns)}")
+    if result.dropped_columns:
+        print(f"  已忽略表中不存在的列：{', '.join(result.dropped_columns)}")
+    for ddl in result.indexes:
+        print(f"  {ddl}")
+    return 0
+
+
+def cmd_generate_data(args: argparse.Namespace) -> int:
+    """生成合成数据集（sales / employees 及维度表）"""
+    from app.db.ingest import IngestProgress
+    from app.db.synthetic import generate_dataset, resolve_scale
+
+    try:
+        rows = resolve_scale(args.scale)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    def show(state: IngestProgress):
+        if not args.json:
+            print(f"\r[{state.phase}] sales {state.rows:,} / {rows:,} 行，{state.rows_per_second:,.0f} 行/秒",
+                  end="", file=sys.stderr, flush=True)
+
+    result = generate_dataset(args.db, rows, seed=args.seed, progress=show)
+    if args.json:
+        _print_json(result.to_dict())
+        return 0
+
+    print(file=sys.stderr)
+    print(f"已生成数据集（种子 {result.seed}）：{result.db_path}，耗时 {result.elapsed_ms / 1000:.1f} 秒")
+    for table, count in result.tables.items():
+        print(f"  {table:<12}{count:>14,} 行")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="NL2SQL 后端管理工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    log_parser = subparsers.add_parser("query-log", help="查看已执行查询日志")
+    log_parser.add_argument("--limit", type=int, default=20, help="显示总耗时最高的多少条查询")
+    log_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    log_parser.set_defaults(func=cmd_query_log)
+
+    advisor_parser = subparsers.add_parser("index-advisor", help="根据查询负载推荐索引（在临时副本上回放验证）")
+    advisor_parser.add_argument("--top", type=int, default=None, help="分析总耗时最高的多少条查询")
+    advisor_parser.add_argument("--apply", action="store_true", help="直接在数据库上创建推荐的索引")
+    advisor_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    advisor_parser.set_defaults(func=cmd_index_advisor)
+
+    ingest_parser = subparsers.add_parser("ingest", help="把 CSV / JSONL 文件流式导入数据库（支持 .gz）")
+    ingest_parser.add_argument("path", help="文件路径")
+    ingest_parser.add_argument("--table", default=None, help="目标表名，默认取文件名")
+    ingest_parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="文件格式，默认按扩展名判断")
+    ingest_parser.add_argument("--mode", choices=["append", "replace", "create"], default="append", help="导入模式")
+    ingest_parser.add_argument("--index", action="append", default=[], help="导入后创建的索引（逗号分隔的列名，可重复）")
+    ingest_parser.add_argument("--delimiter", default=None, help="CSV 分隔符，默认自动推测")
+    ingest_parser.add_argument("--batch-rows", type=int, default=None, help="每个事务写入的行数")
+    ingest_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    ingest_parser.set_defaults(func=cmd_ingest)
+
+    generate_parser = subparsers.add_parser("generate-data", help="生成确定性的合成数据集（会删除并重建同名表）")
+    generate_parser.add_argument("--scale", default="10k", help="sales 行数：10k / 1m / 50m 或任意行数（如 200k）")
+    generate_parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    generate_parser.add_argument("--db", default=None, help="数据库文件路径，默认为配置的数据库")
+    generate_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    generate_parser.set_defaults(func=cmd_generate_data)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,10 +21,78 @@ class Settings(BaseSettings):
     
     # 阿里云百炼 API 配置
     dashscope_api_key: str = ""
+    dashscope_base_url: str = ""            # API 地址，为空使用官方地址（压测时可指向本地模拟服务 http://127.0.0.1:9000/api/v1）
     
     # 数据库配置
     database_url: str = "sqlite:///./data/app.db"
     
+    # SQLite 连接池配置
+    db_pool_size: int = 8                   # 连接池最大连接数
+    db_pool_timeout: float = 10.0           # 获取连接的等待超时（秒）
+    db_cache_size_kb: int = 16384           # 每个连接的页缓存大小（KB）
+    db_mmap_size: int = 268435456           # 内存映射大小（字节）
+    db_checkpoint_interval: float = 60.0    # WAL 检查点间隔（秒），<= 0 表示关闭
+    
+    # Agent 配置
+    agent_schema_prompt: bool = True        # 在系统提示中预置表结构摘要，省去表结构发现的工具调用
+    agent_request_timeout_seconds: float = 120  # 单个聊天请求的截止时间（秒），0 表示不限时
+    agent_stream_tokens: bool = True        # 流式调用 LLM，文本 token 到达即推送（关闭则等待整轮响应）
+    agent_tool_workers: int = 4             # 工具调用线程池大小（同一步的多个工具调用并发执行）
+    agent_tool_queue_size: int = 4          # 工具产出桥接队列容量（流式结果的背压窗口）
+    agent_tool_stall_seconds: float = 30    # 工具产出等待客户端接收的最长秒数，超时后停止该工具、释放工作线程，0 表示不限
+    
+    # SSE 输出配置
+    sse_event_ids: bool = False             # 是否为每个事件输出递增的 id 字段
+    sse_retry_ms: int = 0                   # 输出 retry 字段告知客户端重连等待时间（毫秒），0 表示不输出
+    
+    # Agent SQL 查询配置
+    query_max_rows: int = 1000              # 单次查询最多返回的行数
+    query_preview_rows: int = 20            # 提供给 LLM 的结果预览行数
+    query_timeout_seconds: float = 30       # 单条查询（含取回结果）的超时秒数，超时后中断，0 表示不限时
+    query_stream_results: bool = True       # 是否以分块事件流式推送查询结果
+    query_stream_chunk_rows: int = 500      # 每个 data_chunk 事件的行数
+    query_stream_max_rows: int = 100000     # 流式推送的最大行数
+    query_stream_max_bytes: int = 8388608   # 流式推送的最大字节数（约 8MB，按抽样实测的每行字节数估算）
+    query_cost_guard: bool = True           # 执行前用 EXPLAIN QUERY PLAN 估算成本，拒绝过重查询、为大结果自动加 LIMIT
+    query_cost_max_rows: int = 20000000     # 估算扫描行数上限，超过则拒绝执行并提示 LLM 改写（单表聚合除外）
+    query_cost_warn_only: bool = False      # 超过扫描行数上限时只计数、不拒绝执行（由 query_timeout_seconds 兜底）
+    
+    # 查询日志与索引顾问配置
+    query_log_enabled: bool = True              # 是否记录 Agent 执行的 SQL（耗时、行数）
+    query_log_max_rows: int = 100000            # 保留的最大日志条数
+    query_log_flush_rows: int = 50              # 缓冲多少条后批量写入
+    query_log_flush_seconds: float = 5          # 距上次写入超过多少秒时写入
+    index_advisor_top_queries: int = 50         # 分析总耗时最高的多少条查询
+    index_advisor_replay_runs: int = 3          # 回放时每条查询执行次数（取中位数）
+    index_advisor_query_timeout: float = 10     # 回放时单条查询的超时秒数
+    index_advisor_min_improvement: float = 0.2  # 推荐索引所需的最小加速比例（受影响查询的总耗时）
+    
+    # 批量数据导入配置
+    ingest_batch_rows: int = 50000              # 每批（每个事务）写入的行数
+    ingest_sample_rows: int = 1000              # 推断列类型时采样的行数
+    
+    # SQL 查询结果缓存配置
+    query_cache_enabled: bool = True            # 是否缓存查询结果
+    query_cache_max_entries: int = 256          # 最大缓存条目数
+    query_cache_max_bytes: int = 67108864       # 缓存总大小上限（约 64MB）
+    query_cache_max_entry_bytes: int = 8388608  # 单个结果大小上限（约 8MB），超过不缓存
+    
+    # 问题 -> SQL 计划缓存配置
+    plan_cache_enabled: bool = True             # 是否缓存问题对应的 SQL 与回答
+    plan_cache_max_entries: int = 512           # 最大缓存条目数
+    plan_cache_max_bytes: int = 16777216        # 缓存总大小上限（约 16MB）
+    
+    # 会话记忆缓存配置
+    memory_cache_max_sessions: int = 1024       # 最多缓存的会话数
+    memory_cache_max_bytes: int = 33554432      # 缓存总大小上限（约 32MB，按消息文本估算）
+    memory_cache_ttl_seconds: int = 1800        # 会话空闲超过该时间后失效（秒）
+    
+    # 会话上下文窗口配置
+    memory_token_budget: int = 2000             # 历史消息的 token 预算（估算值）
+    memory_max_messages: int = 40               # 最多加载的历史消息条数
+    memory_summary_enabled: bool = True         # 移出窗口的对话是否折叠为滚动摘要
+    memory_summary_max_tokens: int = 300        # 滚动摘要的目标长度（token）
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,52 +1,556 @@
 """
 SQL Agent 模块
 """
+import asyncio
+import itertools
 import json
-import re
-from typing import AsyncGenerator, Optional
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import Any, AsyncGenerator, Iterator, Mapping, Optional, Type, Union
 
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage, BaseMessage
+from langchain_community.utilities import SQLDatabase
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    message_chunk_to_message,
+)
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
 
-from app.core.llm import get_llm, SQL_AGENT_SYSTEM_PROMPT
-from app.core.memory import memory_manager
-from app.db.connection import get_sql_database
+from app.config import Settings, get_settings
+from app.core.deadline import Deadline, DeadlineExceeded, QueryInterruptedError, REASON_CANCELLED, REASON_QUERY_TIMEOUT
+from app.core.cost_guard import ACTION_LIMIT, ACTION_REJECT, CostDecision, QueryCostGuard
+from app.core.executor import tool_executor
+from app.core.llm import get_llm, SQL_AGENT_SYSTEM_PROMPT, SQL_AGENT_SCHEMA_PROMPT
+from app.core.memory import count_message_tokens, count_tokens, memory_manager
+from app.core.metrics import RequestTrace, agent_metrics
+from app.core.query_cache import (
+    QueryResultCache,
+    is_cacheable,
+    normalize_question,
+    normalize_sql,
+    plan_cache,
+    query_cache,
+)
+from app.core.wire import WIRE_ROWS, ColumnEncoder, resolve_wire_format
+from app.db.catalog import schema_catalog
+from app.db.connection import (
+    TABLE_VERSIONS_TABLE,
+    ConnectionPool,
+    get_query_pool,
+    get_schema_fingerprint,
+    get_sql_database,
+)
+from app.db.query_log import QueryLog, query_log
 from app.schemas.chat import SSEEvent, SSEEventType, ChartConfig, ChartType
 
 
+# 流式结果每隔多少个数据块实测一次序列化大小（其余块按平均每行字节数估算）
+_SIZE_SAMPLE_CHUNKS = 8
+
+
+@dataclass
+class ColumnarResult:
+    """
+    列式查询结果
+    
+    columns 来自 cursor.description，data 按列存储（data[i] 为第 i 列的全部值），
+    types 为根据实际取值推断的列类型，versions 为结果对应的数据版本（不可缓存时为 None）。
+    """
+    sql: str
+    columns: list[str]
+    types: list[str]
+    data: list[list[Any]] = field(default_factory=list)
+    row_count: int = 0
+    truncated: bool = False
+    versions: Optional[dict] = None
+    
+    def rows(self) -> list[tuple]:
+        """按行返回（行式视图）"""
+        return list(zip(*self.data)) if self.data else []
+    
+    def to_preview(self, max_rows: int = 20, max_cell_chars: int = 100) -> str:
+        """
+        生成提供给 LLM 的紧凑文本预览
+        
+        Args:
+            max_rows: 最多展示的行数
+            max_cell_chars: 单元格最大字符数
+        """
+        def cell(value: Any) -> str:
+            text = "NULL" if value is None else str(value)
+            return text if len(text) <= max_cell_chars else text[:max_cell_chars] + "..."
+        
+        # 流式模式下 data 只保留首块数据，row_count 为总行数
+        shown = min(len(self.data[0]) if self.data else 0, max_rows)
+        lines = [
+            " | ".join(f"{name}:{col_type}" for name, col_type in zip(self.columns, self.types)),
+        ]
+        for i in range(shown):
+            lines.append(" | ".join(cell(column[i]) for column in self.data))
+        
+        summary = f"({self.row_count} rows"
+        if self.truncated:
+            summary += ", truncated"
+        if shown < self.row_count:
+            summary += f", showing first {shown}"
+        lines.append(summary + ")")
+        return "\n".join(lines)
+
+
+def _collect_types(values: list[Any], seen: Optional[set] = None) -> set:
+    """收集一列取值中出现的类型（可在多个数据块之间累积）"""
+    seen = set() if seen is None else seen
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or isinstance(value, int):
+            seen.add("integer")
+        elif isinstance(value, float):
+            seen.add("real")
+        elif isinstance(value, bytes):
+            seen.add("blob")
+        else:
+            seen.add("text")
+    return seen
+
+
+def _infer_column_type(values: list[Any], seen: Optional[set] = None) -> str:
+    """根据列的实际取值推断类型：integer / real / text / blob / null / mixed"""
+    seen = _collect_types(values, seen)
+    
+    if not seen:
+        return "null"
+    if seen == {"integer", "real"}:
+        return "real"
+    if len(seen) == 1:
+        return next(iter(seen))
+    return "mixed"
+
+
+@dataclass
+class QueryHandle:
+    """
+    一次查询的执行句柄
+    
+    versions 为结果所依赖的数据版本（schema_version 与各表变更计数），
+    None 表示不可缓存（未启用缓存、含非确定性函数或读取了未跟踪的表）。
+    """
+    cursor: sqlite3.Cursor
+    columns: list[str]
+    versions: Optional[dict] = None
+
+
+@dataclass
+class _ToolOutcome:
+    """
+    一次工具调用的结果
+    
+    content 写入 ToolMessage，result 为 SQL 查询成功时的列式结果，
+    query_ms 为其中 SQL 执行（含取回结果）的耗时，未执行 SQL 时为 0。
+    """
+    content: str
+    result: Optional[ColumnarResult] = None
+    elapsed_ms: float = 0.0
+    query_ms: float = 0.0
+
+
+class QueryExecutor:
+    """
+    原生 SQL 执行器
+    
+    在只读连接池上执行一次查询，直接产出列式结果，
+    不再经过「结果转字符串 -> eval 解析 -> 正则猜列名」的往返。
+    """
+    
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_rows: int = 1000,
+        cache: Optional[QueryResultCache] = None,
+        timeout: Optional[float] = None,
+        cost_guard: Optional[QueryCostGuard] = None,
+        log: Optional[QueryLog] = None
+    ):
+        """
+        初始化执行器
+        
+        Args:
+            pool: 只读连接池
+            max_rows: 单次查询最多返回的行数
+            cache: 查询结果缓存，None 表示不缓存
+            timeout: 单条查询（含取回结果）的超时秒数，None 表示不限时
+            cost_guard: 执行前的成本检查，None 表示不检查
+            log: 已执行查询日志，None 表示不记录
+        """
+        self.pool = pool
+        self.max_rows = max_rows
+        self.cache = cache
+        self.timeout = timeout
+        self.cost_guard = cost_guard
+        self.log = log
+    
+    def review(self, sql: str, fetch_limit: Optional[int] = None) -> Optional[CostDecision]:
+        """
+        执行前检查查询成本
+        
+        Args:
+            sql: SQL 语句
+            fetch_limit: 调用方最多取回的行数，结果可能超过时改写为带 LIMIT 的语句
+        
+        Returns:
+            成本检查结果，未启用成本检查时返回 None
+        """
+        if self.cost_guard is None:
+            return None
+        with self.pool.connection() as conn:
+            return self.cost_guard.review(conn, sql, fetch_limit)
+    
+    @contextmanager
+    def open(self, sql: str, deadline: Optional[Deadline] = None) -> Iterator[QueryHandle]:
+        """
+        执行查询并借出游标，供调用方按块 fetchmany
+        
+        启用缓存时，查询与版本读取在同一个读事务中完成，
+        保证记录的表版本与结果对应同一份数据快照。
+        执行与取回结果期间，超过单条查询超时或请求截止时间（含客户端断开）时语句被中断。
+        
+        Args:
+            sql: SQL 语句
+            deadline: 请求截止时间，None 表示只受单条查询超时限制
+        
+        Raises:
+            QueryInterruptedError: 查询超时或请求被取消
+            sqlite3.Error: SQL 执行失败
+        """
+        with self.pool.connection() as conn, (deadline or Deadline()).guard(conn, self.timeout):
+            if self.cache is None:
+                cursor = conn.execute(sql)
+                try:
+                    yield QueryHandle(cursor=cursor, columns=self.columns_of(cursor))
+                finally:
+                    cursor.close()
+                return
+            
+            began = not conn.in_transaction
+            if began:
+                conn.execute("BEGIN")
+            
+            # authorizer 在语句编译时记录读取的表和调用的函数
+            tables: set[str] = set()
+            functions: set[str] = set()
+            
+            def authorizer(action, arg1, arg2, db_name, source):
+                if action == sqlite3.SQLITE_READ and arg1:
+                    tables.add(arg1)
+                elif action == sqlite3.SQLITE_FUNCTION and arg2:
+                    functions.add(arg2)
+                return sqlite3.SQLITE_OK
+            
+            conn.set_authorizer(authorizer)
+            try:
+                cursor = conn.execute(sql)
+            finally:
+                conn.set_authorizer(None)
+            
+            try:
+                versions = None
+                if is_cacheable(normalize_sql(sql), functions):
+                    versions = self._read_versions(conn, tables)
+                yield QueryHandle(
+                    cursor=cursor,
+                    columns=self.columns_of(cursor),
+                    versions=versions,
+                )
+            finally:
+                cursor.close()
+                if began:
+                    conn.rollback()
+    
+    @staticmethod
+    def _read_versions(conn: sqlite3.Connection, tables: set[str]) -> Optional[dict]:
+        """
+        读取 schema_version 与指定表的变更计数
+        
+        Returns:
+            {"schema": int, "tables": {表名: 版本}}；存在未跟踪的表时返回 None（不可缓存）
+        """
+        try:
+            schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+            versions = {}
+            if tables:
+                placeholders = ", ".join("?" for _ in tables)
+                versions = dict(conn.execute(
+                    f"SELECT table_name, version FROM {TABLE_VERSIONS_TABLE} "
+                    f"WHERE table_name IN ({placeholders})",
+                    tuple(tables),
+                ).fetchall())
+        except sqlite3.OperationalError:
+            return None
+        
+        if len(versions) != len(tables):
+            return None
+        return {"schema": schema, "tables": versions}
+    
+    def current_versions(self, recorded: dict) -> Optional[dict]:
+        """读取缓存条目所依赖表的当前版本"""
+        with self.pool.connection() as conn:
+            began = not conn.in_transaction
+            if began:
+                conn.execute("BEGIN")
+            try:
+                return self._read_versions(conn, set(recorded["tables"]))
+            finally:
+                if began:
+                    conn.rollback()
+    
+    def cache_get(self, mode: str, sql: str) -> Optional[Any]:
+        """
+        查找缓存结果
+        
+        Args:
+            mode: 结果形态（rows / stream），两种形态的截断上限不同，分开缓存
+            sql: SQL 语句
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get(f"{mode}:{normalize_sql(sql)}", self.current_versions)
+    
+    def cache_put(self, mode: str, sql: str, value: Any, versions: Optional[dict], size: int):
+        """写入缓存（versions 为 None 表示不可缓存）"""
+        if self.cache is None or versions is None:
+            return
+        self.cache.put(f"{mode}:{normalize_sql(sql)}", value, versions, size)
+    
+    @staticmethod
+    def columns_of(cursor: sqlite3.Cursor) -> list[str]:
+        """从 cursor.description 读取列名"""
+        return [col[0] for col in (cursor.description or [])]
+    
+    @staticmethod
+    def to_columns(rows: list, num_columns: int) -> list[list[Any]]:
+        """行式数据转为列式，同时把 BLOB 替换为可序列化的占位文本"""
+        data: list[list[Any]] = [[] for _ in range(num_columns)]
+        for row in rows:
+            for i, value in enumerate(row):
+                if isinstance(value, bytes):
+                    value = f"<blob {len(value)} bytes>"
+                data[i].append(value)
+        return data
+    
+    def execute(self, sql: str, deadline: Optional[Deadline] = None) -> ColumnarResult:
+        """
+        执行查询（一次性取回，最多 max_rows 行）
+        
+        Args:
+            sql: SQL 语句
+            deadline: 请求截止时间
+        
+        Raises:
+            sqlite3.Error: SQL 执行失败（含 QueryInterruptedError）
+        """
+        cached = self.cache_get("rows", sql)
+        if cached is not None:
+            return cached
+        
+        with self.open(sql, deadline) as handle:
+            columns = handle.columns
+            rows = handle.cursor.fetchmany(self.max_rows + 1) if columns else []
+        
+        truncated = len(rows) > self.max_rows
+        rows = rows[:self.max_rows]
+        data = self.to_columns(rows, len(columns))
+        
+        result = ColumnarResult(
+            sql=sql,
+            columns=columns,
+            types=[_infer_column_type(values) for values in data],
+            data=data,
+            row_count=len(rows),
+            truncated=truncated,
+            versions=handle.versions,
+        )
+        
+        if handle.versions is not None and self.cache is not None:
+            size = len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+            self.cache_put("rows", sql, result, handle.versions, size)
+        
+        return result
+
+
+class _SQLQueryInput(BaseModel):
+    query: str = Field(..., description="A detailed and correct SQL query.")
+
+
+class SQLQueryTool(BaseTool):
+    """替代 SQLDatabaseToolkit 中 sql_db_query 的原生查询工具"""
+    
+    name: str = "sql_db_query"
+    description: str = (
+        "Execute a SQL query against the database and get back the result "
+        "(column names with types, then rows separated by ' | '). "
+        "If the query is not correct, an error message will be returned. "
+        "If an error is returned, rewrite the query, check the query, and try again."
+    )
+    args_schema: Type[BaseModel] = _SQLQueryInput
+    executor: Any = None
+    preview_rows: int = 20
+    
+    def _run(self, query: str, **kwargs: Any) -> str:
+        try:
+            return self.executor.execute(query).to_preview(self.preview_rows)
+        except sqlite3.Error as e:
+            return f"Error: {e}"
+
+
+@lru_cache(maxsize=4)
+def _schema_prompt(dialect: str, digest: str) -> str:
+    """按结构摘要生成系统提示（摘要不变时复用）"""
+    return SQL_AGENT_SCHEMA_PROMPT.format(dialect=dialect, top_k=10, schema=digest)
+
+
+@dataclass(frozen=True)
+class AgentRuntime:
+    """
+    进程级共享的 Agent 运行时（不可变）
+    
+    在应用启动时构建一次：数据库、查询执行器、工具集以及预先绑定工具的 LLM。
+    每个请求只创建轻量的 SQLAgent 上下文，不再重复创建工具集和 bind_tools。
+    """
+    settings: Settings
+    db: SQLDatabase
+    executor: QueryExecutor
+    query_tool: SQLQueryTool
+    tools: tuple[BaseTool, ...]
+    tool_dict: Mapping[str, BaseTool]
+    llm_with_tools: Runnable
+    prompt_mode: str
+    static_prompt: str = ""
+    
+    def system_prompt(self) -> str:
+        """
+        获取系统提示（预置结构摘要模式下会读取表结构，需在线程池中调用）
+        
+        Returns:
+            系统提示文本
+        """
+        if self.prompt_mode == "schema":
+            return _schema_prompt(self.db.dialect, schema_catalog.get_schema_digest())
+        return self.static_prompt
+
+
+def build_agent_runtime() -> AgentRuntime:
+    """
+    构建 Agent 运行时
+    
+    Returns:
+        AgentRuntime 实例
+    """
+    settings = get_settings()
+    db = get_sql_database()
+    llm = get_llm(streaming=False)
+    
+    # 创建工具集（sql_db_query 替换为原生列式执行工具）
+    executor = QueryExecutor(
+        get_query_pool(),
+        max_rows=settings.query_max_rows,
+        cache=query_cache if settings.query_cache_enabled else None,
+        timeout=settings.query_timeout_seconds,
+        cost_guard=(
+            QueryCostGuard(settings.query_cost_max_rows, settings.query_cost_warn_only)
+            if settings.query_cost_guard else None
+        ),
+        log=query_log if settings.query_log_enabled else None,
+    )
+    query_tool = SQLQueryTool(
+        executor=executor,
+        preview_rows=settings.query_preview_rows,
+    )
+    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+    tools = tuple(
+        query_tool if tool.name == "sql_db_query" else tool
+        for tool in toolkit.get_tools()
+    )
+    
+    # 系统提示：预置结构摘要时 LLM 可直接写 SQL，省去表结构发现的迭代
+    prompt_mode = "schema" if settings.agent_schema_prompt else "discovery"
+    static_prompt = "" if settings.agent_schema_prompt else SQL_AGENT_SYSTEM_PROMPT.format(
+        dialect=db.dialect,
+        top_k=10
+    )
+    
+    return AgentRuntime(
+        settings=settings,
+        db=db,
+        executor=executor,
+        query_tool=query_tool,
+        tools=tools,
+        tool_dict=MappingProxyType({tool.name: tool for tool in tools}),
+        llm_with_tools=llm.bind_tools(list(tools)),
+        prompt_mode=prompt_mode,
+        static_prompt=static_prompt,
+    )
+
+
+@lru_cache
+def get_agent_runtime() -> AgentRuntime:
+    """获取 Agent 运行时单例（应用启动时预先构建）"""
+    return build_agent_runtime()
+
+
 class SQLAgent:
     """
     SQL Agent - 处理自然语言到 SQL 的转换和执行
+    
+    单个请求的轻量上下文：只保存会话 ID 并引用共享的 AgentRuntime。
     """
     
-    def __init__(self, session_id: str, max_iterations: int = 6):
+    def __init__(
+        self,
+        session_id: str,
+        max_iterations: int = 6,
+        runtime: Optional[AgentRuntime] = None,
+        deadline: Optional[Deadline] = None,
+        trace: Optional[RequestTrace] = None,
+        wire_format: str = WIRE_ROWS
+    ):
         """
         初始化 SQL Agent
         
         Args:
             session_id: 会话 ID
             max_iterations: 最大迭代次数
+            runtime: Agent 运行时，默认使用进程级共享实例
+            deadline: 请求截止时间，默认按配置的请求超时创建
+            trace: 请求耗时分解，None 表示不记录
+            wire_format: 查询结果的线上编码（rows / columnar / msgpack，见 app.core.wire）
         """
         self.session_id = session_id
         self.max_iterations = max_iterations
+        self.runtime = runtime or get_agent_runtime()
+        self.trace = trace
+        self.wire_format = resolve_wire_format(wire_format)
         
-        # 初始化组件
-        self.db = get_sql_database()
-        self.llm = get_llm(streaming=True)
+        # 数据事件编号（CHART 事件按编号引用数据；同一步的工具在多个线程中执行，itertools.count 取号是原子的）
+        self._data_ids = itertools.count(1)
         
-        # 创建工具集
-        self.toolkit = SQLDatabaseToolkit(db=self.db, llm=self.llm)
-        self.tools = self.toolkit.get_tools()
-        self.tool_dict = {tool.name: tool for tool in self.tools}
-        
-        # 绑定工具到 LLM
-        self.llm_with_tools = self.llm.bind_tools(self.tools)
-        
-        # 系统提示
-        self.system_prompt = SQL_AGENT_SYSTEM_PROMPT.format(
-            dialect=self.db.dialect,
-            top_k=10
-        )
+        # 常用组件直接引用共享运行时
+        self.settings = self.runtime.settings
+        self.deadline = deadline or Deadline(self.settings.agent_request_timeout_seconds)
+        self.executor = self.runtime.executor
+        self.query_tool = self.runtime.query_tool
+        self.tool_dict = self.runtime.tool_dict
+        self.prompt_mode = self.runtime.prompt_mode
     
     async def run(self, user_input: str) -> AsyncGenerator[SSEEvent, None]:
         """
@@ -58,104 +562,406 @@ class SQLAgent:
         Yields:
             SSE 事件
         """
-        # 获取历史消息
-        history = memory_manager.get_messages(self.session_id)
+        # 获取历史消息（装入 token 预算）与移出窗口的对话摘要
+        context = await memory_manager.get_context(self.session_id)
+        history = context.messages
+        
+        # 系统提示与计划缓存键都要读数据库（需在保存用户消息前计算）
+        start = time.perf_counter()
+        system_prompt, plan_key = await tool_executor.run(self._prepare, user_input, history)
+        self._span("prepare", start)
+        if context.summary:
+            system_prompt = f"{system_prompt}\n**此前对话摘要：**\n{context.summary}\n"
         
         # 构建消息列表
         messages: list[BaseMessage] = [
-            SystemMessage(content=self.system_prompt),
+            SystemMessage(content=system_prompt),
             *history,
             HumanMessage(content=user_input)
         ]
         
         # 保存用户消息
-        memory_manager.add_user_message(self.session_id, user_input)
+        await memory_manager.add_user_message(self.session_id, user_input)
+        
+        # 计划缓存命中：直接执行缓存的 SQL 并返回缓存的回答，不调用 LLM
+        plan = None
+        if plan_key:
+            plan = await tool_executor.run(plan_cache.get, plan_key, self.executor.current_versions)
+        if plan is not None:
+            async for event in self._run_plan(plan, context.tokens):
+                yield event
+            return
         
         # 收集完整响应
         full_response = ""
         executed_sql = None
-        query_result = None
+        plan_result: Optional[ColumnarResult] = None  # 最后一次成功执行的查询结果
+        llm_ms = 0.0
+        completed = False
+        iterations = tool_calls = prompt_tokens = 0
         
         try:
             for iteration in range(self.max_iterations):
                 # 调用 LLM
-                response = await self._call_llm(messages)
-                
-                # 处理文本内容
-                if response.content:
-                    full_response += response.content
-                    yield SSEEvent(event=SSEEventType.TEXT, data=response.content)
+                start = time.perf_counter()
+                iterations += 1
+                prompt_tokens += count_message_tokens(messages)
+                if self.settings.agent_stream_tokens:
+                    # 流式调用：文本 token 到达即推送，工具调用在本轮结束后组装完整
+                    response = AIMessage(content="")
+                    async for item in self.deadline.iterate(self._stream_llm(messages)):
+                        if isinstance(item, str):
+                            full_response += item
+                            yield SSEEvent(event=SSEEventType.TEXT, data=item)
+                        else:
+                            response = item
+                else:
+                    response = await self.deadline.wait(self._call_llm(messages))
+                    
+                    # 处理文本内容
+                    if response.content:
+                        full_response += response.content
+                        yield SSEEvent(event=SSEEventType.TEXT, data=response.content)
+                llm_ms += self._span("llm", start)
                 
                 messages.append(response)
                 
                 # 检查是否有工具调用
                 if not response.tool_calls:
                     # 没有工具调用，Agent 完成
+                    completed = True
                     break
                 
-                # 执行工具调用
-                for tool_call in response.tool_calls:
-                    tool_name = tool_call["name"]
-                    tool_args = tool_call["args"]
-                    tool_id = tool_call["id"]
-                    
-                    # 发送思考过程
-                    yield SSEEvent(
-                        event=SSEEventType.THINKING,
-                        data=f"正在执行: {tool_name}"
-                    )
-                    
-                    # 执行工具
-                    tool_result = await self._execute_tool(tool_name, tool_args)
-                    
-                    # 如果是 SQL 查询，发送 SQL 事件
-                    if tool_name == "sql_db_query":
-                        query = tool_args.get("query", "")
-                        executed_sql = query
-                        query_result = tool_result
+                # 执行工具调用：同一步的工具调用同时提交到线程池并发执行，
+                # 再按原顺序消费各自的事件，ToolMessage 顺序与 tool_calls 一致
+                tool_calls += len(response.tool_calls)
+                pending = [
+                    (tool_call, tool_executor.submit_iter(
+                        partial(self._tool_steps, tool_call),
+                        maxsize=self.settings.agent_tool_queue_size,
+                        stall_timeout=self.settings.agent_tool_stall_seconds or None,
+                    ))
+                    for tool_call in response.tool_calls
+                ]
+                try:
+                    for tool_call, steps in pending:
+                        tool_name = tool_call["name"]
                         
-                        yield SSEEvent(event=SSEEventType.SQL, data=query)
+                        # 发送思考过程
+                        yield SSEEvent(
+                            event=SSEEventType.THINKING,
+                            data=f"正在执行: {tool_name}"
+                        )
                         
-                        # 解析并发送数据
-                        parsed_data = self._parse_query_result(tool_result, query)
-                        if parsed_data:
-                            yield SSEEvent(event=SSEEventType.DATA, data=parsed_data)
-                            
-                            # 生成图表配置
-                            chart_config = self._generate_chart_config(query, parsed_data)
-                            if chart_config:
-                                yield SSEEvent(event=SSEEventType.CHART, data=chart_config)
-                    
-                    # 添加工具结果消息
-                    messages.append(ToolMessage(
-                        content=str(tool_result),
-                        tool_call_id=tool_id
-                    ))
+                        outcome = _ToolOutcome(content="")
+                        async for item in self.deadline.iterate(steps):
+                            if isinstance(item, SSEEvent):
+                                yield item
+                            else:
+                                outcome = item
+                        
+                        if self.trace is not None:
+                            self.trace.add(f"tool:{tool_name}", outcome.elapsed_ms)
+                            if outcome.query_ms:
+                                self.trace.add("sql", outcome.query_ms)
+                        
+                        if tool_name == "sql_db_query":
+                            # 成本检查可能改写了 SQL，以实际执行的语句为准
+                            executed_sql = (
+                                outcome.result.sql if outcome.result is not None
+                                else tool_call["args"].get("query", "")
+                            )
+                        if outcome.result is not None:
+                            plan_result = outcome.result
+                        
+                        yield SSEEvent(
+                            event=SSEEventType.THINKING,
+                            data=f"完成: {tool_name}（{outcome.elapsed_ms:.0f} ms）"
+                        )
+                        
+                        # 添加工具结果消息
+                        messages.append(ToolMessage(
+                            content=outcome.content,
+                            tool_call_id=tool_call["id"]
+                        ))
+                finally:
+                    # 异常或客户端断开时通知尚未消费完的工具停止
+                    for _, steps in pending:
+                        await steps.aclose()
+            
+            # 正常结束且有成功的查询时写入计划缓存
+            if completed and plan_key and plan_result is not None and full_response:
+                self._store_plan(plan_key, plan_result, full_response, llm_ms)
             
             # 保存助手响应
-            memory_manager.add_assistant_message(
+            await memory_manager.add_assistant_message(
                 self.session_id, 
                 full_response,
                 executed_sql
             )
             
+        except (GeneratorExit, asyncio.CancelledError):
+            # 生成器被提前关闭或任务被取消（客户端已断开）：中断仍在执行的工具
+            self._cancel()
+            raise
+        
+        except DeadlineExceeded as e:
+            # 超时或客户端断开：正在进行的 LLM 调用与工具已停止，不保存不完整的回答
+            agent_metrics.record_interrupt(e.reason)
+            yield SSEEvent(event=SSEEventType.ERROR, data=str(e))
+        
         except Exception as e:
             yield SSEEvent(event=SSEEventType.ERROR, data=str(e))
         
         finally:
-            yield SSEEvent(event=SSEEventType.DONE, data={})
+            # 不能在 finally 中 yield：生成器被关闭（GeneratorExit）时只做记录
+            agent_metrics.record_run(
+                self.prompt_mode, iterations, tool_calls, prompt_tokens, count_tokens(full_response)
+            )
+        
+        done = self._plan_report(False, llm_ms)
+        done["iterations"] = iterations
+        done["prompt_tokens"] = prompt_tokens
+        done["history_tokens"] = context.tokens
+        yield SSEEvent(event=SSEEventType.DONE, data=done)
+    
+    async def _run_plan(self, plan: dict, history_tokens: int = 0) -> AsyncGenerator[SSEEvent, None]:
+        """
+        执行缓存的计划：运行 SQL、推送数据和图表，再推送缓存的回答
+        
+        Args:
+            plan: 计划缓存条目（sql, narrative, llm_ms）
+            history_tokens: 历史消息的估算 token 数
+        
+        Yields:
+            SSE 事件
+        """
+        plan_cache.record_saved(plan["llm_ms"])
+        
+        try:
+            yield SSEEvent(event=SSEEventType.THINKING, data="命中查询计划缓存，直接执行 SQL")
+            yield SSEEvent(event=SSEEventType.SQL, data=plan["sql"])
+            
+            start = time.perf_counter()
+            steps = tool_executor.submit_iter(
+                partial(self._run_query, plan["sql"]),
+                maxsize=self.settings.agent_tool_queue_size,
+                stall_timeout=self.settings.agent_tool_stall_seconds or None,
+            )
+            async for item in self.deadline.iterate(steps):
+                if isinstance(item, SSEEvent):
+                    yield item
+            agent_metrics.record_query(self._span("sql", start))
+            
+            yield SSEEvent(event=SSEEventType.TEXT, data=plan["narrative"])
+            
+            await memory_manager.add_assistant_message(
+                self.session_id,
+                plan["narrative"],
+                plan["sql"]
+            )
+            
+        except (GeneratorExit, asyncio.CancelledError):
+            self._cancel()
+            raise
+        
+        except DeadlineExceeded as e:
+            agent_metrics.record_interrupt(e.reason)
+            yield SSEEvent(event=SSEEventType.ERROR, data=str(e))
+        
+        except Exception as e:
+            yield SSEEvent(event=SSEEventType.ERROR, data=str(e))
+        
+        finally:
+            agent_metrics.record_run("plan_cache", 0, 0, 0, count_tokens(plan["narrative"]))
+        
+        done = self._plan_report(True, plan["llm_ms"])
+        done["iterations"] = 0
+        done["prompt_tokens"] = 0
+        done["history_tokens"] = history_tokens
+        yield SSEEvent(event=SSEEventType.DONE, data=done)
+    
+    def _span(self, name: str, start: float) -> float:
+        """
+        记录从 start 到现在的阶段耗时
+        
+        Returns:
+            耗时（毫秒）
+        """
+        ms = (time.perf_counter() - start) * 1000
+        if self.trace is not None:
+            self.trace.add(name, ms)
+        return ms
+    
+    def _cancel(self):
+        """
+        取消本次请求并计入指标
+
+        客户端断开时监听任务可能已先触发截止时间，因此以已记录的原因为准。
+        """
+        agent_metrics.record_interrupt(self.deadline.reason or REASON_CANCELLED)
+        self.deadline.cancel()
+    
+    def _prepare(self, user_input: str, history: list[BaseMessage]) -> tuple[str, Optional[str]]:
+        """读取系统提示并计算计划缓存键（阻塞，在线程池中运行）"""
+        return self.runtime.system_prompt(), self._plan_key(user_input, history)
+    
+    def _plan_key(self, user_input: str, history: list[BaseMessage]) -> Optional[str]:
+        """
+        计算计划缓存键：规范化问题 + 上一轮用户问题 + schema 指纹
+        
+        追问（如「那按地区呢」）的含义依赖上一轮问题，因此一并计入键中。
+        未启用计划缓存时返回 None。
+        """
+        if not self.settings.plan_cache_enabled:
+            return None
+        
+        previous = next(
+            (str(msg.content) for msg in reversed(history) if isinstance(msg, HumanMessage)),
+            ""
+        )
+        with self.executor.pool.connection() as conn:
+            fingerprint = get_schema_fingerprint(conn)
+        
+        return "\x1f".join([normalize_question(user_input), normalize_question(previous), fingerprint])
+    
+    def _store_plan(self, plan_key: str, result: ColumnarResult, narrative: str, llm_ms: float):
+        """写入计划缓存（结果不可缓存时跳过）"""
+        if result.versions is None:
+            return
+        
+        plan = {"sql": result.sql, "narrative": narrative, "llm_ms": llm_ms}
+        size = len(result.sql.encode("utf-8")) + len(narrative.encode("utf-8"))
+        plan_cache.put(plan_key, plan, result.versions, size)
+    
+    def _plan_report(self, hit: bool, llm_ms: float) -> dict:
+        """
+        构建 DONE 事件中的计划缓存报告
+        
+        Args:
+            hit: 本次请求是否命中
+            llm_ms: 命中时为节省的 LLM 耗时，未命中时为本次 LLM 耗时
+        """
+        if not self.settings.plan_cache_enabled:
+            return {}
+        
+        stats = plan_cache.stats()
+        return {
+            "plan_cache": {
+                "hit": hit,
+                "saved_ms": round(llm_ms, 1) if hit else 0.0,
+                "llm_ms": 0.0 if hit else round(llm_ms, 1),
+                "hit_rate": stats["hit_rate"],
+                "total_saved_ms": stats["saved_ms"],
+            }
+        }
     
     async def _call_llm(self, messages: list[BaseMessage]) -> AIMessage:
-        """调用 LLM（非流式，获取完整响应）"""
-        # 使用非流式调用获取完整响应（包括 tool_calls）
-        llm_non_streaming = get_llm(streaming=False)
-        llm_with_tools = llm_non_streaming.bind_tools(self.tools)
+        """调用 LLM（非流式，获取完整响应；使用运行时中预先绑定工具的 LLM）"""
+        return await self.runtime.llm_with_tools.ainvoke(messages)
+    
+    async def _stream_llm(self, messages: list[BaseMessage]) -> AsyncGenerator[Union[str, AIMessage], None]:
+        """
+        流式调用 LLM
+        
+        文本片段到达即产出；工具调用的参数片段（tool_call_chunks）按 index 累加合并，
+        本轮结束后转换为完整的 AIMessage（含解析好的 tool_calls）。
+        
+        Yields:
+            文本片段（str），最后产出合并后的 AIMessage
+        """
+        merged: Optional[AIMessageChunk] = None
+        async for chunk in self.runtime.llm_with_tools.astream(messages):
+            merged = chunk if merged is None else merged + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                yield chunk.content
+        
+        yield message_chunk_to_message(merged) if merged is not None else AIMessage(content="")
+    
+    def _tool_steps(self, tool_call: dict) -> Iterator[Union[SSEEvent, _ToolOutcome]]:
+        """
+        执行一次工具调用（在工具线程池中运行）
+        
+        Args:
+            tool_call: LLM 返回的工具调用
+        
+        Yields:
+            SQL 查询产生的 SQL / 数据 / 图表事件，最后产出 _ToolOutcome（含耗时）
+        """
+        start = time.perf_counter()
+        tool_name = tool_call["name"]
+        tool_args = tool_call["args"]
+        result: Optional[ColumnarResult] = None
+        query_ms = 0.0
         
-        response = await llm_with_tools.ainvoke(messages)
-        return response
+        if tool_name == "sql_db_query":
+            # SQL 查询：原生执行，直接得到列式结果
+            query = tool_args.get("query", "")
+            decision = self._review_query(query)
+            
+            if decision is not None and decision.action == ACTION_REJECT:
+                # 估算代价过高：不执行，把计划与改写建议交给 LLM
+                yield SSEEvent(
+                    event=SSEEventType.THINKING,
+                    data=f"查询预计扫描约 {decision.estimated_rows} 行，超过上限，正在改写查询..."
+                )
+                content = f"Error: 查询代价过高，未执行。{decision.to_hint()}"
+            else:
+                if decision is not None and decision.action == ACTION_LIMIT:
+                    query = decision.sql
+                yield SSEEvent(event=SSEEventType.SQL, data=query)
+                
+                query_start = time.perf_counter()
+                try:
+                    for item in self._run_query(query):
+                        if isinstance(item, SSEEvent):
+                            yield item
+                        else:
+                            result = item
+                except sqlite3.Error as e:
+                    if isinstance(e, QueryInterruptedError) and e.reason == REASON_QUERY_TIMEOUT:
+                        agent_metrics.record_interrupt(e.reason)
+                    content = f"Error: {e}"
+                    query_ms = (time.perf_counter() - query_start) * 1000
+                    self._log_query(query, query_ms, error=str(e))
+                else:
+                    query_ms = (time.perf_counter() - query_start) * 1000
+                    self._log_query(query, query_ms, result.row_count)
+                    content = result.to_preview(self.query_tool.preview_rows)
+                    if decision is not None and decision.action == ACTION_LIMIT and result.truncated:
+                        content = f"{decision.to_hint()}\n{content}"
+        else:
+            # 执行其他工具
+            content = self._execute_tool(tool_name, tool_args)
+        
+        yield _ToolOutcome(
+            content=str(content),
+            result=result,
+            elapsed_ms=(time.perf_counter() - start) * 1000,
+            query_ms=query_ms,
+        )
+    
+    def _log_query(self, sql: str, elapsed_ms: float, row_count: Optional[int] = None, error: Optional[str] = None):
+        """记录一次查询执行（耗时计入 SQL 执行直方图，日志供索引顾问分析负载）"""
+        agent_metrics.record_query(elapsed_ms)
+        if self.executor.log is not None:
+            self.executor.log.record(sql, elapsed_ms, row_count, error)
+    
+    def _review_query(self, sql: str) -> Optional[CostDecision]:
+        """
+        执行前检查查询成本（阻塞，在工具线程池中运行）
+        
+        取回上限比实际推送行数多 1 行，用于判断结果是否被截断，
+        因此自动添加的 LIMIT 不会改变推送给前端的数据。
+        """
+        if self.settings.query_stream_results:
+            fetch_limit = self.settings.query_stream_max_rows + 1
+        else:
+            fetch_limit = self.executor.max_rows + 1
+        return self.executor.review(sql, fetch_limit)
     
-    async def _execute_tool(self, tool_name: str, tool_args: dict) -> str:
-        """执行工具调用"""
+    def _execute_tool(self, tool_name: str, tool_args: dict) -> str:
+        """执行工具调用（阻塞，在工具线程池中运行）"""
         if tool_name not in self.tool_dict:
             return f"Error: Unknown tool {tool_name}"
         
@@ -180,148 +986,310 @@ class SQLAgent:
         except Exception as e:
             return f"Error executing {tool_name}: {e}"
     
-    def _parse_query_result(self, result: str, sql: str = "") -> Optional[dict]:
+    def _run_query(self, sql: str) -> Iterator[Union[SSEEvent, ColumnarResult]]:
         """
-        解析查询结果
+        执行 SQL 并生成数据事件和图表事件
         
         Args:
-            result: SQL 查询返回的字符串结果
-            sql: 原始 SQL 语句（用于提取列名）
+            sql: SQL 语句
         
-        Returns:
-            包含 columns, rows, raw 的数据字典
+        Yields:
+            DATA（或 data_header / data_chunk / data_end）与 CHART 事件，最后产出 ColumnarResult
+        
+        Raises:
+            sqlite3.Error: SQL 执行失败
         """
-        try:
-            # 尝试解析元组列表格式: [(a, b), (c, d)]
-            if result.startswith("[") and result.endswith("]"):
-                # 使用 eval 解析（注意：生产环境应使用更安全的方式）
-                data = eval(result)
-                
-                if isinstance(data, list) and len(data) > 0:
-                    # 转换为字典列表
-                    if isinstance(data[0], tuple):
-                        # 从 SQL 提取列名
-                        columns = self._extract_columns_from_sql(sql, len(data[0]))
-                        
-                        # 构建 rows 数据
-                        rows = []
-                        for item in data:
-                            if len(item) >= 2:
-                                rows.append({
-                                    "name": str(item[0]),
-                                    "value": item[1] if len(item) == 2 else list(item[1:])
-                                })
-                        
-                        return {
-                            "columns": columns,
-                            "rows": rows,
-                            "raw": data
-                        }
-            
-            return None
-            
-        except Exception:
-            return None
+        result: Optional[ColumnarResult] = None
+        data_id = next(self._data_ids)
+        if self.settings.query_stream_results:
+            # 分块推送：header -> data_chunk... -> data_end
+            for item in self._stream_query(sql, data_id):
+                if isinstance(item, SSEEvent):
+                    yield item
+                else:
+                    result = item
+        else:
+            result = self.executor.execute(sql, self.deadline)
+            if self.wire_format == WIRE_ROWS:
+                data = self._build_data_payload(result)
+            else:
+                data = self._build_columnar_payload(result, data_id)
+            if data:
+                yield SSEEvent(event=SSEEventType.DATA, data=data)
+        
+        # 生成图表配置（紧凑编码时只引用数据事件）
+        if self.wire_format == WIRE_ROWS:
+            chart_config = self._generate_chart_config(sql, result)
+        else:
+            chart_config = self._chart_reference(sql, result, data_id)
+        if chart_config:
+            yield SSEEvent(event=SSEEventType.CHART, data=chart_config)
+        
+        yield result
     
-    def _extract_columns_from_sql(self, sql: str, num_columns: int) -> list:
+    def _stream_query(self, sql: str, data_id: int = 0) -> Iterator[Union[SSEEvent, ColumnarResult]]:
         """
-        从 SQL SELECT 语句中提取列名
+        分块执行查询并生成流式数据事件
+        
+        内存中只保留当前数据块和首块（用于 LLM 预览与图表），
+        行数或字节数超过上限时截断。
         
         Args:
             sql: SQL 语句
-            num_columns: 数据中的列数
+            data_id: 数据事件编号（紧凑编码时写入结果头，供图表引用）
         
-        Returns:
-            列名列表
+        Yields:
+            data_header / data_chunk / data_end 事件，最后产出一个 ColumnarResult
+            （只含首块数据，row_count 为实际推送的总行数）
+        
+        Raises:
+            sqlite3.Error: SQL 执行失败
         """
-        try:
-            # 提取 SELECT ... FROM 之间的部分
-            match = re.search(r'SELECT\s+(.+?)\s+FROM', sql, re.IGNORECASE | re.DOTALL)
-            if match:
-                select_clause = match.group(1).strip()
+        encoder = None if self.wire_format == WIRE_ROWS else ColumnEncoder(self.wire_format)
+        
+        cached = self.executor.cache_get("stream", sql)
+        if cached is not None:
+            # 命中缓存：按原顺序重放数据事件
+            yield from self._replay_stream(cached, data_id, encoder)
+            return
+        
+        chunk_rows = max(1, self.settings.query_stream_chunk_rows)
+        max_rows = self.settings.query_stream_max_rows
+        max_bytes = self.settings.query_stream_max_bytes
+        cache_limit = self.executor.cache.max_entry_bytes if self.executor.cache else 0
+        
+        with self.executor.open(sql, self.deadline) as handle:
+            cursor = handle.cursor
+            columns = handle.columns
+            seen_types = [set() for _ in columns]
+            first: Optional[list[list[Any]]] = None
+            header: Optional[dict] = None
+            total_rows = total_bytes = seq = 0
+            truncated = False
+            # 抽样实测的序列化字节数与行数，用于估算其余数据块的大小
+            sampled_bytes = sampled_rows = 0
+            
+            # 结果不超过单条目上限时顺带收集数据块，结束后写入缓存
+            cached_chunks: Optional[list] = [] if handle.versions is not None and cache_limit else None
+            
+            while columns:
+                size = min(chunk_rows, max_rows - total_rows)
+                if size <= 0:
+                    truncated = cursor.fetchone() is not None
+                    break
                 
-                # 处理 SELECT * 的情况
-                if select_clause == '*':
-                    return [f"column_{i+1}" for i in range(num_columns)]
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
                 
-                # 分割列定义（注意处理函数中的逗号）
-                columns = []
-                depth = 0
-                current = ""
+                data = self.executor.to_columns(rows, len(columns))
+                for i, values in enumerate(data):
+                    _collect_types(values, seen_types[i])
                 
-                for char in select_clause:
-                    if char == '(':
-                        depth += 1
-                        current += char
-                    elif char == ')':
-                        depth -= 1
-                        current += char
-                    elif char == ',' and depth == 0:
-                        columns.append(current.strip())
-                        current = ""
-                    else:
-                        current += char
+                # 推送时编码器还要序列化一次，这里不逐块序列化：只实测首块及此后每隔
+                # _SIZE_SAMPLE_CHUNKS 块（列式数据，与行式数组只差括号），其余按平均每行字节数估算
+                if seq % _SIZE_SAMPLE_CHUNKS == 0:
+                    chunk_bytes = len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+                    sampled_bytes += chunk_bytes
+                    sampled_rows += len(rows)
+                else:
+                    chunk_bytes = sampled_bytes * len(rows) // sampled_rows
+                if total_bytes + chunk_bytes > max_bytes and seq > 0:
+                    truncated = True
+                    break
                 
-                if current.strip():
-                    columns.append(current.strip())
+                if first is None:
+                    first = data
+                    header = {
+                        "columns": columns,
+                        "types": [_infer_column_type([], seen) for seen in seen_types],
+                        "chunk_rows": chunk_rows,
+                    }
+                    yield self._header_event(header, data_id, encoder)
                 
-                # 提取最终列名（考虑 AS 别名）
-                final_columns = []
-                for col in columns:
-                    # 检查 AS 别名
-                    as_match = re.search(r'\s+AS\s+(\w+)\s*$', col, re.IGNORECASE)
-                    if as_match:
-                        final_columns.append(as_match.group(1))
-                    else:
-                        # 提取最后的标识符
-                        # 处理 SUM(amount), COUNT(*), table.column 等
-                        simple_match = re.search(r'(\w+)\s*$', col)
-                        if simple_match:
-                            final_columns.append(simple_match.group(1))
-                        else:
-                            final_columns.append(col)
+                yield self._chunk_event(seq, data, encoder)
+                seq += 1
+                total_rows += len(rows)
+                total_bytes += chunk_bytes
                 
-                return final_columns if len(final_columns) == num_columns else [f"column_{i+1}" for i in range(num_columns)]
-            
-            return [f"column_{i+1}" for i in range(num_columns)]
-            
-        except Exception:
-            return [f"column_{i+1}" for i in range(num_columns)]
+                if cached_chunks is not None:
+                    if total_bytes <= cache_limit:
+                        cached_chunks.append(data)
+                    else:
+                        cached_chunks = None
+        
+        types = [_infer_column_type([], seen) for seen in seen_types]
+        end = None
+        if first is not None:
+            end = {
+                "row_count": total_rows,
+                "chunks": seq,
+                "bytes": total_bytes,
+                "types": types,
+                "truncated": truncated,
+            }
+            yield SSEEvent(event=SSEEventType.DATA_END, data=end)
+        
+        result = ColumnarResult(
+            sql=sql,
+            columns=columns,
+            types=types,
+            data=first or [[] for _ in columns],
+            row_count=total_rows,
+            truncated=truncated,
+            versions=handle.versions,
+        )
+        
+        if cached_chunks is not None:
+            self.executor.cache_put(
+                "stream", sql,
+                {"header": header, "chunks": cached_chunks, "end": end, "result": result},
+                handle.versions, total_bytes,
+            )
+        
+        yield result
     
-    def _generate_chart_config(self, sql: str, data: dict) -> Optional[dict]:
-        """根据 SQL 和数据生成图表配置"""
-        try:
-            rows = data.get("rows", [])
-            if not rows:
-                return None
-            
-            # 分析 SQL 确定图表类型
-            sql_lower = sql.lower()
-            
-            # 包含 GROUP BY 的聚合查询适合柱状图或饼图
-            if "group by" in sql_lower:
-                # 如果数据量小于等于 6，使用饼图
-                if len(rows) <= 6:
-                    chart_type = "pie"
-                else:
-                    chart_type = "bar"
-            elif "order by" in sql_lower and "limit" in sql_lower:
-                # 排序后的 TOP N 查询适合柱状图
-                chart_type = "bar"
+    def _replay_stream(
+        self,
+        cached: dict,
+        data_id: int = 0,
+        encoder: Optional[ColumnEncoder] = None
+    ) -> Iterator[Union[SSEEvent, ColumnarResult]]:
+        """重放缓存的流式数据事件（按本次请求的编码重新编码），最后产出缓存的 ColumnarResult"""
+        if cached["header"] is not None:
+            yield self._header_event(cached["header"], data_id, encoder)
+            for seq, data in enumerate(cached["chunks"]):
+                yield self._chunk_event(seq, data, encoder)
+            yield SSEEvent(event=SSEEventType.DATA_END, data=cached["end"])
+        yield cached["result"]
+    
+    def _header_event(self, header: dict, data_id: int, encoder: Optional[ColumnEncoder]) -> SSEEvent:
+        """流式结果头事件（紧凑编码时附带编码与数据编号）"""
+        if encoder is not None:
+            header = {**header, "format": self.wire_format, "id": data_id}
+        return SSEEvent(event=SSEEventType.DATA_HEADER, data=header)
+    
+    @staticmethod
+    def _chunk_event(seq: int, data: list[list[Any]], encoder: Optional[ColumnEncoder]) -> SSEEvent:
+        """
+        流式数据块事件
+        
+        Args:
+            seq: 块序号
+            data: 列式数据块
+            encoder: 紧凑编码器，None 表示以行式数组推送（避免 rows/raw 重复）
+        """
+        if encoder is None:
+            return SSEEvent(event=SSEEventType.DATA_CHUNK, data={"seq": seq, "rows": [list(row) for row in zip(*data)]})
+        return SSEEvent(event=SSEEventType.DATA_CHUNK, data={"seq": seq, **encoder.pack(encoder.encode(data))})
+    
+    def _build_data_payload(self, result: ColumnarResult) -> Optional[dict]:
+        """
+        根据列式结果构建 DATA 事件数据
+        
+        Args:
+            result: 列式查询结果
+        
+        Returns:
+            包含 columns, types, rows, raw 的数据字典，无数据时返回 None
+        """
+        if not result.columns or result.row_count == 0:
+            return None
+        
+        raw = result.rows()
+        rows = []
+        if len(result.columns) >= 2:
+            names = result.data[0]
+            values = result.data[1] if len(result.columns) == 2 else [list(row[1:]) for row in raw]
+            rows = [
+                {"name": str(name), "value": value}
+                for name, value in zip(names, values)
+            ]
+        
+        return {
+            "columns": result.columns,
+            "types": result.types,
+            "rows": rows,
+            "raw": raw,
+            "row_count": result.row_count,
+            "truncated": result.truncated,
+        }
+    
+    def _build_columnar_payload(self, result: ColumnarResult, data_id: int) -> Optional[dict]:
+        """
+        根据列式结果构建紧凑编码的 DATA 事件数据
+        
+        Args:
+            result: 列式查询结果
+            data_id: 数据事件编号
+        
+        Returns:
+            {"format", "id", "columns", "types", "data", "dicts", "row_count", "truncated"}
+            （msgpack 编码时除 format / id 外的字段序列化为 payload），无数据时返回 None
+        """
+        if not result.columns or result.row_count == 0:
+            return None
+        
+        encoder = ColumnEncoder(self.wire_format)
+        body = {
+            "columns": result.columns,
+            "types": result.types,
+            **encoder.encode(result.data),
+            "row_count": result.row_count,
+            "truncated": result.truncated,
+        }
+        return {"format": self.wire_format, "id": data_id, **encoder.pack(body)}
+    
+    def _chart_spec(self, sql: str, result: ColumnarResult) -> Optional[tuple[str, str, int]]:
+        """
+        确定图表类型、标题与指标列
+        
+        Returns:
+            (图表类型, 标题, 指标列下标)，不适合绘图时返回 None
+        """
+        if len(result.columns) < 2 or result.row_count == 0:
+            return None
+        
+        # 第一列作为维度，第一个数值列作为指标
+        value_index = next(
+            (i for i in range(1, len(result.columns)) if result.types[i] in ("integer", "real")),
+            None
+        )
+        if value_index is None:
+            return None
+        
+        # 分析 SQL 确定图表类型
+        sql_lower = sql.lower()
+        
+        # 包含 GROUP BY 的聚合查询适合柱状图或饼图
+        if "group by" in sql_lower:
+            # 如果数据量小于等于 6，使用饼图
+            if result.row_count <= 6:
+                chart_type = "pie"
             else:
-                # 默认使用柱状图
                 chart_type = "bar"
+        elif "order by" in sql_lower and "limit" in sql_lower:
+            # 排序后的 TOP N 查询适合柱状图
+            chart_type = "bar"
+        else:
+            # 默认使用柱状图
+            chart_type = "bar"
+        
+        return chart_type, self._extract_chart_title(sql), value_index
+    
+    def _generate_chart_config(self, sql: str, result: ColumnarResult) -> Optional[dict]:
+        """根据 SQL 和列式结果生成图表配置"""
+        try:
+            spec = self._chart_spec(sql, result)
+            if spec is None:
+                return None
+            chart_type, title, value_index = spec
             
             # 构建图表配置
-            chart_data = []
-            for row in rows:
-                chart_data.append({
-                    "name": row.get("name", ""),
-                    "value": row.get("value", 0)
-                })
-            
-            # 生成标题
-            title = self._extract_chart_title(sql)
+            chart_data = [
+                {"name": str(name), "value": value}
+                for name, value in zip(result.data[0], result.data[value_index])
+            ]
             
             return {
                 "type": chart_type,
@@ -334,6 +1302,33 @@ class SQLAgent:
         except Exception:
             return None
     
+    def _chart_reference(self, sql: str, result: ColumnarResult, data_id: int) -> Optional[dict]:
+        """
+        生成引用数据事件的图表配置（紧凑编码）
+        
+        不复制数据：source 为 DATA 事件（或流式结果头）的 id，x / y 为维度列与指标列下标，
+        limit 为参与绘图的前若干行（流式结果只取首块）。
+        """
+        try:
+            spec = self._chart_spec(sql, result)
+            if spec is None:
+                return None
+            chart_type, title, value_index = spec
+            
+            return {
+                "type": chart_type,
+                "title": title,
+                "source": data_id,
+                "x": 0,
+                "y": value_index,
+                "limit": len(result.data[0]),
+                "xField": result.columns[0],
+                "yField": result.columns[value_index],
+            }
+            
+        except Exception:
+            return None
+    
     def _extract_chart_title(self, sql: str) -> str:
         """从 SQL 提取图表标题"""
         sql_lower = sql.lower()
@@ -353,17 +1348,26 @@ class SQLAgent:
         return "查询结果"
 
 
-async def run_sql_agent(session_id: str, user_input: str) -> AsyncGenerator[SSEEvent, None]:
+async def run_sql_agent(
+    session_id: str,
+    user_input: str,
+    deadline: Optional[Deadline] = None,
+    trace: Optional[RequestTrace] = None,
+    wire_format: str = WIRE_ROWS
+) -> AsyncGenerator[SSEEvent, None]:
     """
     运行 SQL Agent 的便捷函数
     
     Args:
         session_id: 会话 ID
         user_input: 用户输入
+        deadline: 请求截止时间（客户端断开时由调用方取消）
+        trace: 请求耗时分解，None 表示不记录
+        wire_format: 查询结果的线上编码
     
     Yields:
         SSE 事件
     """
-    agent = SQLAgent(session_id)
+    agent = SQLAgent(session_id, deadline=deadline, trace=trace, wire_format=wire_format)
     async for event in agent.run(user_input):
         yield event
@@ -0,0 +1,492 @@
+"""
+SQL 执行前成本检查模块
+
+执行 Agent 生成的 SQL 之前先运行 EXPLAIN QUERY PLAN，结合表行数与 sqlite_stat1 统计
+估算需要扫描的行数：代价过高的查询直接拒绝，返回结构化提示让 LLM 改写；
+结果行数会超过取回上限的查询自动在末尾追加 LIMIT。
+单表聚合（没有更便宜的执行计划，加过滤条件会改变问题含义）超过上限时只计数不拒绝，
+由单条查询超时兜底；warn_only 模式下所有超限查询都只计数。
+"""
+import json
+import math
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.db.connection import TABLE_VERSIONS_TABLE
+
+
+# 成本检查结论
+ACTION_ALLOW = "allow"      # 直接执行
+ACTION_LIMIT = "limit"      # 追加 LIMIT 后执行
+ACTION_REJECT = "reject"    # 拒绝执行，返回提示
+
+# 无统计信息时，索引等值条件每多一列，估算行数缩小的倍数（与 SQLite 默认假设一致）
+_EQ_SELECTIVITY = 10
+# 范围条件（>、<、BETWEEN）的估算选择率
+_RANGE_SELECTIVITY = 4
+# 自动索引每个键的估算行数（SQLite 查询规划器的默认假设约 20 行）
+_AUTOMATIC_INDEX_ROWS = 20
+# 无统计信息时 GROUP BY / DISTINCT 的估算分组数
+_DEFAULT_GROUPS = 200
+
+# 计划明细中的表访问：SCAN / SEARCH <名称> [USING ...]
+_ACCESS_PATTERN = re.compile(r"^(SCAN|SEARCH) (\S+)(?: USING (.*))?$")
+_INDEX_PATTERN = re.compile(r"INDEX(?: (?!\()(\S+))?(?: \((.*)\))?")
+_LIMIT_PATTERN = re.compile(r"\blimit\b", re.IGNORECASE)
+_COMPOUND_PATTERN = re.compile(r"\b(?:union|except|intersect)\b", re.IGNORECASE)
+_GROUP_BY_PATTERN = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+_AGGREGATE_PATTERN = re.compile(r"\b(?:count|sum|avg|min|max|total|group_concat)\s*\(", re.IGNORECASE)
+_WINDOW_PATTERN = re.compile(r"\bover\b", re.IGNORECASE)
+
+# 别名解析时需要排除的关键字
+_KEYWORDS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "outer", "on",
+    "using", "group", "order", "limit", "union", "except", "intersect", "having", "window",
+    "as", "indexed", "not",
+}
+
+# 字符串字面量、带引号的标识符与注释（判断最外层语句结构时先去掉）
+_QUOTED_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# 语句末尾的空白与分号
+_TRAILING_PATTERN = re.compile(r"[\s;]*$")
+
+
+def _mask_quoted(sql: str) -> str:
+    """字符串字面量与带引号的标识符替换为等长的 x，注释替换为等长的空白（字符位置与原文一致）"""
+    def mask(match: re.Match) -> str:
+        text = match.group()
+        return (" " if text.startswith(("--", "/*")) else "x") * len(text)
+    return _QUOTED_PATTERN.sub(mask, sql)
+
+
+def _statement_body(sql: str) -> str:
+    """去掉语句末尾的空白、分号与注释（如 "SELECT ...; -- 说明"），以便在末尾追加子句"""
+    masked = _mask_quoted(sql)
+    return sql[:_TRAILING_PATTERN.search(masked).start()]
+
+
+def _top_level(sql: str) -> str:
+    """
+    提取最外层语句的文本
+
+    去掉字符串字面量、带引号的标识符与注释，并清空括号（子查询、CTE、函数参数）内的内容，
+    用于判断 LIMIT、UNION 等是否作用于整条语句。
+    """
+    text = _mask_quoted(sql)
+    chars = []
+    depth = 0
+    for ch in text:
+        if ch == "(":
+            if depth == 0:
+                chars.append(ch)
+            depth += 1
+        elif ch == ")":
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                chars.append(ch)
+        elif depth == 0:
+            chars.append(ch)
+    return "".join(chars)
+
+
+@dataclass
+class _PlanNode:
+    id: int
+    parent: int
+    detail: str
+    children: list["_PlanNode"] = field(default_factory=list)
+
+
+@dataclass
+class CostDecision:
+    """成本检查结果"""
+    action: str
+    sql: str                                        # 实际执行的 SQL（LIMIT 时为改写后的语句）
+    estimated_rows: int = 0                         # 估算扫描行数
+    estimated_output: int = 0                       # 估算结果行数
+    plan: list[str] = field(default_factory=list)   # EXPLAIN QUERY PLAN 明细
+    issues: list[dict] = field(default_factory=list)
+    hint: dict = field(default_factory=dict)
+
+    def to_hint(self) -> str:
+        """生成返回给 LLM 的结构化提示"""
+        return json.dumps(self.hint, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass
+class _Estimate:
+    work: float = 0.0       # 估算扫描（访问）行数
+    output: float = 1.0     # 估算输出行数
+
+
+class QueryCostGuard:
+    """
+    基于 EXPLAIN QUERY PLAN 的查询成本检查
+
+    表行数优先使用触发器维护的 _table_versions.row_count（实时、无需 COUNT(*)），
+    索引选择率使用 ANALYZE 生成的 sqlite_stat1（按当前行数等比缩放），
+    都不可用时退化为 max(rowid) 与 SQLite 默认假设。
+    嵌套循环连接按外层估算行数乘以内层每次访问的行数累计。
+    """
+
+    def __init__(self, max_rows_examined: int = 20000000, warn_only: bool = False):
+        """
+        初始化成本检查
+
+        Args:
+            max_rows_examined: 估算扫描行数上限，超过则拒绝执行（单表聚合除外）
+            warn_only: 超过上限时只计数、不拒绝执行
+        """
+        self.max_rows_examined = max_rows_examined
+        self.warn_only = warn_only
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+        self.limited = 0
+        self.warned = 0
+
+    def review(self, conn: sqlite3.Connection, sql: str, fetch_limit: Optional[int] = None) -> CostDecision:
+        """
+        检查一条查询
+
+        Args:
+            conn: 只读连接
+            sql: SQL 语句
+            fetch_limit: 调用方最多取回的行数，结果可能超过时自动添加 LIMIT
+
+        Returns:
+            成本检查结果；EXPLAIN 失败（语法错误等）时返回 allow，由执行阶段报告错误
+        """
+        tables: set[str] = set()
+
+        def authorizer(action, arg1, arg2, db_name, source):
+            if action == sqlite3.SQLITE_READ and arg1:
+                tables.add(arg1)
+            return sqlite3.SQLITE_OK
+
+        conn.set_authorizer(authorizer)
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.Error:
+            return CostDecision(action=ACTION_ALLOW, sql=sql)
+        finally:
+            conn.set_authorizer(None)
+
+        roots = self._build_tree(rows)
+        stats = _TableStats(conn, tables - {TABLE_VERSIONS_TABLE}, sql)
+        issues: list[dict] = []
+        estimate = self._estimate(roots, stats, issues, loops=1.0, derived={})
+        if stats.aggregated and not stats.grouped_top:
+            # 不带 GROUP BY 的聚合（如 SELECT COUNT(*) FROM sales）只输出一行
+            estimate.output = 1.0
+
+        decision = CostDecision(
+            action=ACTION_ALLOW,
+            sql=sql,
+            estimated_rows=int(estimate.work),
+            estimated_output=int(estimate.output),
+            plan=[row[3] for row in rows],
+            issues=issues,
+        )
+
+        over_limit = estimate.work > self.max_rows_examined
+        if over_limit and not self.warn_only and not self._is_single_table_aggregate(decision.plan, stats):
+            decision.action = ACTION_REJECT
+            decision.hint = self._reject_hint(decision, stats)
+        elif fetch_limit and estimate.output > fetch_limit and self._can_append_limit(sql):
+            # 调用方最多只取回 fetch_limit 行：加 LIMIT 不改变返回的数据，但 SQLite 可提前结束、
+            # ORDER BY 可改用有界排序。直接追加在语句末尾而不是包一层子查询，
+            # 否则重名的结果列（如连接后的两个 id）会被 SQLite 改名为 id:1
+            decision.action = ACTION_LIMIT
+            decision.sql = f"{_statement_body(sql)}\nLIMIT {fetch_limit}"
+            decision.hint = {
+                "action": ACTION_LIMIT,
+                "limit": fetch_limit,
+                "estimated_output_rows": decision.estimated_output,
+                "message": f"结果预计约 {decision.estimated_output} 行，已自动限制为前 {fetch_limit} 行",
+            }
+
+        with self._lock:
+            self.checked += 1
+            if decision.action == ACTION_REJECT:
+                self.rejected += 1
+            elif decision.action == ACTION_LIMIT:
+                self.limited += 1
+            if over_limit and decision.action != ACTION_REJECT:
+                self.warned += 1
+        return decision
+
+    @staticmethod
+    def _can_append_limit(sql: str) -> bool:
+        """语句是否可以直接追加 LIMIT：最外层没有 LIMIT，也不是 UNION 等复合查询"""
+        top = _top_level(sql)
+        return not _LIMIT_PATTERN.search(top) and not _COMPOUND_PATTERN.search(top)
+
+    @staticmethod
+    def _is_single_table_aggregate(plan: list[str], stats: "_TableStats") -> bool:
+        """
+        是否为只访问一次单表的聚合查询
+
+        这类查询（如按类别汇总全部销售额）必须读完整张表，没有更便宜的计划，
+        要求 LLM 加过滤条件只会改变问题的含义，因此不拒绝，交给单条查询超时处理。
+        """
+        accesses = [d for d in plan if _ACCESS_PATTERN.match(d) and d != "SCAN CONSTANT ROW"]
+        return (stats.aggregated or stats.grouped_top) and len(accesses) == 1
+
+    @staticmethod
+    def _build_tree(rows: list) -> list[_PlanNode]:
+        """把 EXPLAIN QUERY PLAN 的 (id, parent, notused, detail) 行组装成树"""
+        nodes: dict[int, _PlanNode] = {}
+        roots: list[_PlanNode] = []
+        for row in rows:
+            node = _PlanNode(id=row[0], parent=row[1], detail=row[3])
+            nodes[node.id] = node
+            parent = nodes.get(node.parent)
+            (parent.children if parent is not None else roots).append(node)
+        return roots
+
+    def _estimate(
+        self,
+        nodes: list[_PlanNode],
+        stats: "_TableStats",
+        issues: list[dict],
+        loops: float,
+        derived: dict[str, float]
+    ) -> _Estimate:
+        """
+        估算一组同级计划节点的代价
+
+        同级的表访问节点构成嵌套循环：每个节点的访问次数为前面各节点输出行数之积。
+
+        Args:
+            nodes: 同级节点
+            stats: 表统计信息
+            issues: 收集到的问题（全表扫描、无索引连接等）
+            loops: 这组节点整体被执行的次数（相关子查询为外层行数）
+            derived: 物化子查询 / CTE 名称 -> 估算行数
+        """
+        result = _Estimate(work=0.0, output=1.0)
+        accessed = 0
+        groups: Optional[float] = None
+
+        for node in nodes:
+            detail = node.detail
+            access = _ACCESS_PATTERN.match(detail)
+
+            if access and detail != "SCAN CONSTANT ROW":
+                kind, name, using = access.group(1), access.group(2), access.group(3) or ""
+                table = stats.resolve(name)
+                total = derived.get(name, stats.row_count(table) if table else 1000.0)
+                per_access = self._access_rows(kind, using, table, total, stats)
+
+                outer = loops * result.output
+                result.work += outer * per_access
+                if "AUTOMATIC" in using:
+                    # 自动索引：每次执行先扫描整表建索引
+                    result.work += loops * total
+                result.output *= max(per_access, 1.0)
+
+                index = _INDEX_PATTERN.search(using)
+                if kind == "SCAN" and index and index.group(1) and table and stats.grouped:
+                    # 按索引顺序扫描完成 GROUP BY：分组数即索引首列的不同值个数
+                    groups = stats.distinct_values(table, index.group(1), total)
+
+                if kind == "SCAN" and total >= 1000:
+                    issues.append({
+                        "type": "nested_scan" if accessed else "full_scan",
+                        "table": table or name,
+                        "rows": int(total),
+                        "loops": int(outer),
+                        "detail": detail,
+                    })
+                accessed += 1
+
+            elif detail.startswith(("MATERIALIZE", "CO-ROUTINE")):
+                sub = self._estimate(node.children, stats, issues, loops=1.0, derived=derived)
+                result.work += sub.work
+                derived[detail.split(" ", 1)[-1]] = sub.output
+
+            elif detail.startswith("CORRELATED"):
+                # 相关子查询：外层每一行执行一次
+                sub = self._estimate(node.children, stats, issues, loops=loops * result.output, derived=derived)
+                result.work += sub.work
+
+            elif detail.startswith("COMPOUND"):
+                output = 0.0
+                for part in node.children:
+                    sub = self._estimate(part.children, stats, issues, loops=loops, derived=derived)
+                    result.work += sub.work
+                    output += sub.output
+                result.output *= max(output, 1.0)
+
+            elif detail.startswith("USE TEMP B-TREE"):
+                # 排序 / 分组 / 去重：n·log(n) 次比较，按行数折算
+                n = loops * result.output
+                result.work += n * math.log2(n + 1) / 16
+                if ("GROUP BY" in detail or "DISTINCT" in detail) and groups is None:
+                    groups = _DEFAULT_GROUPS
+
+            elif node.children:
+                # 非相关子查询（SCALAR / LIST SUBQUERY 等）只执行一次
+                sub = self._estimate(node.children, stats, issues, loops=1.0, derived=derived)
+                result.work += sub.work
+
+        if groups is not None:
+            result.output = min(result.output, max(groups, 1.0))
+        return result
+
+    @staticmethod
+    def _access_rows(kind: str, using: str, table: Optional[str], total: float, stats: "_TableStats") -> float:
+        """估算一次表访问返回的行数"""
+        if kind == "SCAN":
+            return total
+        if "PRIMARY KEY" in using:
+            return 1.0 if "=" in using and ">" not in using and "<" not in using else total / _RANGE_SELECTIVITY
+
+        index = _INDEX_PATTERN.search(using)
+        constraint = index.group(2) or "" if index else ""
+        eq_columns = constraint.count("=") - constraint.count(">=") - constraint.count("<=")
+        has_range = any(op in constraint for op in (">", "<"))
+
+        rows = None
+        if "AUTOMATIC" in using and eq_columns:
+            rows = min(total, _AUTOMATIC_INDEX_ROWS)
+        elif index and index.group(1) and table:
+            rows = stats.index_rows(table, index.group(1), eq_columns, total)
+        if rows is None:
+            rows = total / (_EQ_SELECTIVITY ** eq_columns) if eq_columns else total
+        if has_range:
+            rows /= _RANGE_SELECTIVITY
+        return max(rows, 1.0)
+
+    def _reject_hint(self, decision: CostDecision, stats: "_TableStats") -> dict:
+        """生成拒绝执行时的结构化提示"""
+        suggestions = []
+        types = {issue["type"] for issue in decision.issues}
+        if "nested_scan" in types:
+            suggestions.append("存在无索引的连接或笛卡尔积：为 JOIN 补充 ON 条件，并尽量在有索引的列上关联")
+        if "full_scan" in types:
+            suggestions.append("大表全表扫描：在 WHERE 中使用有索引的列过滤，或缩小时间范围")
+        suggestions.append("先在子查询中聚合再关联，只选择需要的列，并添加 LIMIT")
+
+        return {
+            "action": ACTION_REJECT,
+            "reason": "查询预计扫描行数超过上限，未执行",
+            "estimated_rows_examined": decision.estimated_rows,
+            "max_rows_examined": self.max_rows_examined,
+            "plan": decision.plan,
+            "issues": decision.issues,
+            "indexes": stats.indexes({issue["table"] for issue in decision.issues}),
+            "suggestions": suggestions,
+        }
+
+    def stats(self) -> dict:
+        """检查统计信息"""
+        with self._lock:
+            return {
+                "max_rows_examined": self.max_rows_examined,
+                "checked": self.checked,
+                "rejected": self.rejected,
+                "limited": self.limited,
+                "warned": self.warned,
+                "warn_only": self.warn_only,
+            }
+
+
+class _TableStats:
+    """一次检查中用到的表行数、索引统计与别名映射"""
+
+    def __init__(self, conn: sqlite3.Connection, tables: set[str], sql: str):
+        self._conn = conn
+        self._tables = tables
+        self._counts: dict[str, float] = {}
+        self._aliases = self._parse_aliases(sql, tables)
+        self.grouped = bool(_GROUP_BY_PATTERN.search(sql))
+        # 最外层语句是否分组 / 是否为聚合查询（窗口函数不减少行数，不算聚合）
+        top = _top_level(sql)
+        self.grouped_top = bool(_GROUP_BY_PATTERN.search(top))
+        self.aggregated = bool(_AGGREGATE_PATTERN.search(top)) and not _WINDOW_PATTERN.search(top)
+
+        # sqlite_stat1: (表, 索引) -> [总行数, 第 1 列每个值平均行数, 前 2 列..., ...]
+        self._stat1: dict[tuple[str, Optional[str]], list[int]] = {}
+        if tables:
+            try:
+                for tbl, idx, stat in conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+                    if tbl in tables:
+                        self._stat1[(tbl, idx)] = [int(v) for v in stat.split() if v.isdigit()]
+            except sqlite3.OperationalError:
+                pass  # 尚未 ANALYZE
+
+    @staticmethod
+    def _parse_aliases(sql: str, tables: set[str]) -> dict[str, str]:
+        """从 SQL 文本中解析「表名 [AS] 别名」"""
+        aliases = {}
+        for table in tables:
+            pattern = re.compile(
+                rf'(?<![\w"`\]])["`\[]?{re.escape(table)}["`\]]?\s+(?:as\s+)?["`\[]?(\w+)',
+                re.IGNORECASE,
+            )
+            for match in pattern.finditer(sql):
+                alias = match.group(1)
+                if alias.lower() not in _KEYWORDS:
+                    aliases[alias] = table
+        return aliases
+
+    def resolve(self, name: str) -> Optional[str]:
+        """计划中的名称（表名或别名）解析为表名"""
+        if name in self._tables:
+            return name
+        return self._aliases.get(name)
+
+    def row_count(self, table: str) -> float:
+        """表的当前行数"""
+        if table in self._counts:
+            return self._counts[table]
+
+        count = None
+        try:
+            row = self._conn.execute(
+                f"SELECT row_count FROM {TABLE_VERSIONS_TABLE} WHERE table_name = ?", (table,)
+            ).fetchone()
+            count = row[0] if row else None
+        except sqlite3.OperationalError:
+            pass
+        if count is None:
+            stat = next((v for (tbl, _), v in self._stat1.items() if tbl == table and v), None)
+            count = stat[0] if stat else None
+        if count is None:
+            try:
+                count = self._conn.execute(f'SELECT max(rowid) FROM "{table}"').fetchone()[0]
+            except sqlite3.OperationalError:
+                count = None
+
+        self._counts[table] = float(count if count is not None else 1000)
+        return self._counts[table]
+
+    def index_rows(self, table: str, index: str, eq_columns: int, total: float) -> Optional[float]:
+        """按 sqlite_stat1 估算索引前 eq_columns 列等值匹配的行数（按当前行数等比缩放）"""
+        stat = self._stat1.get((table, index))
+        if not stat or eq_columns <= 0 or eq_columns >= len(stat) or stat[0] <= 0:
+            return None
+        return stat[eq_columns] * total / stat[0]
+
+    def distinct_values(self, table: str, index: str, total: float) -> Optional[float]:
+        """按 sqlite_stat1 估算索引首列的不同值个数"""
+        stat = self._stat1.get((table, index))
+        if not stat or len(stat) < 2 or stat[1] <= 0:
+            return None
+        return total / stat[1]
+
+    def indexes(self, tables: set[str]) -> dict[str, list[str]]:
+        """列出表上已有的索引及其列，用于提示 LLM"""
+        result = {}
+        for table in sorted(t for t in tables if t in self._tables):
+            entries = []
+            for index in self._conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+                columns = [col[2] for col in self._conn.execute(f'PRAGMA index_info("{index[1]}")')]
+                entries.append(f"{index[1]}({', '.join(c for c in columns if c)})")
+            result[table] = entries
+        return result
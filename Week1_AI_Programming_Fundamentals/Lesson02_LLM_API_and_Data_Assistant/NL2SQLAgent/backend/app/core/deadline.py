@@ -0,0 +1,273 @@
+"""
+请求截止时间与取消模块
+
+每个聊天请求持有一个 Deadline：超时或客户端断开时触发，
+唤醒正在等待的 LLM 调用与工具结果，并中断正在执行的 SQLite 查询。
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+
+# 触发原因
+REASON_TIMEOUT = "timeout"          # 请求超过截止时间
+REASON_CANCELLED = "cancelled"      # 客户端断开等主动取消
+REASON_QUERY_TIMEOUT = "query_timeout"  # 单条 SQL 超过查询超时（只中断该查询，请求继续）
+
+# SQLite 每执行多少条虚拟机指令检查一次是否需要中断
+_PROGRESS_OPS = 1000
+
+# 异步迭代桥接队列中的消息类型
+_ITEM, _ERROR, _DONE = "item", "error", "done"
+
+
+class DeadlineExceeded(Exception):
+    """请求超时或已被取消"""
+
+    def __init__(self, reason: str, timeout: Optional[float] = None):
+        self.reason = reason
+        self.timeout = timeout
+        if reason == REASON_TIMEOUT:
+            message = f"请求超时（超过 {timeout:g} 秒），已停止处理"
+        else:
+            message = "请求已取消"
+        super().__init__(message)
+
+
+class QueryInterruptedError(sqlite3.OperationalError):
+    """SQL 执行超时或随请求取消而被中断"""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class Deadline:
+    """
+    请求截止时间
+
+    异步侧：wait() / iterate() 在触发时立即返回 DeadlineExceeded，不必等正在进行的调用结束；
+    线程侧：guard() 为 SQLite 连接安装进度回调，并在触发时调用 interrupt() 中断当前语句。
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        初始化截止时间
+
+        Args:
+            timeout: 超时秒数，None 或 0 表示不限时（仍可取消）
+        """
+        self.timeout = timeout or None
+        self.expires_at = time.monotonic() + self.timeout if self.timeout else None
+        self.reason: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._connections: set[sqlite3.Connection] = set()
+        self._callbacks: set[Callable[[], None]] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数，不限时返回 None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def triggered(self) -> bool:
+        """是否已超时或被取消（线程安全，可在工作线程中调用）"""
+        if self.reason is None and self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self.reason = REASON_TIMEOUT
+        return self.reason is not None
+
+    def error(self) -> DeadlineExceeded:
+        """生成对应触发原因的异常"""
+        return DeadlineExceeded(self.reason or REASON_TIMEOUT, self.timeout)
+
+    def check(self):
+        """
+        已触发时抛出异常
+
+        Raises:
+            DeadlineExceeded: 请求超时或已被取消
+        """
+        if self.triggered:
+            raise self.error()
+
+    def cancel(self, reason: str = REASON_CANCELLED):
+        """主动取消（在事件循环中调用）"""
+        self._trigger(reason)
+
+    def _trigger(self, reason: str):
+        """触发：中断正在执行的 SQL，唤醒所有等待方"""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            # 持锁中断：guard() 退出时在同一把锁下注销连接，之后连接才会归还连接池，
+            # 因此不会中断到已被其他请求借走的连接
+            for conn in self._connections:
+                conn.interrupt()
+            callbacks = list(self._callbacks)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        for callback in callbacks:
+            callback()
+
+    def _arm_timer(self):
+        """首次异步等待时在事件循环上安排超时回调"""
+        if self._timer is not None or self.expires_at is None or self.reason is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_at(
+            loop.time() + (self.remaining() or 0.0),
+            self._trigger,
+            REASON_TIMEOUT,
+        )
+
+    async def wait(self, awaitable: Awaitable[Any]) -> Any:
+        """
+        等待一个协程，超时或取消时立即放弃
+
+        Args:
+            awaitable: 协程或 Future
+
+        Returns:
+            协程返回值
+
+        Raises:
+            DeadlineExceeded: 请求超时或已被取消（协程会被取消）
+        """
+        task = asyncio.ensure_future(awaitable)
+        if self.triggered:
+            task.cancel()
+            raise self.error()
+
+        waiter = asyncio.get_running_loop().create_future()
+
+        def wake():
+            if not waiter.done():
+                waiter.set_result(None)
+
+        self._callbacks.add(wake)
+        self._arm_timer()
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            task.cancel()
+            raise
+        finally:
+            self._callbacks.discard(wake)
+
+        if task.done():
+            return task.result()
+        task.cancel()
+        raise self.error()
+
+    async def iterate(self, source: AsyncIterable[Any]) -> AsyncIterator[Any]:
+        """
+        异步迭代 source，超时或取消时立即停止
+
+        source 在单独的任务中迭代（整个迭代过程始终在同一个任务内），
+        产出经容量为 1 的队列转交：消费方不取时 source 也随之暂停，
+        工具线程桥接队列的背压因此一直传递到 SSE 客户端；触发时取消该任务并抛出 DeadlineExceeded。
+
+        Raises:
+            DeadlineExceeded: 请求超时或已被取消
+        """
+        self.check()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        waiter = loop.create_future()
+
+        async def pump():
+            try:
+                async for item in source:
+                    await queue.put((_ITEM, item))
+            except Exception as e:
+                await queue.put((_ERROR, e))
+            else:
+                await queue.put((_DONE, None))
+            finally:
+                aclose = getattr(source, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+        def wake():
+            if not waiter.done():
+                waiter.set_result(None)
+
+        producer = loop.create_task(pump())
+        self._callbacks.add(wake)
+        self._arm_timer()
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                try:
+                    await asyncio.wait({getter, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                except BaseException:
+                    getter.cancel()
+                    raise
+                if waiter.done():
+                    getter.cancel()
+                    raise self.error()
+
+                kind, value = getter.result()
+                if kind == _ITEM:
+                    yield value
+                elif kind == _ERROR:
+                    raise value
+                else:
+                    return
+        finally:
+            self._callbacks.discard(wake)
+            if not producer.done():
+                producer.cancel()
+
+    @contextmanager
+    def guard(self, conn: sqlite3.Connection, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        在连接上执行 SQL 期间使其可被中断（可在工作线程中调用）
+
+        安装 SQLite 进度回调：语句超过 timeout 秒或请求被触发时返回非零，SQLite 立即中止语句；
+        同时登记连接，取消时直接 interrupt()。
+
+        Args:
+            conn: SQLite 连接
+            timeout: 单条查询的超时秒数，None 表示只受请求截止时间限制
+
+        Raises:
+            QueryInterruptedError: 语句被中断
+        """
+        query_expires = time.monotonic() + timeout if timeout else None
+        timed_out = False
+
+        def progress() -> int:
+            nonlocal timed_out
+            if query_expires is not None and time.monotonic() >= query_expires:
+                timed_out = True
+                return 1
+            return 1 if self.triggered else 0
+
+        conn.set_progress_handler(progress, _PROGRESS_OPS)
+        with self._lock:
+            self._connections.add(conn)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if "interrupt" not in str(e).lower():
+                raise
+            if timed_out and not self.triggered:
+                raise QueryInterruptedError(
+                    f"查询执行超过 {timeout:g} 秒被中断，请缩小查询范围（增加筛选条件、聚合或 LIMIT）后重试",
+                    REASON_QUERY_TIMEOUT,
+                ) from e
+            raise QueryInterruptedError(f"查询已中断：{self.error()}", self.reason or REASON_CANCELLED) from e
+        finally:
+            # 必须在连接归还连接池之前注销（与 _trigger 使用同一把锁）
+            with self._lock:
+                self._connections.discard(conn)
+            conn.set_progress_handler(None, 0)
@@ -0,0 +1,204 @@
+"""
+Agent 工具线程池模块
+
+工具调用（SQL 查询、表结构读取等）都是阻塞的数据库操作，统一放到有界线程池中执行，
+事件循环只负责等待结果和推送事件。
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from app.config import get_settings
+
+
+# 生成器桥接队列中的消息类型
+_ITEM, _ERROR, _DONE = "item", "error", "done"
+
+
+class ToolStalledError(Exception):
+    """消费方长时间不接收工具产出（如 SSE 客户端过慢），工具已停止以释放工作线程"""
+
+
+class ToolExecutor:
+    """
+    进程级有界工具线程池
+
+    run() 在线程池中执行一个阻塞函数；iterate() 在线程池中运行一个同步生成器，
+    通过有界队列把产出逐个交给事件循环（队列满时工作线程等待，内存占用不随结果增长）。
+    线程池按提交顺序（FIFO）调度，调用方按提交顺序消费时不会互相等待而死锁。
+    线程池由所有请求共享：为避免少数慢速客户端占满工作线程（及其持有的数据库连接），
+    队列满时的等待可设上限，超时后工具停止，消费方收到 ToolStalledError。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        初始化线程池
+
+        Args:
+            max_workers: 最大工作线程数
+        """
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """按需创建线程池（shutdown 之后再次使用时重新创建）"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="agent-tool",
+                )
+            return self._executor
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        在线程池中执行阻塞函数
+
+        Args:
+            func: 阻塞函数
+            *args: 位置参数
+
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def submit_iter(
+        self,
+        factory: Callable[[], Iterator[Any]],
+        maxsize: int = 4,
+        stall_timeout: Optional[float] = None,
+    ) -> "_ThreadedIterator":
+        """
+        立即在线程池中启动一个同步生成器，返回可异步迭代的句柄
+
+        Args:
+            factory: 返回同步迭代器的函数（在工作线程中调用）
+            maxsize: 桥接队列容量
+            stall_timeout: 队列满时工作线程最多等待的秒数，超时后停止生成器，None 表示不限
+
+        Returns:
+            异步迭代句柄，必须迭代完或调用 aclose()
+        """
+        return _ThreadedIterator(self._get_executor(), factory, maxsize, stall_timeout)
+
+    def iterate(
+        self,
+        factory: Callable[[], Iterator[Any]],
+        maxsize: int = 4,
+        stall_timeout: Optional[float] = None,
+    ) -> AsyncIterator[Any]:
+        """在线程池中运行同步生成器并异步迭代其产出"""
+        return self.submit_iter(factory, maxsize, stall_timeout).__aiter__()
+
+    def shutdown(self):
+        """关闭线程池（不等待正在执行的任务）"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class _ThreadedIterator:
+    """在工作线程中运行的同步生成器的异步视图"""
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        factory: Callable[[], Iterator[Any]],
+        maxsize: int,
+        stall_timeout: Optional[float] = None,
+    ):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, maxsize))
+        self._stall_timeout = stall_timeout
+        self._stop = threading.Event()
+        self._finished = False
+        self._future = executor.submit(self._produce, factory)
+
+    def _put(self, message: tuple) -> bool:
+        """从工作线程放入一条消息；消费方已放弃、等待超时或事件循环已关闭时返回 False"""
+        put = self._queue.put(message)
+        try:
+            future = asyncio.run_coroutine_threadsafe(put, self._loop)
+        except RuntimeError:
+            put.close()
+            return False
+        expires = time.monotonic() + self._stall_timeout if self._stall_timeout else None
+        while True:
+            try:
+                future.result(timeout=1.0 if expires is None else max(0.0, min(1.0, expires - time.monotonic())))
+                return not self._stop.is_set()
+            except concurrent.futures.TimeoutError:
+                if self._stop.is_set() or self._loop.is_closed():
+                    future.cancel()
+                    return False
+                if expires is not None and time.monotonic() >= expires:
+                    future.cancel()
+                    self._stalled()
+                    return False
+
+    def _stalled(self):
+        """等待超时：停止生产，并在队列腾出位置后把 ToolStalledError 交给消费方"""
+        self._stop.set()
+        error = ToolStalledError(f"客户端超过 {self._stall_timeout:g} 秒未接收数据，已停止执行")
+        put = self._queue.put((_ERROR, error))
+        try:
+            asyncio.run_coroutine_threadsafe(put, self._loop)
+        except RuntimeError:
+            put.close()
+
+    def _produce(self, factory: Callable[[], Iterator[Any]]):
+        """工作线程：逐个产出并放入队列，结束时关闭生成器"""
+        iterator = None
+        try:
+            iterator = factory()
+            for item in iterator:
+                if not self._put((_ITEM, item)):
+                    return
+        except BaseException as e:
+            self._put((_ERROR, e))
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        self._put((_DONE, None))
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        try:
+            while True:
+                kind, value = await self._queue.get()
+                if kind == _DONE:
+                    self._finished = True
+                    return
+                if kind == _ERROR:
+                    self._finished = True
+                    raise value
+                yield value
+        finally:
+            if not self._finished:
+                self.cancel()
+
+    def cancel(self):
+        """放弃迭代：通知工作线程停止并清空队列，使其尽快结束"""
+        self._stop.set()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def aclose(self):
+        """放弃迭代（未消费的产出直接丢弃）"""
+        if not self._finished:
+            self.cancel()
+
+
+# 全局工具线程池实例
+tool_executor = ToolExecutor(max_workers=get_settings().agent_tool_workers)
@@ -0,0 +1,565 @@
+"""
+索引顾问模块
+
+从查询日志中取出 Agent 实际执行的负载，解析 WHERE / JOIN ON / GROUP BY / ORDER BY 用到的列，
+生成候选复合索引；在数据库的临时副本上逐个建索引并回放负载，只推荐确实带来加速的索引，
+确认后可应用到正式数据库。
+"""
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+from app.config import get_settings
+from app.core.deadline import Deadline, QueryInterruptedError
+from app.db.connection import INTERNAL_TABLES, ConnectionPool, get_connection_pool, get_query_pool
+from app.db.query_log import QueryLog, query_log
+
+
+# 复合索引的最大列数
+_MAX_INDEX_COLUMNS = 4
+# 回放时每次 fetchmany 的行数
+_FETCH_BATCH = 1000
+# 副本上重建统计信息时每个索引采样的行数（PRAGMA analysis_limit），只用于比较候选索引
+_ANALYSIS_LIMIT = 1000
+
+_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'"           # 字符串
+    r'|"(?:[^"]|"")*"'          # 带引号的标识符
+    r"|`[^`]*`|\[[^\]]*\]"
+    r"|\w+"                     # 标识符、关键字、数字
+    r"|<=|>=|<>|!=|==|\|\|"
+    r"|\S"
+)
+
+# 比较运算：等值（可作为索引前缀）与范围（只能作为索引最后一列）
+_EQ_OPERATORS = {"=", "==", "in", "is"}
+_RANGE_OPERATORS = {"<", ">", "<=", ">=", "between", "like", "glob"}
+
+# 切换子句的关键字
+_CLAUSES = {
+    "select": "select", "from": "from", "join": "from", "where": "where", "on": "on",
+    "having": "having", "limit": "limit", "union": "select", "except": "select",
+    "intersect": "select", "window": "limit", "values": "limit",
+}
+
+# 不是列名的关键字
+_KEYWORDS = set(_CLAUSES) | {
+    "and", "or", "not", "in", "is", "null", "between", "like", "glob", "as", "asc", "desc",
+    "distinct", "all", "case", "when", "then", "else", "end", "group", "order", "by", "inner",
+    "left", "right", "full", "outer", "cross", "natural", "using", "exists", "with", "recursive",
+    "cast", "collate", "escape", "offset", "nulls", "first", "last", "over", "partition",
+    "true", "false", "current_date", "current_time", "current_timestamp", "indexed",
+}
+
+
+@dataclass
+class IndexCandidate:
+    """候选索引及其在临时副本上的回放结果"""
+    table: str
+    columns: list[str]
+    name: str
+    queries: list[str] = field(default_factory=list)    # 受益查询的指纹
+    executions: int = 0                                 # 受益查询在日志中的执行次数
+    baseline_ms: float = 0.0                            # 受影响负载总耗时（执行次数 × 单次中位数）
+    indexed_ms: float = 0.0                             # 建索引后的总耗时
+    improvement: float = 0.0                            # 加速比例
+    build_ms: float = 0.0                               # 在副本上建索引的耗时
+    used: bool = False                                  # 查询计划是否用到该索引
+    recommended: bool = False
+
+    @property
+    def ddl(self) -> str:
+        """建索引语句"""
+        columns = ", ".join(f'"{col}"' for col in self.columns)
+        return f'CREATE INDEX IF NOT EXISTS "{self.name}" ON "{self.table}" ({columns})'
+
+
+@dataclass
+class AdvisorReport:
+    """索引顾问分析结果"""
+    queries: int = 0                # 分析的查询数（按指纹去重）
+    executions: int = 0             # 这些查询的执行次数
+    skipped: int = 0                # 回放失败（表结构已变化等）而跳过的查询数
+    candidates: list[IndexCandidate] = field(default_factory=list)
+    applied: list[dict] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def recommended(self) -> list[IndexCandidate]:
+        return [c for c in self.candidates if c.recommended]
+
+    def to_dict(self) -> dict:
+        return {
+            "queries": self.queries,
+            "executions": self.executions,
+            "skipped": self.skipped,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "candidates": [
+                {**asdict(c), "ddl": c.ddl, "improvement": round(c.improvement, 4),
+                 "baseline_ms": round(c.baseline_ms, 3), "indexed_ms": round(c.indexed_ms, 3),
+                 "build_ms": round(c.build_ms, 1)}
+                for c in self.candidates
+            ],
+            "applied": self.applied,
+        }
+
+
+@dataclass
+class _Workload:
+    fingerprint: str
+    sql: str
+    executions: int
+    tables: set[str] = field(default_factory=set)
+    baseline_ms: Optional[float] = None
+
+
+def index_name(table: str, columns: list[str]) -> str:
+    """顾问生成的索引名：idx_adv_<表>_<列>..."""
+    name = "_".join([table, *columns])
+    return "idx_adv_" + re.sub(r"\W", "_", name).lower()
+
+
+def extract_column_usage(sql: str, columns: dict[str, set[str]]) -> dict[str, dict[str, list[str]]]:
+    """
+    解析一条 SQL 中各表在谓词、连接与分组排序里用到的列
+
+    Args:
+        sql: SQL 语句
+        columns: 语句涉及的表 -> 列名集合（小写）
+
+    Returns:
+        {表名: {"eq": [...], "range": [...], "join": [...], "group": [...], "order": [...]}}，
+        列按出现顺序去重；join 为与其他列等值比较的连接列
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        text = match.group(0)
+        if text[0] == "'" or text[0].isdigit():
+            tokens.append(("lit", text))
+        elif text[0] in "\"`[":
+            tokens.append(("id", text[1:-1]))
+        elif re.match(r"\w", text):
+            tokens.append(("word", text))
+        else:
+            tokens.append(("op", text))
+
+    tables = {name.lower(): name for name in columns}
+    aliases: dict[str, str] = {}
+    usage: dict[str, dict[str, list[str]]] = {}
+
+    def add(table: str, kind: str, column: str):
+        bucket = usage.setdefault(table, {"eq": [], "range": [], "join": [], "group": [], "order": []})[kind]
+        if column not in bucket:
+            bucket.append(column)
+
+    def is_name(i: int) -> bool:
+        kind, text = tokens[i]
+        return kind == "id" or (kind == "word" and text.lower() not in _KEYWORDS)
+
+    def column_at(i: int) -> tuple[Optional[tuple[str, str]], int]:
+        """位置 i 处的列引用 -> ((表, 列), 下一个位置)"""
+        if i >= len(tokens) or not is_name(i):
+            return None, i + 1
+        qualifier, name, end = None, tokens[i][1], i + 1
+        if end + 1 < len(tokens) and tokens[end][1] == "." and is_name(end + 1):
+            qualifier, name, end = name, tokens[end + 1][1], end + 2
+        if end < len(tokens) and tokens[end][1] == "(":
+            return None, end        # 函数调用
+        column = name.lower()
+        if qualifier is not None:
+            table = tables.get(qualifier.lower()) or aliases.get(qualifier.lower())
+            if table is None or column not in columns[table]:
+                return None, end
+            return (table, column), end
+        owners = [table for table, cols in columns.items() if column in cols]
+        return ((owners[0], column) if len(owners) == 1 else None), end
+
+    def operator_at(i: int) -> Optional[str]:
+        if i >= len(tokens):
+            return None
+        text = tokens[i][1].lower()
+        if text == "not" or (text == "is" and i + 1 < len(tokens) and tokens[i + 1][1].lower() == "not"):
+            return None
+        if text in _EQ_OPERATORS:
+            return "eq"
+        if text in _RANGE_OPERATORS:
+            return "range"
+        return None
+
+    # 每层括号一个子句状态
+    stack = ["select"]
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        low = text.lower()
+
+        if text == "(":
+            stack.append(stack[-1])
+            i += 1
+            continue
+        if text == ")":
+            if len(stack) > 1:
+                stack.pop()
+            i += 1
+            continue
+        if kind == "word" and low in ("group", "order") and i + 1 < len(tokens) and tokens[i + 1][1].lower() == "by":
+            stack[-1] = low
+            i += 2
+            continue
+        if kind == "word" and low in _CLAUSES:
+            stack[-1] = _CLAUSES[low]
+            i += 1
+            continue
+
+        clause = stack[-1]
+        if clause == "from":
+            # FROM / JOIN 中的「表名 [AS] 别名」
+            if kind in ("word", "id") and low in tables:
+                j = i + 1
+                if j < len(tokens) and tokens[j][1].lower() == "as":
+                    j += 1
+                if j < len(tokens) and is_name(j) and tokens[j][1].lower() not in tables:
+                    aliases[tokens[j][1].lower()] = tables[low]
+                    i = j
+            i += 1
+            continue
+
+        if clause in ("where", "on", "group", "order") and is_name(i):
+            ref, end = column_at(i)
+            if ref is None:
+                i = end
+                continue
+            table, column = ref
+            if clause in ("group", "order"):
+                add(table, clause, column)
+            else:
+                op = operator_at(end)
+                joined = op == "eq" and end + 1 < len(tokens) and is_name(end + 1)
+                if op is None and i >= 2:
+                    # 「值 运算符 列」或「列 = 列」（连接条件的右侧）
+                    op = operator_at(i - 1)
+                    joined = op == "eq" and is_name(i - 2)
+                if op is not None:
+                    add(table, "join" if joined else op, column)
+            i = end
+            continue
+
+        i += 1
+
+    return usage
+
+
+def candidate_columns(usage: dict[str, list[str]]) -> list[list[str]]:
+    """
+    由一张表的列用法生成候选索引列序
+
+    等值列在前，范围列只能放在最后；没有范围条件时，分组 / 排序列可接在等值列之后。
+    作为连接内表时按连接列查找，连接列放在最前。
+    """
+    eq, ranges = usage["eq"], [c for c in usage["range"] if c not in usage["eq"]]
+    candidates = []
+    for prefix in ([], usage["join"]):
+        if prefix or eq or ranges:
+            cols = (prefix + [c for c in eq if c not in prefix])[:_MAX_INDEX_COLUMNS]
+            if ranges and len(cols) < _MAX_INDEX_COLUMNS:
+                cols = cols + ranges[:1]
+            candidates.append(cols)
+    if not ranges:
+        for kind in ("group", "order"):
+            if usage[kind]:
+                cols = (eq + [c for c in usage[kind] if c not in eq])[:_MAX_INDEX_COLUMNS]
+                candidates.append(cols)
+
+    unique = []
+    for cols in candidates:
+        if cols and cols not in unique:
+            unique.append(cols)
+    return unique
+
+
+class IndexAdvisor:
+    """
+    基于已执行负载的索引顾问
+
+    候选索引逐个在数据库副本上创建、回放受影响的查询并与基线比较，互不叠加，
+    因此每个候选的收益都是相对当前索引集合的独立收益。
+    """
+
+    def __init__(
+        self,
+        log: QueryLog,
+        source: ConnectionPool,
+        target: ConnectionPool,
+        replay_runs: int = 3,
+        query_timeout: float = 10.0,
+        min_improvement: float = 0.2,
+        fetch_limit: int = 100001,
+    ):
+        """
+        初始化索引顾问
+
+        Args:
+            log: 查询日志
+            source: 只读连接池（用于复制数据库）
+            target: 可写连接池（用于应用索引）
+            replay_runs: 回放时每条查询执行次数，取中位数
+            query_timeout: 回放时单条查询的超时秒数
+            min_improvement: 推荐所需的最小加速比例
+            fetch_limit: 回放时每条查询最多取回的行数（与 Agent 的取回上限一致）
+        """
+        self.log = log
+        self.source = source
+        self.target = target
+        self.replay_runs = max(1, replay_runs)
+        self.query_timeout = query_timeout
+        self.min_improvement = min_improvement
+        self.fetch_limit = fetch_limit
+
+    def analyze(self, top_queries: int = 50) -> AdvisorReport:
+        """
+        分析查询负载并在临时副本上验证候选索引
+
+        Args:
+            top_queries: 分析总耗时最高的多少条查询
+
+        Returns:
+            分析结果（candidates 按节省的耗时倒序）
+        """
+        start = time.perf_counter()
+        report = AdvisorReport()
+        workload = [
+            _Workload(fingerprint=row["fingerprint"], sql=row["sql"], executions=row["executions"])
+            for row in self.log.workload(top_queries)
+        ]
+        report.queries = len(workload)
+        report.executions = sum(w.executions for w in workload)
+        if not workload:
+            return report
+
+        tmp_dir = tempfile.mkdtemp(prefix="index_advisor_")
+        conn = sqlite3.connect(os.path.join(tmp_dir, "scratch.db"))
+        try:
+            with self.source.connection() as src:
+                src.backup(conn)
+            conn.execute(f"PRAGMA analysis_limit={_ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.commit()
+
+            candidates = self._collect_candidates(conn, workload)
+            for item in workload:
+                if item.tables:
+                    item.baseline_ms = self._time_query(conn, item.sql)
+            report.skipped = sum(1 for w in workload if w.baseline_ms is None)
+
+            for candidate in candidates:
+                self._evaluate(conn, candidate, workload)
+            report.candidates = self._select(candidates)
+        finally:
+            conn.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        report.elapsed_ms = (time.perf_counter() - start) * 1000
+        return report
+
+    def _collect_candidates(self, conn: sqlite3.Connection, workload: list[_Workload]) -> list[IndexCandidate]:
+        """解析负载，汇总各查询的候选索引（跳过已有索引覆盖的列序）"""
+        table_columns: dict[str, set[str]] = {}
+        existing: dict[str, list[tuple[list[str], bool]]] = {}
+        candidates: dict[tuple[str, tuple[str, ...]], IndexCandidate] = {}
+
+        for item in workload:
+            tables: set[str] = set()
+
+            def authorizer(action, arg1, arg2, db_name, source):
+                if action == sqlite3.SQLITE_READ and arg1:
+                    tables.add(arg1)
+                return sqlite3.SQLITE_OK
+
+            conn.set_authorizer(authorizer)
+            try:
+                conn.execute(f"EXPLAIN QUERY PLAN {item.sql}").fetchall()
+            except sqlite3.Error:
+                continue
+            finally:
+                conn.set_authorizer(None)
+
+            item.tables = {t for t in tables if t not in INTERNAL_TABLES and not t.startswith("sqlite_")}
+            for table in item.tables:
+                if table not in table_columns:
+                    table_columns[table], existing[table] = self._table_indexes(conn, table)
+
+            usage = extract_column_usage(item.sql, {t: table_columns[t] for t in item.tables})
+            for table, columns in usage.items():
+                for cols in candidate_columns(columns):
+                    # 已有索引以这些列开头，或唯一索引已是其前缀（等值查找至多一行）
+                    if any(
+                        index[:len(cols)] == cols or (unique and cols[:len(index)] == index)
+                        for index, unique in existing[table]
+                    ):
+                        continue
+                    key = (table, tuple(cols))
+                    candidate = candidates.get(key)
+                    if candidate is None:
+                        candidate = candidates[key] = IndexCandidate(
+                            table=table, columns=cols, name=index_name(table, cols)
+                        )
+                    if item.fingerprint not in candidate.queries:
+                        candidate.queries.append(item.fingerprint)
+                        candidate.executions += item.executions
+
+        return list(candidates.values())
+
+    @staticmethod
+    def _table_indexes(conn: sqlite3.Connection, table: str) -> tuple[set[str], list[tuple[list[str], bool]]]:
+        """表的列名集合与已有索引的 (列序, 是否唯一)（INTEGER PRIMARY KEY 视为唯一单列索引）"""
+        info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        columns = {row[1].lower() for row in info}
+        indexes = []
+        pk = [row for row in info if row[5]]
+        if len(pk) == 1 and pk[0][2].upper() == "INTEGER":
+            indexes.append(([pk[0][1].lower()], True))
+        for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+            cols = [row[2].lower() for row in conn.execute(f'PRAGMA index_info("{index[1]}")') if row[2]]
+            indexes.append((cols, bool(index[2])))
+        return columns, indexes
+
+    def _time_query(self, conn: sqlite3.Connection, sql: str) -> Optional[float]:
+        """
+        回放一条查询，返回多次执行耗时的中位数（毫秒）
+
+        超时按超时时间计；执行失败（表结构已变化等）返回 None。
+        """
+        samples = []
+        for _ in range(self.replay_runs):
+            start = time.perf_counter()
+            try:
+                with Deadline().guard(conn, self.query_timeout):
+                    cursor = conn.execute(sql)
+                    fetched = 0
+                    while fetched < self.fetch_limit:
+                        rows = cursor.fetchmany(_FETCH_BATCH)
+                        if not rows:
+                            break
+                        fetched += len(rows)
+                    cursor.close()
+            except QueryInterruptedError:
+                return self.query_timeout * 1000
+            except sqlite3.Error:
+                return None
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def _evaluate(self, conn: sqlite3.Connection, candidate: IndexCandidate, workload: list[_Workload]):
+        """在副本上建候选索引，回放受影响的查询，然后删除索引"""
+        affected = [
+            w for w in workload
+            if w.fingerprint in candidate.queries and w.baseline_ms is not None
+        ]
+        if not affected:
+            return
+
+        start = time.perf_counter()
+        conn.execute(candidate.ddl)
+        candidate.build_ms = (time.perf_counter() - start) * 1000
+        conn.execute(f'ANALYZE "{candidate.name}"')
+        conn.commit()
+
+        try:
+            for item in affected:
+                plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {item.sql}"))
+                candidate.baseline_ms += item.executions * item.baseline_ms
+                if candidate.name not in plan:
+                    candidate.indexed_ms += item.executions * item.baseline_ms
+                    continue
+                candidate.used = True
+                elapsed = self._time_query(conn, item.sql)
+                candidate.indexed_ms += item.executions * (elapsed if elapsed is not None else item.baseline_ms)
+        finally:
+            conn.execute(f'DROP INDEX IF EXISTS "{candidate.name}"')
+            conn.commit()
+
+        if candidate.baseline_ms > 0:
+            candidate.improvement = 1 - candidate.indexed_ms / candidate.baseline_ms
+        candidate.recommended = candidate.used and candidate.improvement >= self.min_improvement
+
+    @staticmethod
+    def _select(candidates: list[IndexCandidate]) -> list[IndexCandidate]:
+        """按节省的耗时排序；同一张表上列序互为前缀的推荐索引只保留收益更高的一个"""
+        candidates.sort(key=lambda c: c.baseline_ms - c.indexed_ms, reverse=True)
+        kept: list[IndexCandidate] = []
+        for candidate in candidates:
+            if candidate.recommended:
+                for other in kept:
+                    shorter, longer = sorted((candidate.columns, other.columns), key=len)
+                    if other.table == candidate.table and longer[:len(shorter)] == shorter:
+                        candidate.recommended = False
+                        break
+            if candidate.recommended:
+                kept.append(candidate)
+        return candidates
+
+    def apply(self, indexes: list[tuple[str, list[str]]]) -> list[dict]:
+        """
+        在正式数据库上创建索引并更新统计信息
+
+        表名和列名会与实际表结构核对，不存在时跳过。
+
+        Args:
+            indexes: [(表名, [列名, ...])]
+
+        Returns:
+            [{table, columns, name, ddl, created, build_ms, error}]
+        """
+        results = []
+        with self.target.connection() as conn:
+            for table, columns in indexes:
+                result = {"table": table, "columns": list(columns), "created": False}
+                results.append(result)
+
+                known, _ = self._table_indexes(conn, table) if table not in INTERNAL_TABLES else (set(), [])
+                cols = [col.lower() for col in columns]
+                if not known or not cols or len(cols) > _MAX_INDEX_COLUMNS or not set(cols) <= known:
+                    result["error"] = "表或列不存在"
+                    continue
+
+                candidate = IndexCandidate(table=table, columns=cols, name=index_name(table, cols))
+                result.update(name=candidate.name, ddl=candidate.ddl)
+                start = time.perf_counter()
+                try:
+                    conn.execute(candidate.ddl)
+                    conn.execute(f'ANALYZE "{candidate.name}"')
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    result["error"] = str(e)
+                    continue
+                result["created"] = True
+                result["build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return results
+
+
+@lru_cache
+def get_index_advisor() -> IndexAdvisor:
+    """
+    获取全局索引顾问实例
+
+    Returns:
+        IndexAdvisor 实例
+    """
+    settings = get_settings()
+    return IndexAdvisor(
+        log=query_log,
+        source=get_query_pool(),
+        target=get_connection_pool(),
+        replay_runs=settings.index_advisor_replay_runs,
+        query_timeout=settings.index_advisor_query_timeout,
+        min_improvement=settings.index_advisor_min_improvement,
+        fetch_limit=settings.query_stream_max_rows + 1,
+    )
@@ -38,10 +38,14 @@ def get_llm(
     # 设置环境变量（ChatTongyi 需要）
     os.environ["DASHSCOPE_API_KEY"] = api_key
     
+    # 自定义 API 地址（如本地模拟服务）通过 dashscope SDK 的 base_address 参数传入
+    model_kwargs = {"base_address": settings.dashscope_base_url} if settings.dashscope_base_url else {}
+    
     return ChatTongyi(
         model=model or "qwen3-max",
         streaming=streaming,
         temperature=temperature,
+        model_kwargs=model_kwargs,
     )
 
 
@@ -82,3 +86,46 @@ SQL_AGENT_SYSTEM_PROMPT = """你是一个专业的 SQL 数据库分析助手。
 
 请用中文回答用户问题，并在回答中说明你的分析思路。
 """
+
+
+# 滚动摘要提示模板：把移出上下文窗口的对话合并进已有摘要
+MEMORY_SUMMARY_PROMPT = """请把下面的对话合并进已有摘要，生成新的对话摘要。
+
+要求：
+- 保留用户关心的指标、维度、筛选条件、时间范围和涉及的表
+- 保留已得出的关键结论和数字
+- 不超过 {max_tokens} 个字，只输出摘要正文
+
+已有摘要：
+{summary}
+
+新增对话：
+{conversation}
+"""
+
+
+# 预置结构摘要的系统提示模板（无需先调用表结构发现工具）
+SQL_AGENT_SCHEMA_PROMPT = """你是一个专业的 SQL 数据库分析助手。
+
+你的任务是帮助用户通过自然语言查询数据库。下面已经给出数据库的完整表结构，请按以下步骤操作：
+
+1. **理解问题**：仔细分析用户的查询意图
+2. **编写 SQL**：直接根据下方表结构编写正确的 SQL 查询，无需再调用 sql_db_list_tables / sql_db_schema
+3. **执行查询**：使用 sql_db_query 执行查询
+4. **分析结果**：解读查询结果并给出清晰的回答
+
+数据库方言: {dialect}
+
+**数据库表结构：**
+{schema}
+
+**注意事项：**
+- 只执行 SELECT 查询，禁止 INSERT/UPDATE/DELETE/DROP 等操作
+- 查询结果限制在 {top_k} 条以内，除非用户明确要求更多
+- 优先选择相关列，避免 SELECT *
+- 示例值仅供参考取值格式，如需确认具体取值可先执行查询
+- 只有在表结构不足以回答问题时，才使用 sql_db_schema 查看详细信息
+- 如果查询出错，分析错误原因并重新编写 SQL
+
+请用中文回答用户问题，并在回答中说明你的分析思路。
+"""
@@ -1,72 +1,236 @@
 """
 上下文记忆管理模块
 """
-from typing import Optional
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
 
-from app.db.session_store import session_store
+from app.config import get_settings
+from app.core.llm import MEMORY_SUMMARY_PROMPT, get_llm
+from app.db.session_store import async_session_store
+
+
+# 每条消息除文本外的估算开销（对象、字典等，字节）
+_MESSAGE_OVERHEAD = 256
+
+# 每条消息的角色标记等固定 token 开销
+_MESSAGE_TOKEN_OVERHEAD = 4
+
+# 会话锁分段数：按会话 ID 哈希取锁，锁的数量固定，不随会话数增长
+_LOCK_STRIPES = 64
+
+# 生成摘要时单条消息最多保留的字符数
+_SUMMARY_MESSAGE_CHARS = 2000
+
+# 摘要生成函数：(已有摘要, 新移出窗口的消息) -> 新摘要
+Summarizer = Callable[[Optional[str], list[dict]], Awaitable[str]]
+
+
+def count_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    中文等非 ASCII 字符按 1 个 token 计，ASCII 文本按 4 个字符 1 个 token 计
+    （与 Qwen 等模型分词器的实际值接近，偏保守）。
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+
+def count_message_tokens(messages: list[BaseMessage]) -> int:
+    """估算消息列表的 token 数（含每条消息的固定开销与工具调用参数）"""
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += count_tokens(content) + _MESSAGE_TOKEN_OVERHEAD
+        for call in getattr(message, "tool_calls", None) or ():
+            total += count_tokens(str(call.get("args", "")))
+    return total
+
+
+def _message_size(message: BaseMessage) -> int:
+    """估算单条消息占用的字节数"""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return len(content.encode("utf-8")) + _MESSAGE_OVERHEAD
+
+
+def _to_message(role: str, content: str) -> Optional[BaseMessage]:
+    """数据库消息转换为 LangChain 消息"""
+    if role == "user":
+        return HumanMessage(content=content)
+    if role == "assistant":
+        return AIMessage(content=content)
+    if role == "system":
+        return SystemMessage(content=content)
+    return None
+
+
+async def _llm_summarize(summary: Optional[str], rows: list[dict]) -> str:
+    """调用 LLM 把移出窗口的对话合并进已有摘要"""
+    settings = get_settings()
+    names = {"user": "用户", "assistant": "助手"}
+    conversation = "\n".join(
+        f"{names.get(row['role'], row['role'])}: {row['content'][:_SUMMARY_MESSAGE_CHARS]}"
+        for row in rows
+    )
+    prompt = MEMORY_SUMMARY_PROMPT.format(
+        max_tokens=settings.memory_summary_max_tokens,
+        summary=summary or "（无）",
+        conversation=conversation,
+    )
+    response = await get_llm(streaming=False).ainvoke([HumanMessage(content=prompt)])
+    return str(response.content).strip()
+
+
+@dataclass
+class MemoryContext:
+    """构建提示所需的会话上下文"""
+    messages: list[BaseMessage]         # 窗口内的历史消息
+    summary: Optional[str] = None       # 移出窗口的对话的滚动摘要
+    tokens: int = 0                     # 历史消息与摘要的估算 token 数
+
+
+@dataclass
+class _MemoryEntry:
+    messages: list[BaseMessage]
+    ids: list[int]                      # 与 messages 一一对应的数据库消息 ID
+    tokens: list[int]                   # 与 messages 一一对应的估算 token 数
+    summary: Optional[str]
+    summary_upto: int
+    size: int = 0
+    last_access: float = field(default_factory=time.monotonic)
+
+    @property
+    def summary_tokens(self) -> int:
+        return count_tokens(self.summary) + _MESSAGE_TOKEN_OVERHEAD if self.summary else 0
+
+    def context(self) -> MemoryContext:
+        return MemoryContext(
+            messages=list(self.messages),
+            summary=self.summary,
+            tokens=sum(self.tokens) + self.summary_tokens,
+        )
 
 
 class SessionMemoryManager:
     """
     基于会话 ID 的记忆管理器
     
-    从数据库加载历史消息，转换为 LangChain 消息格式
+    从数据库加载历史消息，转换为 LangChain 消息格式。
+    历史按估算 token 数装入预算：从最新消息向前保留，超出预算的较早对话移出窗口，
+    由后台任务异步折叠进保存在 chat_sessions 中的滚动摘要，不阻塞当前请求。
+    缓存按会话数与估算字节数做 LRU 淘汰，空闲超过 TTL 的会话失效；
+    同一会话的读写经分段锁串行执行，并发的对话轮次不会交错写入缓存。
     """
     
-    def __init__(self, window_size: int = 10):
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        max_messages: int = 40,
+        summary_enabled: bool = True,
+        max_sessions: int = 1024,
+        max_bytes: int = 33554432,
+        ttl_seconds: float = 1800,
+        summarizer: Optional[Summarizer] = None
+    ):
         """
         初始化记忆管理器
         
         Args:
-            window_size: 保留的最近消息轮数（一问一答为一轮）
+            token_budget: 历史消息（含摘要）的 token 预算
+            max_messages: 最多保留的历史消息条数
+            summary_enabled: 移出窗口的对话是否折叠为滚动摘要
+            max_sessions: 最多缓存的会话数
+            max_bytes: 缓存总字节上限（按消息文本估算）
+            ttl_seconds: 会话空闲超过该时间后失效（秒）
+            summarizer: 摘要生成函数，默认调用 LLM
         """
-        self.window_size = window_size
-        self._cache: dict[str, list[BaseMessage]] = {}
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summary_enabled = summary_enabled
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._summarizer = summarizer or _llm_summarize
+        
+        self._cache: OrderedDict[str, _MemoryEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._session_locks = [asyncio.Lock() for _ in range(_LOCK_STRIPES)]
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        # 后台摘要任务：会话 ID -> 任务；会话 ID -> 待折叠到的消息 ID
+        self._summary_tasks: dict[str, asyncio.Task] = {}
+        self._summary_pending: dict[str, int] = {}
+        self.summary_refreshes = 0
+        self.summary_failures = 0
     
-    def get_messages(self, session_id: str) -> list[BaseMessage]:
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        """获取会话对应的分段锁"""
+        return self._session_locks[hash(session_id) % _LOCK_STRIPES]
+    
+    async def get_context(self, session_id: str) -> MemoryContext:
         """
-        获取会话的历史消息
+        获取会话上下文（窗口内的历史消息与滚动摘要）
         
         Args:
             session_id: 会话 ID
         
         Returns:
-            LangChain 消息列表
+            会话上下文（消息列表为副本，调用方修改不影响缓存）
         """
-        # 从缓存获取
-        if session_id in self._cache:
-            return self._cache[session_id]
+        async with self._session_lock(session_id):
+            # 从缓存获取
+            entry = self._get_cached(session_id)
+            if entry is None:
+                # 从数据库加载
+                entry = await self._load_from_db(session_id)
+                self._put(session_id, entry)
+            return entry.context()
+    
+    async def get_messages(self, session_id: str) -> list[BaseMessage]:
+        """
+        获取会话的历史消息
         
-        # 从数据库加载
-        messages = self._load_from_db(session_id)
-        self._cache[session_id] = messages
+        Args:
+            session_id: 会话 ID
         
-        return messages
+        Returns:
+            LangChain 消息列表（副本，调用方修改不影响缓存）
+        """
+        return (await self.get_context(session_id)).messages
     
-    def _load_from_db(self, session_id: str) -> list[BaseMessage]:
-        """从数据库加载历史消息"""
-        # 获取最近的消息（window_size * 2 条，因为一问一答）
-        db_messages = session_store.get_recent_messages(
-            session_id, 
-            limit=self.window_size * 2
+    async def _load_from_db(self, session_id: str) -> _MemoryEntry:
+        """从数据库加载滚动摘要与摘要之后的最近消息，并装入 token 预算"""
+        summary, summary_upto = await async_session_store.get_summary(session_id)
+        db_messages = await async_session_store.get_recent_messages(
+            session_id,
+            limit=self.max_messages,
+            after_id=summary_upto
         )
         
-        messages = []
+        entry = _MemoryEntry(messages=[], ids=[], tokens=[], summary=summary, summary_upto=summary_upto)
+        if self.summary_enabled and len(db_messages) >= self.max_messages:
+            # 超出条数上限、未加载的更早消息同样需要折叠进摘要
+            self._schedule_summary(session_id, db_messages[0]["id"] - 1)
         for msg in db_messages:
-            role = msg["role"]
-            content = msg["content"]
-            
-            if role == "user":
-                messages.append(HumanMessage(content=content))
-            elif role == "assistant":
-                messages.append(AIMessage(content=content))
-            elif role == "system":
-                messages.append(SystemMessage(content=content))
+            message = _to_message(msg["role"], msg["content"])
+            if message is not None:
+                self._push(entry, message, msg["id"])
         
-        return messages
+        self._fit(session_id, entry)
+        return entry
     
-    def add_user_message(self, session_id: str, content: str):
+    async def add_user_message(self, session_id: str, content: str):
         """
         添加用户消息
         
@@ -74,20 +238,16 @@ class SessionMemoryManager:
             session_id: 会话 ID
             content: 消息内容
         """
-        # 保存到数据库
-        session_store.add_message(session_id, "user", content)
-        
-        # 更新缓存
-        if session_id not in self._cache:
-            self._cache[session_id] = self._load_from_db(session_id)
-        else:
-            self._cache[session_id].append(HumanMessage(content=content))
-            # 保持窗口大小
-            self._trim_cache(session_id)
+        async with self._session_lock(session_id):
+            # 保存到数据库
+            saved = await async_session_store.add_message(session_id, "user", content)
+            
+            # 更新缓存
+            await self._append(session_id, HumanMessage(content=content), saved["id"])
     
-    def add_assistant_message(
-        self, 
-        session_id: str, 
+    async def add_assistant_message(
+        self,
+        session_id: str,
         content: str,
         sql_query: Optional[str] = None
     ):
@@ -99,23 +259,167 @@ class SessionMemoryManager:
             content: 消息内容
             sql_query: SQL 查询（可选）
         """
-        # 保存到数据库
-        session_store.add_message(session_id, "assistant", content, sql_query)
-        
-        # 更新缓存
-        if session_id not in self._cache:
-            self._cache[session_id] = self._load_from_db(session_id)
+        async with self._session_lock(session_id):
+            # 保存到数据库
+            saved = await async_session_store.add_message(session_id, "assistant", content, sql_query)
+            
+            # 更新缓存
+            await self._append(session_id, AIMessage(content=content), saved["id"])
+    
+    async def _append(self, session_id: str, message: BaseMessage, message_id: int):
+        """追加消息到缓存（未缓存时从数据库加载），再装入 token 预算"""
+        cached = self._get_cached(session_id, count=False)
+        if cached is None:
+            entry = await self._load_from_db(session_id)
         else:
-            self._cache[session_id].append(AIMessage(content=content))
-            # 保持窗口大小
-            self._trim_cache(session_id)
+            entry = _MemoryEntry(
+                messages=list(cached.messages),
+                ids=list(cached.ids),
+                tokens=list(cached.tokens),
+                summary=cached.summary,
+                summary_upto=cached.summary_upto,
+            )
+            self._push(entry, message, message_id)
+            self._fit(session_id, entry)
+        self._put(session_id, entry)
+    
+    @staticmethod
+    def _push(entry: _MemoryEntry, message: BaseMessage, message_id: int):
+        """在条目末尾追加一条消息"""
+        entry.messages.append(message)
+        entry.ids.append(message_id)
+        entry.tokens.append(count_message_tokens([message]))
+    
+    def _fit(self, session_id: str, entry: _MemoryEntry):
+        """
+        从最新消息向前保留，使消息条数与 token 数（含摘要）不超过上限
+        
+        移出窗口的消息安排后台任务折叠进滚动摘要。
+        """
+        budget = max(0, self.token_budget - entry.summary_tokens)
+        kept = used = 0
+        for tokens in reversed(entry.tokens):
+            if kept >= self.max_messages or used + tokens > budget:
+                break
+            kept += 1
+            used += tokens
+        
+        dropped = len(entry.messages) - kept
+        if dropped <= 0:
+            return
+        
+        last_dropped_id = entry.ids[dropped - 1]
+        del entry.messages[:dropped], entry.ids[:dropped], entry.tokens[:dropped]
+        if self.summary_enabled and last_dropped_id > entry.summary_upto:
+            self._schedule_summary(session_id, last_dropped_id)
+    
+    def _schedule_summary(self, session_id: str, upto_id: int):
+        """安排后台任务把 upto_id 及之前移出窗口的消息折叠进摘要（每个会话同时最多一个任务）"""
+        self._summary_pending[session_id] = max(self._summary_pending.get(session_id, 0), upto_id)
+        if session_id not in self._summary_tasks:
+            # 使用空白上下文：后台任务不继承当前请求的 current_trace，
+            # 其数据库耗时不会计入（可能已记录完毕的）请求耗时分解
+            self._summary_tasks[session_id] = asyncio.get_running_loop().create_task(
+                self._refresh_summary(session_id),
+                context=contextvars.Context(),
+            )
     
-    def _trim_cache(self, session_id: str):
-        """修剪缓存，保持窗口大小"""
-        if session_id in self._cache:
-            max_messages = self.window_size * 2
-            if len(self._cache[session_id]) > max_messages:
-                self._cache[session_id] = self._cache[session_id][-max_messages:]
+    async def _refresh_summary(self, session_id: str):
+        """后台刷新滚动摘要，直到没有待折叠的消息"""
+        try:
+            while True:
+                upto_id = self._summary_pending.pop(session_id, None)
+                if upto_id is None:
+                    return
+                
+                summary, summary_upto = await async_session_store.get_summary(session_id)
+                if upto_id <= summary_upto:
+                    continue
+                rows = await async_session_store.get_messages_between(session_id, summary_upto, upto_id)
+                if not rows:
+                    continue
+                
+                summary = await self._summarizer(summary, rows)
+                if not await async_session_store.update_summary(session_id, summary, upto_id):
+                    continue
+                
+                with self._lock:
+                    self.summary_refreshes += 1
+                    entry = self._cache.get(session_id)
+                    if entry is not None and entry.summary_upto < upto_id:
+                        self._bytes -= entry.size
+                        entry.summary, entry.summary_upto = summary, upto_id
+                        entry.size = self._entry_size(entry)
+                        self._bytes += entry.size
+        except Exception as e:
+            # 摘要失败不影响对话；未折叠的消息会在下一次刷新时一并处理
+            with self._lock:
+                self.summary_failures += 1
+            print(f"Summary refresh failed for session {session_id}: {e}")
+        finally:
+            self._summary_tasks.pop(session_id, None)
+    
+    def _get_cached(self, session_id: str, count: bool = True) -> Optional[_MemoryEntry]:
+        """
+        查找缓存，过期条目视为未命中并移除
+        
+        Args:
+            session_id: 会话 ID
+            count: 是否计入命中统计
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and now - entry.last_access > self.ttl_seconds:
+                self._remove(session_id)
+                self.expirations += 1
+                entry = None
+            
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            
+            entry.last_access = now
+            self._cache.move_to_end(session_id)
+            if count:
+                self.hits += 1
+            return entry
+    
+    @staticmethod
+    def _entry_size(entry: _MemoryEntry) -> int:
+        """估算条目占用的字节数"""
+        size = sum(_message_size(message) for message in entry.messages)
+        if entry.summary:
+            size += len(entry.summary.encode("utf-8"))
+        return size
+    
+    def _put(self, session_id: str, entry: _MemoryEntry):
+        """写入缓存，并按 TTL、会话数与字节数淘汰最久未使用的会话"""
+        now = time.monotonic()
+        entry.size = self._entry_size(entry)
+        entry.last_access = now
+        
+        with self._lock:
+            if session_id in self._cache:
+                self._remove(session_id)
+            self._cache[session_id] = entry
+            self._bytes += entry.size
+            
+            # 按访问顺序排列，队首即最久未使用
+            while len(self._cache) > 1:
+                oldest_id, oldest = next(iter(self._cache.items()))
+                if now - oldest.last_access > self.ttl_seconds:
+                    self.expirations += 1
+                elif len(self._cache) > self.max_sessions or self._bytes > self.max_bytes:
+                    self.evictions += 1
+                else:
+                    break
+                self._remove(oldest_id)
+    
+    def _remove(self, session_id: str):
+        entry = self._cache.pop(session_id)
+        self._bytes -= entry.size
     
     def clear_memory(self, session_id: str):
         """
@@ -124,18 +428,59 @@ class SessionMemoryManager:
         Args:
             session_id: 会话 ID
         """
-        if session_id in self._cache:
-            del self._cache[session_id]
+        with self._lock:
+            if session_id in self._cache:
+                self._remove(session_id)
     
-    def refresh_memory(self, session_id: str):
+    async def refresh_memory(self, session_id: str):
         """
         刷新会话记忆（从数据库重新加载）
         
         Args:
             session_id: 会话 ID
         """
-        self._cache[session_id] = self._load_from_db(session_id)
+        async with self._session_lock(session_id):
+            self._put(session_id, await self._load_from_db(session_id))
+    
+    def shutdown(self):
+        """取消尚未完成的后台摘要任务"""
+        for task in list(self._summary_tasks.values()):
+            task.cancel()
+        self._summary_pending.clear()
+    
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._cache),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "token_budget": self.token_budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "summary_refreshes": self.summary_refreshes,
+                "summary_failures": self.summary_failures,
+                "summary_pending": len(self._summary_tasks),
+            }
+
+
+def _create_memory_manager() -> SessionMemoryManager:
+    settings = get_settings()
+    return SessionMemoryManager(
+        token_budget=settings.memory_token_budget,
+        max_messages=settings.memory_max_messages,
+        summary_enabled=settings.memory_summary_enabled,
+        max_sessions=settings.memory_cache_max_sessions,
+        max_bytes=settings.memory_cache_max_bytes,
+        ttl_seconds=settings.memory_cache_ttl_seconds,
+    )
 
 
 # 全局记忆管理器实例
-memory_manager = SessionMemoryManager(window_size=10)
+memory_manager = _create_memory_manager()
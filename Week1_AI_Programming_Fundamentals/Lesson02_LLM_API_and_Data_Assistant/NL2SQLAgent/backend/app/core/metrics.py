@@ -0,0 +1,314 @@
+"""
+Agent 运行指标模块
+
+AgentMetrics 为进程内累计指标（JSON 快照与 Prometheus 文本格式），
+RequestTrace 记录单个请求在各阶段的耗时分解。
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Mapping, Optional
+
+# 直方图桶上界：LLM 迭代次数、耗时（秒）
+ITERATION_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# 按缓存统计导出命中与未命中次数
+_CACHE_FIELDS = ("hits", "misses")
+
+
+class RequestTrace:
+    """
+    单个请求的耗时分解
+
+    按阶段名累计耗时与次数：llm、tool:<工具名>、sql、prepare、db_read、db_write、sse。
+    只在事件循环线程中记录（线程池中的耗时由调用方取回后记入），无需加锁。
+    阶段之间可能重叠（如流式调用 LLM 的耗时包含把文本推送给客户端的时间），
+    total_ms 为请求开始至今的墙钟时间。
+    """
+
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: dict[str, list] = {}
+
+    def add(self, name: str, ms: float):
+        """累计一次阶段耗时（毫秒）"""
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [ms, 1]
+        else:
+            span[0] += ms
+            span[1] += 1
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def elapsed_ms(self) -> float:
+        """请求开始至今的耗时（毫秒）"""
+        return (time.perf_counter() - self.start) * 1000
+
+    def summary(self) -> dict:
+        """DONE 事件中的耗时汇总：总耗时与各阶段的累计耗时、次数"""
+        return {
+            "total_ms": round(self.elapsed_ms(), 1),
+            "spans": {
+                name: {"ms": round(ms, 2), "count": count}
+                for name, (ms, count) in self.spans.items()
+            },
+        }
+
+
+# 当前请求的耗时分解（由聊天接口设置，会话存储等下层组件据此记录数据库读写耗时）
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+class Histogram:
+    """
+    累计直方图（Prometheus 语义：le 桶计数为小于等于上界的观测数）
+
+    不加锁，由持有者保证并发安全。
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: Optional[dict] = None) -> list[str]:
+        """输出 _bucket / _sum / _count 样本行"""
+        labels = labels or {}
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值（整数不带小数点）"""
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Mapping[str, object]) -> str:
+    """格式化标签集合，按文本格式规范转义反斜杠、引号与换行"""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{text}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _metric_header(lines: list[str], name: str, kind: str, help_text: str):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+class AgentMetrics:
+    """
+    Agent 运行指标（进程内累计）
+
+    按提示模式（discovery: 先调用工具发现表结构；schema: 系统提示预置结构摘要；
+    plan_cache: 命中计划缓存、未调用 LLM）分别统计问题数与 LLM 迭代次数，
+    便于对比不同模式的平均迭代次数。
+    另记录迭代次数、SQL 执行耗时、各阶段与整个请求耗时的直方图，以及进行中的流数量，
+    供 /metrics 以 Prometheus 文本格式导出。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._questions: dict[str, int] = defaultdict(int)
+        self._iterations: dict[str, int] = defaultdict(int)
+        self._tool_calls: dict[str, int] = defaultdict(int)
+        self._prompt_tokens: dict[str, int] = defaultdict(int)
+        self._completion_tokens: dict[str, int] = defaultdict(int)
+        self._interrupts: dict[str, int] = defaultdict(int)
+        self._iteration_hist: dict[str, Histogram] = {}
+        self._phase_hist: dict[str, Histogram] = {}
+        self._sql_hist = Histogram(LATENCY_BUCKETS)
+        self._request_hist = Histogram(LATENCY_BUCKETS)
+        self._active_streams = 0
+
+    def record_run(
+        self,
+        mode: str,
+        iterations: int,
+        tool_calls: int,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0
+    ):
+        """
+        记录一次 Agent 运行
+
+        Args:
+            mode: 提示模式
+            iterations: LLM 调用次数
+            tool_calls: 工具调用次数
+            prompt_tokens: 各次 LLM 调用的输入 token 数之和（估算）
+            completion_tokens: 回答文本的 token 数（估算）
+        """
+        with self._lock:
+            self._questions[mode] += 1
+            self._iterations[mode] += iterations
+            self._tool_calls[mode] += tool_calls
+            self._prompt_tokens[mode] += prompt_tokens
+            self._completion_tokens[mode] += completion_tokens
+            hist = self._iteration_hist.get(mode)
+            if hist is None:
+                hist = self._iteration_hist[mode] = Histogram(ITERATION_BUCKETS)
+            hist.observe(iterations)
+
+    def record_interrupt(self, reason: str):
+        """
+        记录一次中断
+
+        Args:
+            reason: cancelled（客户端断开）/ timeout（请求超时）/ query_timeout（单条 SQL 超时）
+        """
+        with self._lock:
+            self._interrupts[reason] += 1
+
+    def record_query(self, ms: float):
+        """记录一次 SQL 执行耗时（毫秒，含取回结果）"""
+        with self._lock:
+            self._sql_hist.observe(ms / 1000)
+
+    def record_trace(self, trace: RequestTrace):
+        """请求结束时记录整个请求与各阶段的耗时（tool:<工具名> 按工具分别统计）"""
+        total = trace.elapsed_ms()
+        with self._lock:
+            self._request_hist.observe(total / 1000)
+            for name, (ms, _) in trace.spans.items():
+                hist = self._phase_hist.get(name)
+                if hist is None:
+                    hist = self._phase_hist[name] = Histogram(LATENCY_BUCKETS)
+                hist.observe(ms / 1000)
+
+    def stream_started(self):
+        """SSE 流开始"""
+        with self._lock:
+            self._active_streams += 1
+
+    def stream_finished(self):
+        """SSE 流结束（正常完成、出错或客户端断开）"""
+        with self._lock:
+            self._active_streams -= 1
+
+    def snapshot(self) -> dict:
+        """按提示模式返回累计指标与平均迭代次数，interrupts 为取消与超时次数"""
+        with self._lock:
+            modes = {
+                mode: {
+                    "questions": questions,
+                    "iterations": self._iterations[mode],
+                    "tool_calls": self._tool_calls[mode],
+                    "avg_iterations": round(self._iterations[mode] / questions, 3),
+                    "avg_tool_calls": round(self._tool_calls[mode] / questions, 3),
+                    "avg_prompt_tokens": round(self._prompt_tokens[mode] / questions, 1),
+                }
+                for mode, questions in self._questions.items()
+            }
+            modes["interrupts"] = {
+                reason: self._interrupts[reason]
+                for reason in ("cancelled", "timeout", "query_timeout")
+            }
+            return modes
+
+    def render_prometheus(self, caches: Optional[Mapping[str, dict]] = None) -> str:
+        """
+        以 Prometheus 文本格式（0.0.4）导出指标
+
+        Args:
+            caches: 缓存名 -> stats() 结果，导出其中的命中与未命中次数
+
+        Returns:
+            指标文本
+        """
+        lines: list[str] = []
+        with self._lock:
+            _metric_header(lines, "nl2sql_active_streams", "gauge", "SSE streams currently open.")
+            lines.append(f"nl2sql_active_streams {self._active_streams}")
+
+            counters = (
+                ("nl2sql_questions_total", "Questions answered, by prompt mode.", self._questions),
+                ("nl2sql_llm_iterations_total", "LLM calls, by prompt mode.", self._iterations),
+                ("nl2sql_tool_calls_total", "Tool calls, by prompt mode.", self._tool_calls),
+                ("nl2sql_prompt_tokens_total", "Estimated prompt tokens, by prompt mode.", self._prompt_tokens),
+                ("nl2sql_completion_tokens_total", "Estimated completion tokens, by prompt mode.",
+                 self._completion_tokens),
+            )
+            for name, help_text, values in counters:
+                _metric_header(lines, name, "counter", help_text)
+                for mode, value in sorted(values.items()):
+                    lines.append(f"{name}{_format_labels({'mode': mode})} {value}")
+
+            _metric_header(lines, "nl2sql_interrupts_total", "counter", "Cancelled or timed out requests and queries.")
+            for reason, value in sorted(self._interrupts.items()):
+                lines.append(f"nl2sql_interrupts_total{_format_labels({'reason': reason})} {value}")
+
+            _metric_header(lines, "nl2sql_agent_iterations", "histogram", "LLM iterations per question.")
+            for mode, hist in sorted(self._iteration_hist.items()):
+                lines.extend(hist.render("nl2sql_agent_iterations", {"mode": mode}))
+
+            _metric_header(lines, "nl2sql_sql_duration_seconds", "histogram", "Agent SQL execution time.")
+            lines.extend(self._sql_hist.render("nl2sql_sql_duration_seconds"))
+
+            _metric_header(lines, "nl2sql_request_duration_seconds", "histogram", "Chat request wall time.")
+            lines.extend(self._request_hist.render("nl2sql_request_duration_seconds"))
+
+            _metric_header(lines, "nl2sql_phase_duration_seconds", "histogram",
+                           "Time per request spent in each phase (llm, tool, sql, db, sse).")
+            for phase, hist in sorted(self._phase_hist.items()):
+                lines.extend(hist.render("nl2sql_phase_duration_seconds", {"phase": phase}))
+
+        for field in _CACHE_FIELDS:
+            name = f"nl2sql_cache_{field}_total"
+            _metric_header(lines, name, "counter", f"Cache {field}, by cache.")
+            for cache, stats in (caches or {}).items():
+                lines.append(f"{name}{_format_labels({'cache': cache})} {stats.get(field, 0)}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """清零所有指标（进行中的流数量除外）"""
+        with self._lock:
+            self._questions.clear()
+            self._iterations.clear()
+            self._tool_calls.clear()
+            self._prompt_tokens.clear()
+            self._completion_tokens.clear()
+            self._interrupts.clear()
+            self._iteration_hist.clear()
+            self._phase_hist.clear()
+            self._sql_hist = Histogram(LATENCY_BUCKETS)
+            self._request_hist = Histogram(LATENCY_BUCKETS)
+
+
+# 全局 Agent 指标实例
+agent_metrics = AgentMetrics()
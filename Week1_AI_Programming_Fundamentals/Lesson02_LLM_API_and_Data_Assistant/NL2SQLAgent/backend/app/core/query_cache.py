@@ -0,0 +1,265 @@
+"""
+SQL 查询结果缓存模块
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from app.config import get_settings
+
+
+# 结果随时间或调用而变化的 SQL，不缓存
+_VOLATILE_FUNCTIONS = {"random", "randomblob", "changes", "total_changes", "last_insert_rowid"}
+# 'now'、CURRENT_*，以及省略时间参数的日期时间函数（date()、julianday()、strftime('%Y') 等同于取当前时间）
+_VOLATILE_PATTERN = re.compile(
+    r"'now'|\bcurrent_(date|time|timestamp)\b"
+    r"|\b(date|time|datetime|julianday|unixepoch|timediff)\s*\(\s*\)"
+    r"|\bstrftime\s*\(\s*('(?:[^']|'')*'\s*)?\)"
+)
+
+# 非 ASCII 字符（中文等）两侧的空白
+_CJK_SPACE_PATTERN = re.compile(r" ?([^\x00-\x7f]) ?")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    规范化 SQL 文本作为缓存键
+
+    引号外：合并连续空白、转小写、去掉末尾分号；引号内（字符串 / 标识符）保持原样。
+    """
+    out = []
+    quote: Optional[str] = None
+    pending_space = False
+
+    for char in sql.strip().rstrip(";").strip():
+        if quote:
+            out.append(char)
+            if char == quote:
+                quote = None
+            continue
+
+        if char.isspace():
+            pending_space = True
+            continue
+
+        if pending_space and out:
+            out.append(" ")
+        pending_space = False
+
+        if char in ("'", '"', "`"):
+            quote = char
+            out.append(char)
+        elif char == "[":
+            quote = "]"
+            out.append(char)
+        else:
+            out.append(char.lower())
+
+    return "".join(out)
+
+
+def normalize_question(question: str) -> str:
+    """
+    规范化用户问题作为计划缓存键
+
+    全角转半角、转小写、合并空白（中文字符两侧的空白直接去掉）、去掉末尾标点。
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = " ".join(text.split())
+    text = _CJK_SPACE_PATTERN.sub(r"\1", text)
+    return text.rstrip(" ?!.。？！～~")
+
+
+def is_cacheable(normalized_sql: str, functions: set[str]) -> bool:
+    """
+    判断查询结果是否可缓存
+
+    Args:
+        normalized_sql: 规范化后的 SQL
+        functions: 执行时 authorizer 记录到的函数名
+    """
+    if {name.lower() for name in functions} & _VOLATILE_FUNCTIONS:
+        return False
+    return not _VOLATILE_PATTERN.search(normalized_sql)
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    versions: dict
+    size: int
+
+
+class QueryResultCache:
+    """
+    数据版本感知的查询结果缓存
+
+    以规范化 SQL 为键，条目记录执行时 schema_version 与所读表的变更计数；
+    命中时若任一版本变化则视为失效。按条目数和字节数做 LRU 淘汰。
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 67108864, max_entry_bytes: int = 8388608):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 缓存总字节上限（按结果 JSON 大小估算）
+            max_entry_bytes: 单个条目字节上限，超过则不缓存
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, current_versions: Callable[[dict], Optional[dict]]) -> Optional[Any]:
+        """
+        查找缓存
+
+        Args:
+            key: 规范化 SQL
+            current_versions: 根据条目记录的版本读取当前版本的函数
+
+        Returns:
+            命中返回缓存值，否则返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # 版本读取可能访问数据库，不持有锁
+        fresh = current_versions(entry.versions) == entry.versions
+
+        with self._lock:
+            if not fresh:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: str, value: Any, versions: dict, size: int) -> bool:
+        """
+        写入缓存
+
+        Args:
+            key: 规范化 SQL
+            value: 查询结果
+            versions: 执行时的版本信息
+            size: 结果估算字节数
+
+        Returns:
+            是否写入
+        """
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = _CacheEntry(value=value, versions=versions, size=size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+        return True
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        """清空缓存（保留统计）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class QueryPlanCache(QueryResultCache):
+    """
+    问题 -> SQL 计划缓存
+
+    键为（规范化问题、上一轮问题、schema 指纹），值为验证过的 SQL 与最终回答。
+    条目记录 SQL 结果的数据版本，数据变化后回答中的数字可能过期，视为失效。
+    额外统计命中节省的 LLM 耗时。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saved_ms = 0.0
+
+    def record_saved(self, ms: float):
+        """累计命中节省的耗时（毫秒）"""
+        with self._lock:
+            self.saved_ms += ms
+
+    def stats(self) -> dict:
+        """缓存统计信息（含累计节省耗时）"""
+        stats = super().stats()
+        with self._lock:
+            stats["saved_ms"] = round(self.saved_ms, 1)
+        return stats
+
+
+def _create_query_cache() -> QueryResultCache:
+    settings = get_settings()
+    return QueryResultCache(
+        max_entries=settings.query_cache_max_entries,
+        max_bytes=settings.query_cache_max_bytes,
+        max_entry_bytes=settings.query_cache_max_entry_bytes,
+    )
+
+
+def _create_plan_cache() -> QueryPlanCache:
+    settings = get_settings()
+    return QueryPlanCache(
+        max_entries=settings.plan_cache_max_entries,
+        max_bytes=settings.plan_cache_max_bytes,
+        max_entry_bytes=settings.plan_cache_max_bytes,
+    )
+
+
+# 全局查询结果缓存实例
+query_cache = _create_query_cache()
+
+# 全局计划缓存实例
+plan_cache = _create_plan_cache()
@@ -0,0 +1,164 @@
+"""
+SSE 编码模块
+
+每个文本 token 与每个数据块都会经过这里，因此：
+- JSON 序列化可替换（默认优先使用 orjson，未安装时回退到标准库）；JSON 原生类型、
+  日期时间、Decimal 与 dataclass 两种后端输出一致（紧凑分隔符，NaN / Infinity 输出为 null，
+  非原生类型统一走 str）；Enum 成员与 numpy 浮点数仍有差异（orjson 分别输出值与字符串）；
+- 各事件类型的 "event: ...\ndata: " 前缀预先编码为字节并缓存；
+- 直接输出 UTF-8 字节，StreamingResponse 不必再次编码；
+- 不做模型校验，多行文本一次 replace 完成 data: 前缀拆分（JSON 输出不含换行，无需扫描）。
+"""
+import json
+import math
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+
+# JSON 序列化函数：对象 -> UTF-8 字节
+JSONDumper = Callable[[Any], bytes]
+
+
+def _finite(data: Any) -> Any:
+    """把 NaN / Infinity 替换为 None（与 orjson 输出 null 一致）"""
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _finite(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_finite(value) for value in data]
+    return data
+
+
+_STDLIB_OPTIONS = {"ensure_ascii": False, "default": str, "allow_nan": False, "separators": (",", ":")}
+
+
+def _stdlib_dumps(data: Any) -> bytes:
+    try:
+        text = json.dumps(data, **_STDLIB_OPTIONS)
+    except ValueError:
+        # 含非有限浮点数时标准库会输出非法 JSON（NaN），替换为 null 后重新序列化
+        text = json.dumps(_finite(data), **_STDLIB_OPTIONS)
+    return text.encode("utf-8")
+
+
+if orjson is not None:
+    # 日期时间与 dataclass 交给 default=str，与标准库输出相同（orjson 默认输出 ISO 8601 / 对象）
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS)
+
+
+def get_json_dumper(backend: str = "auto") -> JSONDumper:
+    """
+    选择 JSON 序列化后端
+
+    Args:
+        backend: auto（有 orjson 时使用 orjson）/ orjson / json
+
+    Raises:
+        ValueError: 未知后端，或指定了 orjson 但未安装
+    """
+    if backend == "json":
+        return _stdlib_dumps
+    if backend in ("auto", "orjson"):
+        if orjson is not None:
+            return _orjson_dumps
+        if backend == "orjson":
+            raise ValueError("orjson 未安装")
+        return _stdlib_dumps
+    raise ValueError(f"未知的 JSON 后端: {backend}")
+
+
+class SSEEncoder:
+    """
+    SSE 事件编码器
+
+    每个 SSE 流一个实例：启用事件 ID 时按流内顺序编号（id: 1, 2, ...），
+    retry 只在第一个事件前输出一次，告知客户端断线重连的等待时间。
+    """
+
+    __slots__ = ("_dumps", "_prefixes", "_next_id", "_retry")
+
+    def __init__(
+        self,
+        dumps: Optional[JSONDumper] = None,
+        event_ids: bool = False,
+        retry_ms: Optional[int] = None,
+    ):
+        """
+        初始化编码器
+
+        Args:
+            dumps: JSON 序列化函数，默认按 get_json_dumper() 选择
+            event_ids: 是否为每个事件输出递增的 id 字段
+            retry_ms: 重连等待时间（毫秒），None 表示不输出 retry 字段
+        """
+        self._dumps = dumps or _default_dumps
+        self._prefixes = _PREFIXES
+        self._next_id = 1 if event_ids else 0
+        self._retry = f"retry: {int(retry_ms)}\n".encode("ascii") if retry_ms is not None else b""
+
+    def encode(self, event: str, data: Union[str, Any], event_id: Optional[Union[int, str]] = None) -> bytes:
+        """
+        编码一个事件
+
+        Args:
+            event: 事件类型（字符串或 str 枚举）
+            data: 字符串原样输出（多行时每行加 data: 前缀），其他对象序列化为 JSON
+            event_id: 显式指定的事件 ID（覆盖自动编号）
+
+        Returns:
+            以空行结尾的 SSE 事件字节串
+        """
+        prefix = self._prefixes.get(event)
+        if prefix is None:
+            prefix = _event_prefix(event)
+
+        if isinstance(data, str):
+            if "\n" in data or "\r" in data:
+                data = data.replace("\r\n", "\n").replace("\r", "\n").replace("\n", "\ndata: ")
+            body = data.encode("utf-8")
+        else:
+            body = self._dumps(data)
+
+        head = b""
+        if event_id is not None:
+            head = f"id: {event_id}\n".encode("utf-8")
+        elif self._next_id:
+            head = f"id: {self._next_id}\n".encode("ascii")
+            self._next_id += 1
+        if self._retry:
+            head = self._retry + head
+            self._retry = b""
+
+        return b"".join((head, prefix, body, b"\n\n"))
+
+
+def _event_prefix(event: str) -> bytes:
+    """生成并缓存事件前缀（str 枚举与其取值共用同一缓存项）"""
+    name = getattr(event, "value", event)
+    prefix = f"event: {name}\ndata: ".encode("utf-8")
+    _PREFIXES[event] = prefix
+    _PREFIXES[name] = prefix
+    return prefix
+
+
+# 事件前缀缓存（事件类型 -> b"event: <类型>\ndata: "）
+_PREFIXES: dict = {}
+
+_default_dumps = get_json_dumper()
+
+# 无事件 ID 与 retry 字段的共享编码器（无状态，可跨流复用）
+default_encoder = SSEEncoder()
+
+
+def encode_event(event: str, data: Any) -> bytes:
+    """使用共享编码器编码一个事件"""
+    return default_encoder.encode(event, data)
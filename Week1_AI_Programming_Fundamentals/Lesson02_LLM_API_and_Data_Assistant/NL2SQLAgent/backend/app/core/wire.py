@@ -0,0 +1,156 @@
+"""
+查询结果的 SSE 线上编码模块
+
+客户端在聊天请求中选择编码（wire_format）：
+
+- rows（默认，兼容旧客户端）：DATA 事件含 rows（name/value 字典）与 raw（行数组），
+  CHART 事件再复制一份 name/value 数据；流式结果的 data_chunk 以行数组推送。
+- columnar：按列数组推送，列名与类型只出现一次；重复较多的文本列做字典编码；
+  CHART 事件不再复制数据，只引用 DATA 事件（或流式结果头）的 id 与列下标。
+- msgpack：columnar 载荷经 MessagePack 序列化后 base64 编码（需要 ormsgpack），
+  数值不再以十进制文本传输；未安装时回退为 columnar。
+
+字典编码：dicts[i] 为第 i 列本次新增的字典项（未编码的列为 null），
+编码后的取值为该列累计字典中的下标（NULL 仍为 null）。流式结果的各数据块共享字典，
+每块只携带新增项，客户端按顺序追加即可还原。
+"""
+import base64
+from typing import Any, Optional
+
+try:
+    import ormsgpack
+except ImportError:  # ormsgpack 为可选依赖
+    ormsgpack = None
+
+
+WIRE_ROWS = "rows"
+WIRE_COLUMNAR = "columnar"
+WIRE_MSGPACK = "msgpack"
+WIRE_FORMATS = (WIRE_ROWS, WIRE_COLUMNAR, WIRE_MSGPACK)
+
+# 文本列的不同取值数不超过首块行数的该比例时做字典编码
+_DICT_MAX_RATIO = 0.5
+
+
+def resolve_wire_format(requested: Optional[str]) -> str:
+    """
+    确定实际使用的编码
+
+    Args:
+        requested: 客户端请求的编码，None 或未知值按 rows 处理
+
+    Returns:
+        rows / columnar / msgpack（未安装 ormsgpack 时 msgpack 回退为 columnar）
+    """
+    if requested not in WIRE_FORMATS:
+        return WIRE_ROWS
+    if requested == WIRE_MSGPACK and ormsgpack is None:
+        return WIRE_COLUMNAR
+    return requested
+
+
+def _should_dict_encode(values: list[Any]) -> bool:
+    """列中非 NULL 取值全部为文本，且不同取值数足够少"""
+    distinct = set()
+    for value in values:
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return False
+        distinct.add(value)
+    return bool(distinct) and len(distinct) <= len(values) * _DICT_MAX_RATIO
+
+
+class ColumnEncoder:
+    """
+    列式结果编码器（每个结果一个实例，流式结果的多个数据块共享字典）
+
+    由第一块数据决定哪些列做字典编码，之后各块沿用同一组字典。
+    """
+
+    def __init__(self, wire_format: str):
+        """
+        初始化编码器
+
+        Args:
+            wire_format: columnar / msgpack
+        """
+        self.wire_format = wire_format
+        self._dicts: Optional[list[Optional[dict]]] = None
+
+    def encode(self, data: list[list[Any]]) -> dict:
+        """
+        字典编码一块列式数据
+
+        Args:
+            data: 列式数据（data[i] 为第 i 列的取值）
+
+        Returns:
+            {"data": 编码后的列数组, "dicts": 各列新增的字典项}
+        """
+        if self._dicts is None:
+            self._dicts = [{} if _should_dict_encode(values) else None for values in data]
+
+        columns = []
+        added = []
+        for values, mapping in zip(data, self._dicts):
+            if mapping is None:
+                columns.append(values)
+                added.append(None)
+                continue
+
+            codes = []
+            new_values = []
+            for value in values:
+                if value is None:
+                    codes.append(None)
+                    continue
+                code = mapping.get(value)
+                if code is None:
+                    code = mapping[value] = len(mapping)
+                    new_values.append(value)
+                codes.append(code)
+            columns.append(codes)
+            added.append(new_values)
+
+        return {"data": columns, "dicts": added}
+
+    def pack(self, body: dict) -> dict:
+        """msgpack 编码时把载荷序列化为 base64 文本，columnar 编码时原样返回"""
+        if self.wire_format != WIRE_MSGPACK:
+            return body
+        return {"payload": base64.b64encode(ormsgpack.packb(body)).decode("ascii")}
+
+
+def unpack(payload: dict) -> dict:
+    """解码 msgpack 载荷（供测试与 Python 客户端使用），非 msgpack 载荷原样返回"""
+    if "payload" not in payload:
+        return payload
+    return {**payload, **ormsgpack.unpackb(base64.b64decode(payload["payload"]))}
+
+
+def decode_columns(data: list[list[Any]], dicts: list[Optional[list]], state: Optional[list] = None) -> list[list[Any]]:
+    """
+    还原字典编码的列数据
+
+    Args:
+        data: 编码后的列数组
+        dicts: 各列新增的字典项
+        state: 流式结果的累计字典（按块依次调用时传入同一个列表）
+
+    Returns:
+        还原后的列式数据
+    """
+    if state is None:
+        state = []
+    if not state:
+        state.extend([] if added is not None else None for added in dicts)
+
+    columns = []
+    for values, added, mapping in zip(data, dicts, state):
+        if mapping is None:
+            columns.append(values)
+            continue
+        mapping.extend(added)
+        columns.append([None if code is None else mapping[code] for code in values])
+    return columns
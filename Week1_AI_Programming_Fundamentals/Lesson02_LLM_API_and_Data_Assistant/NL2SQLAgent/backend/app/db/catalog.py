@@ -0,0 +1,271 @@
+"""
+数据库结构目录模块
+
+缓存业务表结构、行数与表详情，按 schema_version 与表级变更计数判断是否失效
+"""
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.db.connection import INTERNAL_TABLES, TABLE_VERSIONS_TABLE, get_query_pool, get_sql_database
+
+
+@dataclass
+class _CatalogState:
+    """某一 schema_version 下的结构快照"""
+    schema_version: int
+    tables: dict[str, list[dict]] = field(default_factory=dict)   # 表名 -> 列信息
+    ddl: dict[str, str] = field(default_factory=dict)             # 表名 -> 建表语句
+    digest: Optional[str] = None                                  # 提供给 LLM 的结构摘要（按需生成）
+
+
+class SchemaCatalog:
+    """
+    数据库结构目录
+
+    表结构只在 PRAGMA schema_version 变化时重新读取；行数来自 _table_versions 中
+    由触发器维护的 row_count，无需 COUNT(*)；表详情（建表语句与示例数据）按表版本缓存。
+    每次请求只需读取 schema_version 与变更计数表，据此生成 ETag。
+    读取路径只读：变更计数触发器在启动（get_sql_database）与导入数据时安装，
+    在此之外新建的表到下次启动前没有计数，行数取 max(rowid) 估算，表详情不缓存。
+    """
+
+    def __init__(self, sample_rows: int = 5, digest_sample_values: int = 3):
+        """
+        初始化结构目录
+
+        Args:
+            sample_rows: 表详情中的示例数据行数
+            digest_sample_values: 结构摘要中每列展示的示例值个数
+        """
+        self.sample_rows = sample_rows
+        self.digest_sample_values = digest_sample_values
+        self._state: Optional[_CatalogState] = None
+        self._details: dict[str, tuple[tuple, dict]] = {}   # 表名 -> (版本键, 详情)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read_versions(conn: sqlite3.Connection) -> tuple[int, dict[str, tuple[int, Optional[int]]]]:
+        """读取 schema_version 与各表的 (version, row_count)"""
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        try:
+            rows = conn.execute(
+                f"SELECT table_name, version, row_count FROM {TABLE_VERSIONS_TABLE}"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        return schema_version, {row[0]: (row[1], row[2]) for row in rows}
+
+    @staticmethod
+    def _load_structure(conn: sqlite3.Connection, schema_version: int) -> _CatalogState:
+        """读取所有业务表的列信息与建表语句"""
+        state = _CatalogState(schema_version=schema_version)
+        tables = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='table' "
+            "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'chat_%' AND name NOT IN (?, ?) "
+            "ORDER BY name",
+            INTERNAL_TABLES
+        ).fetchall()
+
+        for name, ddl in tables:
+            columns = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+            state.tables[name] = [
+                {
+                    "name": col[1],
+                    "type": col[2],
+                    "nullable": not col[3],
+                    "primary_key": bool(col[5])
+                }
+                for col in columns
+            ]
+            state.ddl[name] = ddl
+        return state
+
+    @staticmethod
+    def _estimate_row_counts(conn: sqlite3.Connection, names: list[str]) -> dict[str, int]:
+        """
+        估算没有变更计数的表的行数
+
+        max(rowid) 只需读取主键 B 树的最右端，代价与表大小无关；有删除时结果偏大。
+        WITHOUT ROWID 表没有 rowid，估算为 0。
+        """
+        estimates = {}
+        for name in names:
+            try:
+                estimates[name] = conn.execute(f'SELECT max(rowid) FROM "{name}"').fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                estimates[name] = 0
+        return estimates
+
+    def _snapshot(self) -> tuple[_CatalogState, dict[str, tuple[int, Optional[int]]]]:
+        """
+        获取当前结构快照与表版本
+
+        schema_version 变化时重新读取结构。
+        """
+        with get_query_pool().connection() as conn:
+            schema_version, versions = self._read_versions(conn)
+
+            with self._lock:
+                state = self._state
+            if state is None or state.schema_version != schema_version:
+                state = self._load_structure(conn, schema_version)
+
+        with self._lock:
+            if self._state is None or self._state.schema_version != state.schema_version:
+                self._state = state
+                self._details.clear()
+        return state, versions
+
+    @staticmethod
+    def _etag(*parts: Any) -> str:
+        """根据版本信息生成弱 ETag"""
+        digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+        return f'W/"{digest}"'
+
+    def get_schema(self) -> tuple[dict, str]:
+        """
+        获取数据库结构信息
+
+        Returns:
+            (结构字典, ETag)
+        """
+        state, versions = self._snapshot()
+        row_counts = {name: versions[name][1] for name in state.tables if name in versions}
+        # 计数缺失（未装触发器或 row_count 为 NULL）的表改用估算值
+        missing = [name for name in state.tables if row_counts.get(name) is None]
+        if missing:
+            with get_query_pool().connection() as conn:
+                row_counts.update(self._estimate_row_counts(conn, missing))
+
+        schema = {
+            "dialect": get_sql_database().dialect,
+            "tables": [
+                {"name": name, "columns": columns, "row_count": row_counts[name]}
+                for name, columns in state.tables.items()
+            ]
+        }
+        return schema, self._etag(state.schema_version, sorted(row_counts.items()))
+
+    def get_table_names(self) -> tuple[list[str], str]:
+        """
+        获取业务表列表
+
+        Returns:
+            (表名列表, ETag)
+        """
+        state, _ = self._snapshot()
+        names = list(state.tables)
+        return names, self._etag(state.schema_version)
+
+    def get_table(self, table_name: str) -> Optional[tuple[dict, str]]:
+        """
+        获取指定表的建表语句与示例数据
+
+        Args:
+            table_name: 表名
+
+        Returns:
+            (表详情, ETag)，表不存在时返回 None
+        """
+        state, versions = self._snapshot()
+        if table_name not in state.tables:
+            return None
+
+        tracked = table_name in versions
+        key = (state.schema_version, versions[table_name][0] if tracked else None)
+        with self._lock:
+            cached = self._details.get(table_name)
+        if cached is not None and cached[0] == key:
+            return cached[1], self._etag(table_name, *key)
+
+        db = get_sql_database()
+        if table_name in db.get_usable_table_names():
+            table_info = db.get_table_info([table_name])
+        else:
+            # 启动后新建的表不在 SQLDatabase 的反射结果中，直接使用建表语句
+            table_info = state.ddl[table_name]
+
+        detail = {
+            "name": table_name,
+            "schema": table_info,
+            "sample_data": db.run(f'SELECT * FROM "{table_name}" LIMIT {self.sample_rows}'),
+        }
+        if not tracked:
+            # 没有变更计数的表无法判断示例数据是否过期：不缓存，ETag 随内容变化
+            return detail, self._etag(table_name, detail)
+        with self._lock:
+            self._details[table_name] = (key, detail)
+        return detail, self._etag(table_name, *key)
+
+    def get_schema_digest(self) -> str:
+        """
+        获取提供给 LLM 的紧凑结构摘要
+
+        包含表、列、类型、主键、外键和少量示例值。摘要挂在结构快照上，
+        只有 schema_version 变化时才重新生成（示例值不随数据更新）。
+
+        Returns:
+            结构摘要文本
+        """
+        state, _ = self._snapshot()
+        if state.digest is None:
+            with get_query_pool().connection() as conn:
+                digest = self._build_digest(conn, state)
+            with self._lock:
+                state.digest = digest
+        return state.digest
+
+    def _build_digest(self, conn: sqlite3.Connection, state: _CatalogState) -> str:
+        """生成结构摘要：每个表一段，每列一行"""
+        lines = []
+        for name, columns in state.tables.items():
+            # 取前若干行收集示例值，避免对大表做 DISTINCT 全表扫描
+            samples: list[list[str]] = [[] for _ in columns]
+            for row in conn.execute(f'SELECT * FROM "{name}" LIMIT 50'):
+                for i, value in enumerate(row):
+                    if i >= len(samples) or value is None or isinstance(value, bytes):
+                        continue
+                    text = repr(value) if isinstance(value, str) else str(value)
+                    if len(text) > 32:
+                        text = text[:32] + "…"
+                    if text not in samples[i] and len(samples[i]) < self.digest_sample_values:
+                        samples[i].append(text)
+
+            lines.append(f"表 {name}:")
+            for column, values in zip(columns, samples):
+                parts = [f"  - {column['name']} {column['type'] or 'ANY'}"]
+                if column["primary_key"]:
+                    parts.append("PK")
+                if not column["nullable"]:
+                    parts.append("NOT NULL")
+                if values and not column["primary_key"]:
+                    parts.append("例: " + ", ".join(values))
+                lines.append(" ".join(parts))
+
+            for fk in conn.execute(f'PRAGMA foreign_key_list("{name}")').fetchall():
+                lines.append(f"  - 外键 {fk[3]} -> {fk[2]}.{fk[4]}")
+
+        return "\n".join(lines)
+
+    def invalidate(self):
+        """丢弃缓存的结构与表详情"""
+        with self._lock:
+            self._state = None
+            self._details.clear()
+
+
+# 全局结构目录实例
+schema_catalog = SchemaCatalog()
+
+
+def get_database_schema() -> dict:
+    """
+    获取数据库结构信息
+
+    Returns:
+        包含表结构的字典
+    """
+    return schema_catalog.get_schema()[0]
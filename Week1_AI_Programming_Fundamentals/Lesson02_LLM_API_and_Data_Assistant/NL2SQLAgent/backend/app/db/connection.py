@@ -1,17 +1,32 @@
 """
 数据库连接管理模块
 """
+import hashlib
 import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from langchain_community.utilities import SQLDatabase
 
 from app.config import get_settings
 
 
+# 表级变更计数表（由触发器维护）
+TABLE_VERSIONS_TABLE = "_table_versions"
+
+# 已执行查询日志表（供索引顾问分析负载）
+QUERY_LOG_TABLE = "_query_log"
+
+# 内部表：不安装变更计数，也不暴露给 Agent
+INTERNAL_TABLES = (TABLE_VERSIONS_TABLE, QUERY_LOG_TABLE)
+
+
 def get_db_path() -> str:
     """获取数据库文件路径"""
     settings = get_settings()
@@ -60,7 +75,116 @@ def get_sql_database() -> SQLDatabase:
     if need_init:
         init_sample_database(db_path)
     
-    return SQLDatabase.from_uri(settings.database_url)
+    # 安装表级变更计数（供查询结果缓存判断失效）
+    conn = sqlite3.connect(db_path)
+    install_change_tracking(conn)
+    # SQLDatabase 要求忽略的表必须存在（查询日志表由 QueryLog 创建，可能晚于此处）
+    internal = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name IN (?, ?)",
+            INTERNAL_TABLES
+        )
+    ]
+    conn.close()
+    
+    return SQLDatabase.from_uri(
+        settings.database_url,
+        ignore_tables=internal,
+    )
+
+
+def install_change_tracking(conn: sqlite3.Connection):
+    """
+    为所有业务表安装变更计数触发器
+    
+    每次对表执行 INSERT / UPDATE / DELETE，_table_versions 中该表的 version 加 1，
+    INSERT / DELETE 同时维护 row_count，使行数查询不必全表 COUNT(*)。
+    会话表（chat_*）写入频繁且不参与查询缓存，因此跳过。可重复调用，
+    新建业务表后再次调用即可补装触发器；row_count 为 NULL 的表会重新计数。
+    
+    注意：未开启 recursive_triggers 时 REPLACE 冲突删除的行不触发 DELETE 触发器，
+    row_count 可能偏大，此时将其置为 NULL 后重新调用即可校正。
+    
+    Args:
+        conn: 可写的数据库连接
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            row_count INTEGER
+        )
+    """)
+    
+    # 旧版本计数表没有 row_count 列：补列并重建触发器
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_VERSIONS_TABLE})")]
+    if "row_count" not in columns:
+        conn.execute(f"ALTER TABLE {TABLE_VERSIONS_TABLE} ADD COLUMN row_count INTEGER")
+        for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE '\\_tv\\_%' ESCAPE '\\'"
+        ).fetchall():
+            conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    
+    tables = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' "
+            "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'chat_%' AND name NOT IN (?, ?)",
+            INTERNAL_TABLES
+        )
+    ]
+    
+    # 每种操作对 row_count 的增量
+    row_deltas = {"INSERT": " + 1", "UPDATE": "", "DELETE": " - 1"}
+    
+    for table in tables:
+        quoted = table.replace("'", "''")
+        conn.execute(
+            f"INSERT OR IGNORE INTO {TABLE_VERSIONS_TABLE} (table_name, version) VALUES (?, 0)",
+            (table,)
+        )
+        conn.execute(
+            f'UPDATE {TABLE_VERSIONS_TABLE} SET row_count = (SELECT COUNT(*) FROM "{table}") '
+            f"WHERE table_name = ? AND row_count IS NULL",
+            (table,)
+        )
+        for action, delta in row_deltas.items():
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS "_tv_{table}_{action.lower()}"
+                AFTER {action} ON "{table}"
+                BEGIN
+                    UPDATE {TABLE_VERSIONS_TABLE}
+                    SET version = version + 1, row_count = row_count{delta}
+                    WHERE table_name = '{quoted}';
+                END
+            """)
+    
+    conn.commit()
+
+
+def get_schema_fingerprint(conn: sqlite3.Connection) -> str:
+    """
+    计算业务表结构指纹
+    
+    对业务表和视图的建表语句取哈希，会话表与内部表不参与，
+    因此只有业务 schema 变化时指纹才会改变。
+    
+    Args:
+        conn: 数据库连接
+    
+    Returns:
+        十六进制哈希字符串
+    """
+    rows = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' "
+        "AND name NOT LIKE 'chat_%' AND name NOT IN (?, ?) ORDER BY name",
+        INTERNAL_TABLES
+    ).fetchall()
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update("\x1f".join(str(value) for value in row).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
 
 
 def get_raw_connection() -> sqlite3.Connection:
@@ -75,6 +199,225 @@ def get_raw_connection() -> sqlite3.Connection:
     return sqlite3.connect(db_path, check_same_thread=False)
 
 
+class ConnectionPool:
+    """
+    SQLite 连接池
+    
+    维护一组有上限的长连接（WAL 模式）。每个线程同一时刻最多借用一个连接，
+    同一线程内的嵌套借用复用同一个连接；归还时按间隔执行 WAL 检查点。
+    """
+    
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 8,
+        timeout: float = 10.0,
+        cache_size_kb: int = 16384,
+        mmap_size: int = 268435456,
+        checkpoint_interval: float = 60.0,
+        read_only: bool = False,
+    ):
+        """
+        初始化连接池
+        
+        Args:
+            db_path: 数据库文件路径
+            max_size: 最大连接数
+            timeout: 等待空闲连接 / 数据库锁的超时时间（秒）
+            cache_size_kb: 每个连接的页缓存大小（KB）
+            mmap_size: 内存映射大小（字节）
+            checkpoint_interval: WAL 检查点间隔（秒），<= 0 表示关闭
+            read_only: 是否以只读方式打开（用于执行 Agent 生成的 SQL）
+        """
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.checkpoint_interval = checkpoint_interval
+        self.read_only = read_only
+        
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._created = 0
+        self._last_checkpoint = time.monotonic()
+    
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建并调优一个新连接"""
+        if self.read_only:
+            # 关闭语句缓存：查询缓存依赖 authorizer 在每次 prepare 时记录读取的表
+            conn = sqlite3.connect(
+                f"file:{Path(self.db_path).resolve().as_posix()}?mode=ro",
+                uri=True,
+                timeout=self.timeout,
+                check_same_thread=False,
+                cached_statements=0,
+            )
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.timeout,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL 模式下 NORMAL 仍能保证一致性，只在检查点时 fsync
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def _checkout(self) -> sqlite3.Connection:
+        """从池中取出空闲连接，必要时新建或等待"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+        
+        if can_create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No database connection available within {self.timeout}s "
+                f"(pool size {self.max_size})"
+            )
+    
+    def _maybe_checkpoint(self, conn: sqlite3.Connection):
+        """距上次检查点超过间隔时执行一次 PASSIVE 检查点"""
+        if self.read_only or self.checkpoint_interval <= 0:
+            return
+        
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_checkpoint < self.checkpoint_interval:
+                return
+            self._last_checkpoint = now
+        
+        try:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        except sqlite3.Error:
+            pass
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        借用一个连接
+        
+        Yields:
+            sqlite3.Connection（row_factory 为 sqlite3.Row）
+        """
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            # 同一线程内嵌套借用，复用当前连接
+            self._local.depth = depth + 1
+            try:
+                yield self._local.conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn = self._checkout()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.depth = 0
+            self._local.conn = None
+            # 归还前回滚未提交的事务，避免把脏状态带给下一个借用者
+            if conn.in_transaction:
+                conn.rollback()
+            self._maybe_checkpoint(conn)
+            self._idle.put(conn)
+    
+    def checkpoint(self, mode: str = "PASSIVE"):
+        """
+        手动执行 WAL 检查点
+        
+        Args:
+            mode: PASSIVE / FULL / RESTART / TRUNCATE
+        """
+        with self.connection() as conn:
+            conn.execute(f"PRAGMA wal_checkpoint({mode})")
+        with self._lock:
+            self._last_checkpoint = time.monotonic()
+    
+    def close(self):
+        """截断 WAL 并关闭所有空闲连接"""
+        if not self.read_only:
+            try:
+                self.checkpoint("TRUNCATE")
+            except sqlite3.Error:
+                pass
+        
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+@lru_cache
+def get_connection_pool() -> ConnectionPool:
+    """
+    获取全局连接池实例
+    
+    Returns:
+        ConnectionPool 实例
+    """
+    settings = get_settings()
+    ensure_data_dir()
+    
+    return ConnectionPool(
+        get_db_path(),
+        max_size=settings.db_pool_size,
+        timeout=settings.db_pool_timeout,
+        cache_size_kb=settings.db_cache_size_kb,
+        mmap_size=settings.db_mmap_size,
+        checkpoint_interval=settings.db_checkpoint_interval,
+    )
+
+
+@lru_cache
+def get_query_pool() -> ConnectionPool:
+    """
+    获取只读查询连接池（用于执行 Agent 生成的 SQL）
+    
+    Returns:
+        只读 ConnectionPool 实例
+    """
+    settings = get_settings()
+    get_sql_database()  # 确保数据库及示例数据已初始化
+    
+    return ConnectionPool(
+        get_db_path(),
+        max_size=settings.db_pool_size,
+        timeout=settings.db_pool_timeout,
+        cache_size_kb=settings.db_cache_size_kb,
+        mmap_size=settings.db_mmap_size,
+        read_only=True,
+    )
+
+
 def init_sample_database(db_path: str):
     """
     初始化示例数据库
@@ -179,53 +522,3 @@ def init_sample_database(db_path: str):
     conn.close()
     
     print(f"Sample database initialized with {len(sales_data)} sales records and {len(employees_data)} employees.")
-
-
-def get_database_schema() -> dict:
-    """
-    获取数据库结构信息
-    
-    Returns:
-        包含表结构的字典
-    """
-    db = get_sql_database()
-    tables = db.get_usable_table_names()
-    
-    schema = {
-        "dialect": db.dialect,
-        "tables": []
-    }
-    
-    conn = get_raw_connection()
-    cursor = conn.cursor()
-    
-    for table in tables:
-        # 跳过内部表
-        if table.startswith("chat_"):
-            continue
-            
-        # 获取表结构
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = cursor.fetchall()
-        
-        # 获取行数
-        cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        row_count = cursor.fetchone()[0]
-        
-        table_info = {
-            "name": table,
-            "columns": [
-                {
-                    "name": col[1],
-                    "type": col[2],
-                    "nullable": not col[3],
-                    "primary_key": bool(col[5])
-                }
-                for col in columns
-            ],
-            "row_count": row_count
-        }
-        schema["tables"].append(table_info)
-    
-    conn.close()
-    return schema
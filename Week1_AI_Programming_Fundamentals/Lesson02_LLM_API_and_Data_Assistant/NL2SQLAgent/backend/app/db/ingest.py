@@ -0,0 +1,645 @@
+"""
+批量数据导入模块
+
+把大型 CSV / JSONL 文件流式导入分析数据库的新表或已有表：
+采样推断表结构，按批 executemany（每批一个事务），导入完成后再建索引并 ANALYZE。
+全程只在内存中保留一个批次，内存占用与文件大小无关。
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from itertools import chain, islice
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from app.config import get_settings
+from app.core.deadline import Deadline
+from app.db.connection import (
+    INTERNAL_TABLES,
+    TABLE_VERSIONS_TABLE,
+    get_db_path,
+    install_change_tracking,
+)
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson 为可选依赖
+    _json_loads = json.loads
+
+
+# 导入模式
+MODE_APPEND = "append"      # 追加到已有表（不存在则新建）
+MODE_REPLACE = "replace"    # 删除已有表后重建
+MODE_CREATE = "create"      # 只允许新建，表已存在时报错
+MODES = (MODE_APPEND, MODE_REPLACE, MODE_CREATE)
+
+FORMATS = ("csv", "jsonl")
+
+_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_DATETIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$")
+_INTEGER_PATTERN = re.compile(r"^[+-]?\d+$")
+_TABLE_NAME_PATTERN = re.compile(r"^[^\W\d]\w*$")
+
+# 读取上传流 / 文件时的缓冲区大小
+_READ_BUFFER = 1 << 20
+
+
+class IngestError(ValueError):
+    """导入参数或数据不合法"""
+
+
+@dataclass
+class IngestProgress:
+    """导入进度"""
+    table: str
+    rows: int = 0
+    skipped: int = 0
+    bytes_read: int = 0
+    total_bytes: Optional[int] = None
+    elapsed: float = 0.0
+    phase: str = "load"     # load / index / analyze
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(100.0, self.bytes_read * 100 / self.total_bytes)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["elapsed"] = round(self.elapsed, 3)
+        data["rows_per_second"] = round(self.rows_per_second)
+        data["percent"] = None if self.percent is None else round(self.percent, 1)
+        return data
+
+
+@dataclass
+class IngestResult:
+    """导入结果"""
+    table: str
+    mode: str
+    created: bool
+    columns: list[dict] = field(default_factory=list)   # [{name, type}]
+    rows: int = 0
+    skipped: int = 0
+    dropped_columns: list[str] = field(default_factory=list)
+    indexes: list[str] = field(default_factory=list)
+    batches: int = 0
+    load_ms: float = 0.0
+    index_ms: float = 0.0
+    analyze_ms: float = 0.0
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        for key in ("load_ms", "index_ms", "analyze_ms", "elapsed_ms"):
+            data[key] = round(data[key], 1)
+        data["rows_per_second"] = round(self.rows * 1000 / self.load_ms) if self.load_ms > 0 else 0
+        return data
+
+
+def sanitize_name(name: Any, fallback: str) -> str:
+    """列名 / 表名规范化：非单词字符替换为下划线，不能以数字开头"""
+    text = re.sub(r"\W+", "_", str(name or "").strip()).strip("_")
+    if not text:
+        return fallback
+    if text[0].isdigit():
+        text = f"c_{text}"
+    return text
+
+
+def _unique_names(names: Sequence[Any]) -> list[str]:
+    """规范化列名并去重（忽略大小写）"""
+    result, seen = [], set()
+    for i, name in enumerate(names):
+        base = candidate = sanitize_name(name, f"col_{i + 1}")
+        suffix = 2
+        while candidate.lower() in seen:
+            candidate = f"{base}_{suffix}"
+            suffix += 1
+        seen.add(candidate.lower())
+        result.append(candidate)
+    return result
+
+
+def infer_column_types(sample: list[Sequence[Any]], num_columns: int) -> list[str]:
+    """
+    根据样本推断列类型
+
+    Args:
+        sample: 样本行（CSV 为字符串，JSONL 为已解析的值）
+        num_columns: 列数
+
+    Returns:
+        每列的声明类型：INTEGER / REAL / DATE / TIMESTAMP / TEXT
+    """
+    types = []
+    for i in range(num_columns):
+        kinds = set()
+        for row in sample:
+            value = row[i] if i < len(row) else None
+            if value is None or value == "":
+                continue
+            if isinstance(value, bool) or isinstance(value, int):
+                kinds.add("INTEGER")
+            elif isinstance(value, float):
+                kinds.add("REAL")
+            elif not isinstance(value, str):
+                kinds.add("TEXT")
+            elif _INTEGER_PATTERN.match(value):
+                kinds.add("INTEGER")
+            elif _DATE_PATTERN.match(value):
+                kinds.add("DATE")
+            elif _DATETIME_PATTERN.match(value):
+                kinds.add("TIMESTAMP")
+            else:
+                try:
+                    float(value)
+                    kinds.add("REAL")
+                except ValueError:
+                    kinds.add("TEXT")
+
+        if not kinds or "TEXT" in kinds:
+            types.append("TEXT")
+        elif kinds <= {"INTEGER"}:
+            types.append("INTEGER")
+        elif kinds <= {"INTEGER", "REAL"}:
+            types.append("REAL")
+        elif kinds <= {"DATE"}:
+            types.append("DATE")
+        elif kinds <= {"DATE", "TIMESTAMP"}:
+            types.append("TIMESTAMP")
+        else:
+            types.append("TEXT")
+    return types
+
+
+class _CountingReader(io.RawIOBase):
+    """记录已读取字节数的二进制流包装（用于进度）"""
+
+    def __init__(self, raw: IO[bytes]):
+        self._raw = raw
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self.bytes_read += n
+        return n
+
+
+def _sniff_delimiter(head: bytes, encoding: str) -> str:
+    """根据文件开头内容推测 CSV 分隔符"""
+    try:
+        return csv.Sniffer().sniff(head.decode(encoding, errors="ignore"), delimiters=",\t;|").delimiter
+    except csv.Error:
+        return ","
+
+
+def _read_jsonl(text: IO[str], sample_rows: int) -> tuple[list[str], Iterator[tuple], list[int]]:
+    """
+    读取 JSONL：以样本中出现过的键作为列（按首次出现顺序），之后新出现的键忽略
+
+    Returns:
+        (列名, 行迭代器, [跳过的行数])，跳过计数在迭代过程中更新
+    """
+    skipped = [0]
+
+    def objects() -> Iterator[dict]:
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                obj = _json_loads(line)
+            except ValueError:
+                skipped[0] += 1
+                continue
+            if isinstance(obj, dict):
+                yield obj
+            else:
+                skipped[0] += 1
+
+    source = objects()
+    sample = list(islice(source, sample_rows))
+    keys: dict[str, None] = {}
+    for obj in sample:
+        keys.update(dict.fromkeys(obj))
+    if not keys:
+        raise IngestError("JSONL 文件中没有对象")
+    columns = list(keys)
+
+    def rows() -> Iterator[tuple]:
+        for obj in chain(sample, source):
+            yield tuple(_json_value(obj.get(key)) for key in columns)
+
+    return columns, rows(), skipped
+
+
+def _json_value(value: Any) -> Any:
+    """JSON 值转为 SQLite 可绑定的值（嵌套对象 / 数组存为 JSON 文本）"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class BulkLoader:
+    """
+    批量写入器
+
+    导入期间暂时移除该表的变更计数触发器（否则每行都会更新一次 _table_versions），
+    空表还会先删除二级索引、导入后重建；结束时（包括失败或取消）把 row_count 置为 NULL
+    并重新安装触发器，由 install_change_tracking 重新计数，表版本号加 1 使查询缓存失效。
+    """
+
+    def __init__(self, db_path: str, batch_rows: int = 50000, cache_size_kb: int = 65536):
+        """
+        初始化写入器
+
+        Args:
+            db_path: 数据库文件路径
+            batch_rows: 每批（每个事务）写入的行数
+            cache_size_kb: 导入连接的页缓存大小（KB）
+        """
+        self.db_path = db_path
+        self.batch_rows = max(1, batch_rows)
+        self.cache_size_kb = cache_size_kb
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        return conn
+
+    @staticmethod
+    def validate_table_name(table: str):
+        """
+        校验目标表名
+
+        Raises:
+            IngestError: 表名不合法或为内部表
+        """
+        lowered = table.lower()
+        if (
+            not _TABLE_NAME_PATTERN.match(table)
+            or lowered.startswith(("sqlite_", "chat_", "_"))
+            or table in INTERNAL_TABLES
+        ):
+            raise IngestError(f"不允许导入到表 {table}")
+
+    def load(
+        self,
+        table: str,
+        columns: Sequence[str],
+        types: Sequence[str],
+        rows: Iterable[Sequence[Any]],
+        mode: str = MODE_APPEND,
+        indexes: Sequence[Sequence[str]] = (),
+        empty_as_null: bool = False,
+        progress: Optional[Callable[[IngestProgress], None]] = None,
+        deadline: Optional[Deadline] = None,
+        bytes_read: Optional[Callable[[], int]] = None,
+        total_bytes: Optional[int] = None,
+    ) -> IngestResult:
+        """
+        批量写入行数据
+
+        Args:
+            table: 目标表名
+            columns: 输入列名（已规范化）
+            types: 新建表时各列的声明类型
+            rows: 行迭代器，与 columns 一一对应
+            mode: append / replace / create
+            indexes: 导入后创建的索引（每个为列名列表）
+            empty_as_null: 非 TEXT 列的空字符串写为 NULL（CSV）
+            progress: 进度回调，每批调用一次
+            deadline: 取消令牌，触发后在批次边界停止（已提交的批次保留）
+            bytes_read: 返回已读取字节数的函数（用于进度）
+            total_bytes: 输入总字节数（未知时为 None）
+
+        Returns:
+            导入结果
+
+        Raises:
+            IngestError: 参数不合法
+            DeadlineExceeded: 导入被取消
+        """
+        self.validate_table_name(table)
+        if mode not in MODES:
+            raise IngestError(f"不支持的导入模式: {mode}")
+        # 索引列在写入前先核对，避免导入完成后才发现参数错误
+        input_columns = {name.lower() for name in columns}
+        for cols in indexes:
+            missing = [col for col in cols if col.strip().lower() not in input_columns]
+            if missing:
+                raise IngestError(f"索引列不存在: {', '.join(missing)}")
+
+        start = time.perf_counter()
+        state = IngestProgress(table=table, total_bytes=total_bytes)
+        result = IngestResult(table=table, mode=mode, created=False)
+
+        def report(phase: str):
+            state.phase = phase
+            state.elapsed = time.perf_counter() - start
+            if bytes_read is not None:
+                state.bytes_read = bytes_read()
+            if progress is not None:
+                progress(state)
+
+        conn = self._connect()
+        try:
+            exists = self._table_exists(conn, table)
+            if exists and mode == MODE_CREATE:
+                raise IngestError(f"表 {table} 已存在")
+            if exists and mode == MODE_REPLACE:
+                conn.execute(f'DROP TABLE "{table}"')
+                exists = False
+
+            if not exists:
+                definition = ", ".join(f'"{name}" {type_}' for name, type_ in zip(columns, types))
+                conn.execute(f'CREATE TABLE "{table}" ({definition})')
+                result.created = True
+
+            # 输入列映射到表的列（追加到已有表时按列名忽略大小写匹配）
+            table_columns = [(row[1], (row[2] or "").upper()) for row in conn.execute(f'PRAGMA table_info("{table}")')]
+            by_name = {name.lower(): i for i, name in enumerate(columns)}
+            targets = [(name, type_) for name, type_ in table_columns if name.lower() in by_name]
+            if not targets:
+                raise IngestError(f"输入列与表 {table} 的列没有交集")
+            result.columns = [{"name": name, "type": type_} for name, type_ in targets]
+            result.dropped_columns = [
+                name for name in columns if name.lower() not in {t[0].lower() for t in targets}
+            ]
+            positions = [by_name[name.lower()] for name, _ in targets]
+            identity = positions == list(range(len(columns)))
+
+            placeholders = ", ".join(
+                "NULLIF(?, '')" if empty_as_null and "CHAR" not in type_ and "TEXT" not in type_ else "?"
+                for _, type_ in targets
+            )
+            insert_sql = (
+                f'INSERT INTO "{table}" ({", ".join(chr(34) + name + chr(34) for name, _ in targets)}) '
+                f"VALUES ({placeholders})"
+            )
+
+            # 暂停变更计数；空表先删二级索引，导入后统一重建
+            saved_indexes = []
+            self._drop_tracking_triggers(conn, table)
+            if not self._has_rows(conn, table):
+                saved_indexes = self._drop_indexes(conn, table)
+
+            load_start = time.perf_counter()
+            try:
+                source = iter(rows) if identity else (tuple(row[i] for i in positions) for row in rows)
+                while True:
+                    batch = list(islice(source, self.batch_rows))
+                    if not batch:
+                        break
+                    if deadline is not None:
+                        deadline.check()
+                    conn.execute("BEGIN")
+                    try:
+                        conn.executemany(insert_sql, batch)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    state.rows += len(batch)
+                    result.batches += 1
+                    report("load")
+            finally:
+                # 无论成功、失败还是取消，都重建原有索引并恢复变更计数（已提交的批次需要重新计数）
+                result.load_ms = (time.perf_counter() - load_start) * 1000
+                index_start = time.perf_counter()
+                report("index")
+                for sql in saved_indexes:
+                    conn.execute(sql)
+                self._restore_tracking(conn, table)
+
+            # 导入后再建新索引（一次排序建成，比逐行维护快得多）
+            known = {name.lower() for name, _ in targets}
+            for cols in indexes:
+                result.indexes.append(self._create_index(conn, table, cols, known))
+            result.index_ms = (time.perf_counter() - index_start) * 1000
+
+            analyze_start = time.perf_counter()
+            report("analyze")
+            # 完整统计（不设 analysis_limit）：采样统计在按导入顺序聚集的数据上偏差很大，会误导成本估算
+            conn.execute(f'ANALYZE "{table}"')
+            result.analyze_ms = (time.perf_counter() - analyze_start) * 1000
+        finally:
+            conn.close()
+
+        result.rows = state.rows
+        result.elapsed_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    @staticmethod
+    def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ? COLLATE NOCASE", (table,)
+        ).fetchone() is not None
+
+    @staticmethod
+    def _has_rows(conn: sqlite3.Connection, table: str) -> bool:
+        return conn.execute(f'SELECT 1 FROM "{table}" LIMIT 1').fetchone() is not None
+
+    @staticmethod
+    def _drop_tracking_triggers(conn: sqlite3.Connection, table: str):
+        for action in ("insert", "update", "delete"):
+            conn.execute(f'DROP TRIGGER IF EXISTS "_tv_{table}_{action}"')
+
+    @staticmethod
+    def _drop_indexes(conn: sqlite3.Connection, table: str) -> list[str]:
+        """删除表上的二级索引，返回其建索引语句（自动索引没有 sql，保留）"""
+        rows = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        ).fetchall()
+        for name, _ in rows:
+            conn.execute(f'DROP INDEX "{name}"')
+        return [sql for _, sql in rows]
+
+    @staticmethod
+    def _create_index(conn: sqlite3.Connection, table: str, columns: Sequence[str], known: set[str]) -> str:
+        """在导入后的表上创建索引，返回索引名"""
+        cols = [col.strip() for col in columns if col.strip()]
+        missing = [col for col in cols if col.lower() not in known]
+        if not cols or missing:
+            raise IngestError(f"索引列不存在: {', '.join(missing) or '(空)'}")
+        name = sanitize_name(f"idx_{table}_{'_'.join(cols)}", f"idx_{table}").lower()
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({", ".join(chr(34) + c + chr(34) for c in cols)})'
+        )
+        return name
+
+    @staticmethod
+    def _restore_tracking(conn: sqlite3.Connection, table: str):
+        """表版本号加 1、行数置为 NULL，重新安装触发器并重新计数"""
+        if BulkLoader._table_exists(conn, TABLE_VERSIONS_TABLE):
+            conn.execute(
+                f"UPDATE {TABLE_VERSIONS_TABLE} SET version = version + 1, row_count = NULL WHERE table_name = ?",
+                (table,)
+            )
+        install_change_tracking(conn)
+
+
+def ingest_stream(
+    stream: IO[bytes],
+    table: str,
+    fmt: str = "csv",
+    mode: str = MODE_APPEND,
+    indexes: Sequence[Sequence[str]] = (),
+    delimiter: Optional[str] = None,
+    encoding: str = "utf-8-sig",
+    total_bytes: Optional[int] = None,
+    bytes_read: Optional[Callable[[], int]] = None,
+    progress: Optional[Callable[[IngestProgress], None]] = None,
+    deadline: Optional[Deadline] = None,
+    loader: Optional[BulkLoader] = None,
+) -> IngestResult:
+    """
+    从二进制流导入 CSV / JSONL
+
+    Args:
+        stream: 二进制输入流（文件、上传请求体等），只顺序读取一遍
+        table: 目标表名
+        fmt: csv / jsonl
+        mode: append / replace / create
+        indexes: 导入后创建的索引（每个为列名列表）
+        delimiter: CSV 分隔符，None 表示自动推测
+        encoding: 文本编码（默认兼容 UTF-8 BOM）
+        total_bytes: 输入总字节数（用于进度百分比）
+        bytes_read: 返回已读取字节数的函数，默认统计从 stream 读取的字节数
+        progress: 进度回调
+        deadline: 取消令牌
+        loader: 批量写入器，默认使用全局实例
+
+    Returns:
+        导入结果
+
+    Raises:
+        IngestError: 格式或参数不合法
+    """
+    if fmt not in FORMATS:
+        raise IngestError(f"不支持的文件格式: {fmt}")
+    loader = loader or get_bulk_loader()
+    loader.validate_table_name(table)
+    sample_rows = get_settings().ingest_sample_rows
+
+    counter = _CountingReader(stream)
+    buffered = io.BufferedReader(counter, _READ_BUFFER)
+    text = io.TextIOWrapper(buffered, encoding=encoding, newline="")
+    skipped = [0]
+
+    if fmt == "csv":
+        if delimiter is None:
+            delimiter = _sniff_delimiter(buffered.peek(64 * 1024)[:64 * 1024], encoding)
+        reader = csv.reader(text, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            raise IngestError("CSV 文件为空或缺少表头")
+        columns = _unique_names(header)
+        width = len(columns)
+
+        def rows() -> Iterator[list[str]]:
+            for row in reader:
+                if len(row) == width:
+                    yield row
+                elif row:
+                    skipped[0] += 1     # 列数不符的行跳过
+
+        source = rows()
+        empty_as_null = True
+    else:
+        keys, source, skipped = _read_jsonl(text, sample_rows)
+        columns = _unique_names(keys)
+        empty_as_null = False
+
+    sample = list(islice(source, sample_rows))
+    types = infer_column_types(sample, len(columns))
+
+    def report(state: IngestProgress):
+        state.skipped = skipped[0]
+        if progress is not None:
+            progress(state)
+
+    result = loader.load(
+        table,
+        columns,
+        types,
+        chain(sample, source),
+        mode=mode,
+        indexes=indexes,
+        empty_as_null=empty_as_null,
+        progress=report,
+        deadline=deadline,
+        bytes_read=bytes_read or (lambda: counter.bytes_read),
+        total_bytes=total_bytes,
+    )
+    result.skipped = skipped[0]
+    return result
+
+
+def ingest_file(
+    path: str,
+    table: Optional[str] = None,
+    fmt: Optional[str] = None,
+    **kwargs,
+) -> IngestResult:
+    """
+    导入本地 CSV / JSONL 文件（支持 .gz 压缩）
+
+    Args:
+        path: 文件路径
+        table: 目标表名，默认取文件名
+        fmt: csv / jsonl，默认按扩展名判断（.jsonl / .ndjson 为 JSONL，其余为 CSV）
+        **kwargs: 传给 ingest_stream 的其他参数
+
+    Returns:
+        导入结果
+    """
+    name = os.path.basename(path)
+    compressed = name.lower().endswith(".gz")
+    if compressed:
+        name = name[:-3]
+    stem, ext = os.path.splitext(name)
+    if fmt is None:
+        fmt = "jsonl" if ext.lower() in (".jsonl", ".ndjson", ".json") else "csv"
+    table = table or sanitize_name(stem, "imported").lower()
+
+    with open(path, "rb") as raw:
+        total_bytes = os.fstat(raw.fileno()).st_size
+        if compressed:
+            # 进度按压缩文件的读取位置计算
+            return ingest_stream(
+                gzip.GzipFile(fileobj=raw), table, fmt, total_bytes=total_bytes, bytes_read=raw.tell, **kwargs
+            )
+        return ingest_stream(raw, table, fmt, total_bytes=total_bytes, **kwargs)
+
+
+@lru_cache
+def get_bulk_loader() -> BulkLoader:
+    """
+    获取全局批量写入器
+
+    Returns:
+        BulkLoader 实例
+    """
+    settings = get_settings()
+    return BulkLoader(get_db_path(), batch_rows=settings.ingest_batch_rows)
@@ -0,0 +1,190 @@
+"""
+已执行查询日志模块
+
+记录 Agent 实际执行的 SQL、耗时与结果行数，供索引顾问分析查询负载。
+记录先进入内存缓冲，按条数或时间间隔批量写入，不在每次查询后单独提交事务。
+"""
+import atexit
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.config import get_settings
+from app.core.query_cache import normalize_sql
+from app.db.connection import ConnectionPool, QUERY_LOG_TABLE, ensure_data_dir, get_connection_pool
+
+
+class QueryLog:
+    """
+    查询日志
+
+    线程安全：record() 可在工具线程池中并发调用。
+    超过 max_rows 时按 ID 删除最旧的记录。
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ConnectionPool] = None,
+        max_rows: int = 100000,
+        flush_rows: int = 50,
+        flush_interval: float = 5.0,
+    ):
+        """
+        初始化查询日志
+
+        Args:
+            pool: 可写连接池，为空则使用全局连接池
+            max_rows: 保留的最大记录数
+            flush_rows: 缓冲达到多少条时写入
+            flush_interval: 距上次写入超过多少秒时写入
+        """
+        ensure_data_dir()
+        self._pool = pool or get_connection_pool()
+        self.max_rows = max_rows
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: list[tuple] = []
+        self._last_flush = time.monotonic()
+        self._init_table()
+
+    def _init_table(self):
+        """初始化表结构"""
+        with self._pool.connection() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {QUERY_LOG_TABLE} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sql TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    row_count INTEGER,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx{QUERY_LOG_TABLE}_fingerprint "
+                f"ON {QUERY_LOG_TABLE}(fingerprint)"
+            )
+            conn.commit()
+
+    def record(self, sql: str, duration_ms: float, row_count: Optional[int] = None, error: Optional[str] = None):
+        """
+        记录一次查询执行
+
+        Args:
+            sql: 实际执行的 SQL
+            duration_ms: 执行耗时（毫秒，含取回结果）
+            row_count: 结果行数
+            error: 执行失败时的错误信息
+        """
+        with self._lock:
+            self._buffer.append((sql, normalize_sql(sql), duration_ms, row_count, error))
+            due = (
+                len(self._buffer) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """把缓冲中的记录写入数据库"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not rows:
+                return
+
+            try:
+                with self._pool.connection() as conn:
+                    conn.executemany(
+                        f"INSERT INTO {QUERY_LOG_TABLE} (sql, fingerprint, duration_ms, row_count, error) "
+                        f"VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    conn.execute(
+                        f"DELETE FROM {QUERY_LOG_TABLE} WHERE id <= "
+                        f"(SELECT MAX(id) FROM {QUERY_LOG_TABLE}) - ?",
+                        (self.max_rows,)
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                # 日志写入失败不影响查询本身
+                print(f"Query log flush failed: {e}")
+
+    def workload(self, limit: int = 50) -> list[dict]:
+        """
+        按查询指纹汇总执行负载
+
+        Args:
+            limit: 最多返回的查询数（按总耗时倒序）
+
+        Returns:
+            [{fingerprint, sql, executions, avg_ms, total_ms, last_run}]，sql 为最近一次执行的语句
+        """
+        self.flush()
+        with self._pool.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT g.fingerprint, l.sql, g.executions, g.avg_ms, g.total_ms, g.last_run
+                FROM (
+                    SELECT fingerprint,
+                           MAX(id) AS last_id,
+                           COUNT(*) AS executions,
+                           AVG(duration_ms) AS avg_ms,
+                           SUM(duration_ms) AS total_ms,
+                           MAX(created_at) AS last_run
+                    FROM {QUERY_LOG_TABLE}
+                    WHERE error IS NULL
+                    GROUP BY fingerprint
+                    ORDER BY total_ms DESC
+                    LIMIT ?
+                ) g
+                JOIN {QUERY_LOG_TABLE} l ON l.id = g.last_id
+                ORDER BY g.total_ms DESC
+            """, (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> dict:
+        """日志统计信息"""
+        self.flush()
+        with self._pool.connection() as conn:
+            row = conn.execute(f"""
+                SELECT COUNT(*) AS executions,
+                       COUNT(DISTINCT fingerprint) AS queries,
+                       SUM(error IS NOT NULL) AS errors,
+                       AVG(duration_ms) AS avg_ms
+                FROM {QUERY_LOG_TABLE}
+            """).fetchone()
+        return {
+            "executions": row["executions"],
+            "queries": row["queries"],
+            "errors": row["errors"] or 0,
+            "avg_ms": round(row["avg_ms"] or 0.0, 3),
+            "max_rows": self.max_rows,
+        }
+
+    def clear(self):
+        """清空日志"""
+        with self._lock:
+            self._buffer = []
+        with self._pool.connection() as conn:
+            conn.execute(f"DELETE FROM {QUERY_LOG_TABLE}")
+            conn.commit()
+
+
+def _create_query_log() -> QueryLog:
+    settings = get_settings()
+    return QueryLog(
+        max_rows=settings.query_log_max_rows,
+        flush_rows=settings.query_log_flush_rows,
+        flush_interval=settings.query_log_flush_seconds,
+    )
+
+
+# 全局查询日志实例（进程退出时写入剩余缓冲）
+query_log = _create_query_log()
+atexit.register(query_log.flush)
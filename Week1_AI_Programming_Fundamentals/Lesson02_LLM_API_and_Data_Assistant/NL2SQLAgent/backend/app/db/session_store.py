@@ -1,55 +1,162 @@
 """
 会话持久化存储模块
 """
+import asyncio
+import base64
+import json
 import sqlite3
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from functools import partial
+from typing import Any, Optional
 
-from app.db.connection import get_raw_connection, ensure_data_dir
+from app.config import get_settings
+from app.core.metrics import current_trace
+from app.db.connection import ConnectionPool, get_connection_pool, ensure_data_dir
+
+
+def _migrate_v1(cursor: sqlite3.Cursor):
+    """v1: 反范式化消息计数 + 会话/消息索引"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(chat_sessions)")}
+    if "message_count" not in columns:
+        cursor.execute(
+            "ALTER TABLE chat_sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"
+        )
+    
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created "
+        "ON chat_messages(session_id, created_at)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated "
+        "ON chat_sessions(updated_at, id)"
+    )
+    
+    # 回填已有会话的消息数（先建索引，子查询才能走索引）
+    cursor.execute("""
+        UPDATE chat_sessions SET message_count = (
+            SELECT COUNT(*) FROM chat_messages m WHERE m.session_id = chat_sessions.id
+        )
+    """)
+
+
+def _migrate_v2(cursor: sqlite3.Cursor):
+    """v2: 会话滚动摘要（summary_upto 为已折叠进摘要的最后一条消息 ID）"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(chat_sessions)")}
+    if "summary" not in columns:
+        cursor.execute("ALTER TABLE chat_sessions ADD COLUMN summary TEXT")
+    if "summary_upto" not in columns:
+        cursor.execute(
+            "ALTER TABLE chat_sessions ADD COLUMN summary_upto INTEGER NOT NULL DEFAULT 0"
+        )
+
+
+def encode_cursor(direction: str, key: Any, row_id: Any) -> str:
+    """
+    编码分页游标
+    
+    Args:
+        direction: next（沿排序方向向后）/ prev（向前）
+        key: 排序键的值（updated_at / created_at）
+        row_id: 行 ID，用于排序键相同时定序
+    
+    Returns:
+        不透明的 URL 安全字符串
+    """
+    payload = json.dumps([direction, key, row_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, Any, Any]:
+    """
+    解码分页游标
+    
+    Raises:
+        ValueError: 游标格式不合法
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, key, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    
+    if direction not in ("next", "prev"):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return direction, key, row_id
+
+
+# 表结构迁移（版本号记录在 PRAGMA user_version，按顺序执行）
+SCHEMA_MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+]
 
 
 class SessionStore:
     """会话存储管理器"""
     
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        """
+        初始化会话存储
+        
+        Args:
+            pool: 连接池，为空则使用全局连接池
+        """
         ensure_data_dir()
+        self._pool = pool or get_connection_pool()
         self._init_tables()
     
-    def _get_conn(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        conn = get_raw_connection()
-        conn.row_factory = sqlite3.Row
-        return conn
-    
     def _init_tables(self):
         """初始化表结构"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chat_sessions (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chat_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                sql_query TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    sql_query TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
+                )
+            """)
+            
+            conn.commit()
+            
+            self._migrate(conn)
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        """执行未应用的表结构迁移"""
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current >= SCHEMA_MIGRATIONS[-1][0]:
+            return
+        
+        # 加写锁后重新读取版本，避免多进程重复迁移
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            current = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for version, migrate in SCHEMA_MIGRATIONS:
+                if version > current:
+                    migrate(cursor)
+                    cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
     
     def create_session(self, title: Optional[str] = None) -> dict:
         """
@@ -67,16 +174,15 @@ class SessionStore:
         if not title:
             title = f"新会话 {now.strftime('%m-%d %H:%M')}"
         
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT INTO chat_sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
-            (session_id, title, now, now)
-        )
-        
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "INSERT INTO chat_sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, title, now, now)
+            )
+            
+            conn.commit()
         
         return {
             "id": session_id,
@@ -96,22 +202,15 @@ class SessionStore:
         Returns:
             会话信息字典，不存在返回 None
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """
-            SELECT s.*, COUNT(m.id) as message_count
-            FROM chat_sessions s
-            LEFT JOIN chat_messages m ON s.id = m.session_id
-            WHERE s.id = ?
-            GROUP BY s.id
-            """,
-            (session_id,)
-        )
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT * FROM chat_sessions WHERE id = ?",
+                (session_id,)
+            )
+            
+            row = cursor.fetchone()
         
         if row:
             return dict(row)
@@ -128,25 +227,36 @@ class SessionStore:
         Returns:
             会话列表
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """
+                SELECT * FROM chat_sessions
+                ORDER BY updated_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                (limit, offset)
+            )
+            
+            rows = cursor.fetchall()
         
-        cursor.execute(
-            """
-            SELECT s.*, COUNT(m.id) as message_count
-            FROM chat_sessions s
-            LEFT JOIN chat_messages m ON s.id = m.session_id
-            GROUP BY s.id
-            ORDER BY s.updated_at DESC
-            LIMIT ? OFFSET ?
-            """,
-            (limit, offset)
-        )
+        return [dict(row) for row in rows]
+    
+    def list_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> dict:
+        """
+        游标分页获取会话列表（按 updated_at, id 倒序）
         
-        rows = cursor.fetchall()
-        conn.close()
+        Args:
+            limit: 每页数量
+            cursor: 上一次返回的 next_cursor / prev_cursor，为空表示第一页
         
-        return [dict(row) for row in rows]
+        Returns:
+            {"items": [...], "next_cursor": ..., "prev_cursor": ...}
+        """
+        return self._keyset_page(
+            "chat_sessions", "updated_at", descending=True, limit=limit, cursor=cursor
+        )
     
     def update_session(self, session_id: str, title: str) -> bool:
         """
@@ -159,17 +269,16 @@ class SessionStore:
         Returns:
             是否更新成功
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE chat_sessions SET title = ?, updated_at = ? WHERE id = ?",
-            (title, datetime.now(), session_id)
-        )
-        
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE chat_sessions SET title = ?, updated_at = ? WHERE id = ?",
+                (title, datetime.now(), session_id)
+            )
+            
+            affected = cursor.rowcount
+            conn.commit()
         
         return affected > 0
     
@@ -183,32 +292,29 @@ class SessionStore:
         Returns:
             是否删除成功
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        # 先删除消息
-        cursor.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
-        # 再删除会话
-        cursor.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
-        
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 先删除消息，再删除会话（计数随会话行一起删除，两者在同一事务内）
+            cursor.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            cursor.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+            
+            affected = cursor.rowcount
+            conn.commit()
         
         return affected > 0
     
     def touch_session(self, session_id: str):
         """更新会话的最后更新时间"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE chat_sessions SET updated_at = ? WHERE id = ?",
-            (datetime.now(), session_id)
-        )
-        
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE chat_sessions SET updated_at = ? WHERE id = ?",
+                (datetime.now(), session_id)
+            )
+            
+            conn.commit()
     
     def add_message(
         self,
@@ -229,28 +335,31 @@ class SessionStore:
         Returns:
             消息信息字典
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        now = datetime.now()
-        
-        cursor.execute(
-            """
-            INSERT INTO chat_messages (session_id, role, content, sql_query, created_at)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (session_id, role, content, sql_query, now)
-        )
-        
-        message_id = cursor.lastrowid
-        
-        # 更新会话时间
-        cursor.execute(
-            "UPDATE chat_sessions SET updated_at = ? WHERE id = ?",
-            (now, session_id)
-        )
-        
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now()
+            
+            cursor.execute(
+                """
+                INSERT INTO chat_messages (session_id, role, content, sql_query, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (session_id, role, content, sql_query, now)
+            )
+            
+            message_id = cursor.lastrowid
+            
+            # 更新会话时间和消息计数（与插入在同一事务内）
+            cursor.execute(
+                """
+                UPDATE chat_sessions
+                SET updated_at = ?, message_count = message_count + 1
+                WHERE id = ?
+                """,
+                (now, session_id)
+            )
+            
+            conn.commit()
         
         return {
             "id": message_id,
@@ -272,56 +381,341 @@ class SessionStore:
         Returns:
             消息列表
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """
+                SELECT * FROM chat_messages
+                WHERE session_id = ?
+                ORDER BY created_at ASC
+                LIMIT ?
+                """,
+                (session_id, limit)
+            )
+            
+            rows = cursor.fetchall()
         
-        cursor.execute(
-            """
-            SELECT * FROM chat_messages
-            WHERE session_id = ?
-            ORDER BY created_at ASC
-            LIMIT ?
-            """,
-            (session_id, limit)
-        )
+        return [dict(row) for row in rows]
+    
+    def get_messages_page(
+        self,
+        session_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        from_tail: bool = False
+    ) -> dict:
+        """
+        游标分页获取会话消息（按 created_at, id 正序）
         
-        rows = cursor.fetchall()
-        conn.close()
+        Args:
+            session_id: 会话 ID
+            limit: 每页数量
+            cursor: 上一次返回的 next_cursor / prev_cursor
+            from_tail: 无游标时从最新消息开始（用于从尾部懒加载长对话）
         
-        return [dict(row) for row in rows]
+        Returns:
+            {"items": [...], "next_cursor": ..., "prev_cursor": ...}
+        """
+        return self._keyset_page(
+            "chat_messages", "created_at", descending=False, limit=limit, cursor=cursor,
+            filters=("session_id = ?",), params=(session_id,), from_tail=from_tail
+        )
     
-    def get_recent_messages(self, session_id: str, limit: int = 10) -> list[dict]:
+    def get_recent_messages(self, session_id: str, limit: int = 10, after_id: int = 0) -> list[dict]:
         """
         获取最近的消息（用于上下文记忆）
         
         Args:
             session_id: 会话 ID
             limit: 返回数量限制
+            after_id: 只返回 ID 大于该值的消息（已折叠进摘要的消息不再加载）
         
         Returns:
             消息列表（按时间正序）
         """
-        conn = self._get_conn()
-        cursor = conn.cursor()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """
+                SELECT * FROM (
+                    SELECT * FROM chat_messages
+                    WHERE session_id = ? AND id > ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ) sub
+                ORDER BY created_at ASC, id ASC
+                """,
+                (session_id, after_id, limit)
+            )
+            
+            rows = cursor.fetchall()
         
-        cursor.execute(
-            """
-            SELECT * FROM (
-                SELECT * FROM chat_messages
-                WHERE session_id = ?
-                ORDER BY created_at DESC
-                LIMIT ?
-            ) sub
-            ORDER BY created_at ASC
-            """,
-            (session_id, limit)
-        )
+        return [dict(row) for row in rows]
+    
+    def get_messages_between(self, session_id: str, after_id: int, upto_id: int) -> list[dict]:
+        """
+        获取 ID 在 (after_id, upto_id] 范围内的消息（用于生成摘要）
         
-        rows = cursor.fetchall()
-        conn.close()
+        Args:
+            session_id: 会话 ID
+            after_id: 起始 ID（不含）
+            upto_id: 结束 ID（含）
+        
+        Returns:
+            消息列表（按 ID 正序）
+        """
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT * FROM chat_messages
+                WHERE session_id = ? AND id > ? AND id <= ?
+                ORDER BY id ASC
+                """,
+                (session_id, after_id, upto_id)
+            ).fetchall()
         
         return [dict(row) for row in rows]
+    
+    def get_summary(self, session_id: str) -> tuple[Optional[str], int]:
+        """
+        获取会话的滚动摘要
+        
+        Args:
+            session_id: 会话 ID
+        
+        Returns:
+            (摘要, 已折叠进摘要的最后一条消息 ID)，会话不存在时返回 (None, 0)
+        """
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT summary, summary_upto FROM chat_sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+        
+        return (row[0], row[1]) if row else (None, 0)
+    
+    def update_summary(self, session_id: str, summary: str, summary_upto: int) -> bool:
+        """
+        更新会话的滚动摘要（只会向前推进，不会被较旧的结果覆盖）
+        
+        Args:
+            session_id: 会话 ID
+            summary: 新摘要
+            summary_upto: 摘要覆盖到的最后一条消息 ID
+        
+        Returns:
+            是否更新
+        """
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE chat_sessions SET summary = ?, summary_upto = ? "
+                "WHERE id = ? AND summary_upto < ?",
+                (summary, summary_upto, session_id, summary_upto)
+            )
+            
+            affected = cursor.rowcount
+            conn.commit()
+        
+        return affected > 0
+    
+    def _keyset_page(
+        self,
+        table: str,
+        key: str,
+        descending: bool,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: tuple = (),
+        params: tuple = (),
+        from_tail: bool = False
+    ) -> dict:
+        """
+        基于 (key, id) 的键集分页，任意页的代价都与第一页相同
+        
+        Args:
+            table: 表名
+            key: 排序键列名
+            descending: 是否按倒序展示
+            limit: 每页数量
+            cursor: 分页游标
+            filters: 额外的 WHERE 条件
+            params: 额外条件的参数
+            from_tail: 无游标时从排序末尾开始
+        """
+        limit = max(1, limit)
+        conditions = list(filters)
+        args = list(params)
+        
+        direction = "prev" if from_tail else "next"
+        if cursor:
+            direction, key_value, row_id = decode_cursor(cursor)
+            # next 沿展示顺序向后，prev 向前
+            op = "<" if descending == (direction == "next") else ">"
+            conditions.append(f"({key}, id) {op} (?, ?)")
+            args += [key_value, row_id]
+        
+        # prev 方向逆序扫描，取到后再翻转回展示顺序
+        scan_desc = descending if direction == "next" else not descending
+        order = "DESC" if scan_desc else "ASC"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {table} {where} ORDER BY {key} {order}, id {order} LIMIT ?",
+                (*args, limit + 1)
+            ).fetchall()
+        
+        items = [dict(row) for row in rows[:limit]]
+        has_more = len(rows) > limit
+        if direction == "prev":
+            items.reverse()
+        
+        if direction == "next":
+            has_next, has_prev = has_more, cursor is not None
+        else:
+            has_next, has_prev = cursor is not None, has_more
+        
+        if items:
+            first = (items[0][key], items[0]["id"])
+            last = (items[-1][key], items[-1]["id"])
+        elif cursor:
+            # 空页：以游标位置作为边界，仍可反向翻页
+            first = last = (key_value, row_id)
+        else:
+            first = last = None
+        
+        return {
+            "items": items,
+            "next_cursor": encode_cursor("next", *last) if has_next and last else None,
+            "prev_cursor": encode_cursor("prev", *first) if has_prev and first else None,
+        }
+
+
+# 写操作的方法名（其余视为读操作，用于请求耗时分解中的 db_read / db_write）
+_WRITE_METHODS = frozenset({
+    "create_session", "update_session", "delete_session", "touch_session", "add_message", "update_summary",
+})
+
+
+class AsyncSessionStore:
+    """
+    异步会话存储
+    
+    与 SessionStore 接口一致，所有 SQLite 操作在专用线程池中执行，
+    避免阻塞事件循环（以及其上正在推送的 SSE 流）。
+    在聊天请求中调用时，耗时（含线程池排队）计入当前请求的 db_read / db_write 阶段。
+    """
+    
+    def __init__(self, store: SessionStore, max_workers: Optional[int] = None):
+        """
+        初始化异步会话存储
+        
+        Args:
+            store: 同步会话存储
+            max_workers: 工作线程数，默认与连接池大小一致
+        """
+        self._store = store
+        self._max_workers = max_workers or get_settings().db_pool_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    async def _run(self, func, *args, **kwargs):
+        """在专用线程池中执行同步方法"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="session-store",
+            )
+        loop = asyncio.get_running_loop()
+        trace = current_trace.get()
+        if trace is None:
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            phase = "db_write" if func.__name__ in _WRITE_METHODS else "db_read"
+            trace.add(phase, (time.perf_counter() - start) * 1000)
+    
+    async def create_session(self, title: Optional[str] = None) -> dict:
+        """创建新会话"""
+        return await self._run(self._store.create_session, title)
+    
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        """获取会话信息"""
+        return await self._run(self._store.get_session, session_id)
+    
+    async def list_sessions(self, limit: int = 50, offset: int = 0) -> list[dict]:
+        """获取会话列表"""
+        return await self._run(self._store.list_sessions, limit, offset)
+    
+    async def list_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> dict:
+        """游标分页获取会话列表"""
+        return await self._run(self._store.list_sessions_page, limit, cursor)
+    
+    async def update_session(self, session_id: str, title: str) -> bool:
+        """更新会话标题"""
+        return await self._run(self._store.update_session, session_id, title)
+    
+    async def delete_session(self, session_id: str) -> bool:
+        """删除会话及其所有消息"""
+        return await self._run(self._store.delete_session, session_id)
+    
+    async def touch_session(self, session_id: str):
+        """更新会话的最后更新时间"""
+        return await self._run(self._store.touch_session, session_id)
+    
+    async def add_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        sql_query: Optional[str] = None
+    ) -> dict:
+        """添加消息"""
+        return await self._run(self._store.add_message, session_id, role, content, sql_query)
+    
+    async def get_messages(self, session_id: str, limit: int = 100) -> list[dict]:
+        """获取会话消息"""
+        return await self._run(self._store.get_messages, session_id, limit)
+    
+    async def get_messages_page(
+        self,
+        session_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        from_tail: bool = False
+    ) -> dict:
+        """游标分页获取会话消息"""
+        return await self._run(self._store.get_messages_page, session_id, limit, cursor, from_tail)
+    
+    async def get_recent_messages(self, session_id: str, limit: int = 10, after_id: int = 0) -> list[dict]:
+        """获取最近的消息（用于上下文记忆）"""
+        return await self._run(self._store.get_recent_messages, session_id, limit, after_id)
+    
+    async def get_messages_between(self, session_id: str, after_id: int, upto_id: int) -> list[dict]:
+        """获取 ID 在 (after_id, upto_id] 范围内的消息"""
+        return await self._run(self._store.get_messages_between, session_id, after_id, upto_id)
+    
+    async def get_summary(self, session_id: str) -> tuple[Optional[str], int]:
+        """获取会话的滚动摘要"""
+        return await self._run(self._store.get_summary, session_id)
+    
+    async def update_summary(self, session_id: str, summary: str, summary_upto: int) -> bool:
+        """更新会话的滚动摘要"""
+        return await self._run(self._store.update_summary, session_id, summary, summary_upto)
+    
+    def shutdown(self):
+        """关闭线程池（再次调用时会自动重建）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
 
 
 # 全局会话存储实例
 session_store = SessionStore()
+async_session_store = AsyncSessionStore(session_store)
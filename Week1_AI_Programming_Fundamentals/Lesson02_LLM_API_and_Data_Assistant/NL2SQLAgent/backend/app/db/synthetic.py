@@ -0,0 +1,460 @@
+"""
+合成数据集生成模块
+
+按固定随机种子生成 sales / employees 及维度表（products、regions、departments），
+规模可选 10k / 1m / 50m 行（或任意行数），作为基准测试与压测的标准数据。
+品类、地区、日期带有真实的偏斜：少数热门商品贡献大部分销量，华东华南占比最高，
+销量逐年增长并在周末、618、双十一等时段出现高峰。
+
+用 numpy 按块向量化生成，每块由 (seed, 块序号) 单独播种，结果与写入批次大小无关；
+写入复用 BulkLoader（大批量 executemany、导入后建索引并 ANALYZE），内存中只保留一块数据。
+"""
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterator, Optional, Union
+
+import numpy as np
+
+from app.db.connection import get_db_path
+from app.db.ingest import MODE_APPEND, BulkLoader, IngestProgress, get_bulk_loader
+
+
+# 预置规模（sales 行数）
+SCALES = {"10k": 10_000, "1m": 1_000_000, "50m": 50_000_000}
+
+# 每块独立播种的行数（固定值，改动会改变生成结果）
+_CHUNK_ROWS = 100_000
+
+# 随机数流编号：各表使用互不相关的随机序列
+_STREAM_PRODUCTS, _STREAM_EMPLOYEES, _STREAM_SALES = 1, 2, 3
+
+# 销售日期范围
+_SALES_START, _SALES_END = "2022-01-01", "2025-01-01"
+_HIRE_START, _HIRE_END = "2010-01-01", "2025-01-01"
+
+# 地区及销量占比
+REGIONS = [
+    ("华东", 0.34), ("华南", 0.22), ("华北", 0.18), ("华中", 0.10),
+    ("西南", 0.08), ("西北", 0.05), ("东北", 0.03),
+]
+
+# 品类 -> (品类权重, 品牌, [(商品, 最低价, 最高价)])
+CATALOG = {
+    "电子产品": (0.40, ["联想", "华为", "小米", "戴尔", "罗技"], [
+        ("笔记本电脑", 3500, 12000), ("平板电脑", 1500, 6000), ("显示器", 700, 3500),
+        ("机械键盘", 150, 900), ("无线鼠标", 49, 299), ("耳机", 99, 1999), ("投影仪", 1500, 8000),
+    ]),
+    "家具": (0.15, ["宜家", "顾家", "震旦"], [
+        ("办公椅", 300, 2500), ("办公桌", 500, 3000), ("书架", 200, 1200), ("台灯", 60, 400),
+        ("文件柜", 300, 1500),
+    ]),
+    "办公用品": (0.25, ["得力", "晨光", "齐心"], [
+        ("打印纸", 19, 49), ("签字笔", 2, 15), ("文件夹", 5, 30), ("白板", 80, 400),
+        ("订书机", 10, 60), ("便利贴", 3, 20),
+    ]),
+    "食品饮料": (0.12, ["三只松鼠", "农夫山泉", "雀巢"], [
+        ("咖啡豆", 49, 199), ("矿泉水", 15, 40), ("茶叶", 59, 499), ("零食礼盒", 39, 199),
+    ]),
+    "日用品": (0.08, ["维达", "蓝月亮", "心相印"], [
+        ("纸巾", 9, 39), ("洗手液", 12, 49), ("垃圾袋", 8, 30), ("收纳盒", 15, 99),
+    ]),
+}
+
+# 部门 -> (人数占比, 职级名称（由低到高）, 薪资系数)
+DEPARTMENTS = {
+    "销售部": (0.35, ["销售专员", "高级销售", "销售经理", "销售总监"], 1.0),
+    "技术部": (0.25, ["工程师", "高级工程师", "技术经理", "技术总监"], 1.4),
+    "市场部": (0.12, ["市场专员", "高级市场专员", "市场经理", "市场总监"], 1.1),
+    "运营部": (0.10, ["运营专员", "高级运营", "运营经理", "运营总监"], 1.0),
+    "客服部": (0.07, ["客服专员", "客服组长", "客服经理", "客服总监"], 0.8),
+    "财务部": (0.06, ["会计", "高级会计", "财务经理", "财务总监"], 1.1),
+    "人事部": (0.05, ["人事专员", "招聘主管", "人事经理", "人事总监"], 0.95),
+}
+_LEVEL_WEIGHTS = [0.60, 0.25, 0.12, 0.03]
+_LEVEL_SALARY = [9000.0, 15000.0, 24000.0, 40000.0]
+
+_SURNAMES = [
+    ("王", 7.1), ("李", 7.0), ("张", 6.7), ("刘", 5.4), ("陈", 4.5), ("杨", 3.1), ("黄", 2.2), ("赵", 2.0),
+    ("吴", 1.9), ("周", 1.9), ("徐", 1.5), ("孙", 1.4), ("马", 1.3), ("朱", 1.2), ("胡", 1.1), ("郭", 1.0),
+    ("何", 0.9), ("林", 0.9), ("高", 0.9), ("罗", 0.8),
+]
+_GIVEN_CHARS = list("伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰文辉建国红梅鹏飞宇晨欣怡浩然子涵思雨佳琪俊")
+
+# 表结构（与 init_sample_database 的列兼容，另加维度表外键）
+TABLE_DDL = {
+    "departments": """
+        CREATE TABLE departments (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            budget REAL NOT NULL,
+            headcount INTEGER NOT NULL
+        )
+    """,
+    "regions": """
+        CREATE TABLE regions (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            manager_id INTEGER,
+            sales_target REAL NOT NULL
+        )
+    """,
+    "products": """
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            brand TEXT NOT NULL,
+            list_price REAL NOT NULL
+        )
+    """,
+    "employees": """
+        CREATE TABLE employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            department TEXT NOT NULL,
+            position TEXT NOT NULL,
+            salary REAL NOT NULL,
+            hire_date DATE NOT NULL,
+            region TEXT NOT NULL
+        )
+    """,
+    "sales": """
+        CREATE TABLE sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            sale_date DATE NOT NULL,
+            region TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL
+        )
+    """,
+}
+
+# 导入后创建的索引
+TABLE_INDEXES = {
+    "sales": [["sale_date"], ["product_id"]],
+    "employees": [["department"]],
+}
+
+
+@dataclass
+class DatasetSpec:
+    """数据集规模（维度表大小由 sales 行数推导）"""
+    rows: int
+    seed: int = 42
+
+    @property
+    def products(self) -> int:
+        return int(min(5000, max(100, 2 * self.rows ** 0.5)))
+
+    @property
+    def employees(self) -> int:
+        return int(min(200_000, max(50, self.rows // 200)))
+
+
+@dataclass
+class SyntheticDataset:
+    """生成结果"""
+    db_path: str
+    rows: int
+    seed: int
+    tables: dict[str, int] = field(default_factory=dict)     # 表名 -> 行数
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["elapsed_ms"] = round(self.elapsed_ms, 1)
+        return data
+
+
+def resolve_scale(scale: Union[str, int]) -> int:
+    """
+    解析规模参数
+
+    Args:
+        scale: 预置规模名（10k / 1m / 50m）、行数或带 k / m 后缀的字符串
+
+    Returns:
+        sales 行数
+    """
+    if isinstance(scale, int):
+        rows = scale
+    else:
+        text = scale.strip().lower().replace("_", "")
+        if text in SCALES:
+            rows = SCALES[text]
+        else:
+            multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+            digits = text[:-1] if multiplier > 1 else text
+            try:
+                rows = int(float(digits) * multiplier)
+            except ValueError:
+                raise ValueError(f"无法识别的数据规模: {scale}") from None
+    if rows <= 0:
+        raise ValueError(f"数据规模必须为正数: {scale}")
+    return rows
+
+
+def _rng(seed: int, stream: int, chunk: int = 0) -> np.random.Generator:
+    return np.random.default_rng([seed, stream, chunk])
+
+
+def _normalize(weights) -> np.ndarray:
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _date_range(start: str, end: str) -> np.ndarray:
+    return np.arange(np.datetime64(start), np.datetime64(end), dtype="datetime64[D]")
+
+
+def _sales_date_weights(dates: np.ndarray) -> np.ndarray:
+    """销售日期权重：逐年增长、周末偏高、618 / 双十一 / 年末高峰、春节低谷"""
+    days = dates.astype(np.int64)
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day_of_month = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+    weekday = (days + 3) % 7    # 1970-01-01 为周四，0 表示周一
+
+    weights = 1.0 + 0.35 * (days - days[0]) / 365.0
+    weights *= np.where(weekday >= 5, 1.3, 1.0)
+    weights *= np.select([months == 2, months == 11, months == 12], [0.7, 1.5, 1.3], 1.0)
+    weights *= np.where((months == 6) & (day_of_month <= 18), 1.6, 1.0)
+    weights *= np.where((months == 11) & (day_of_month <= 11), 2.0, 1.0)
+    return _normalize(weights)
+
+
+def generate_products(spec: DatasetSpec) -> dict[str, np.ndarray]:
+    """
+    生成商品维度表
+
+    Returns:
+        列名 -> 数组（含 popularity：按 Zipf 分布的销量权重，不写入数据库）
+    """
+    rng = _rng(spec.seed, _STREAM_PRODUCTS)
+    # 每个 (品牌, 商品) 组合为一个条目，随机抽取条目并加上型号
+    items = [
+        (category, weight / (len(brands) * len(goods)), brand, name, low, high)
+        for category, (weight, brands, goods) in CATALOG.items()
+        for brand in brands
+        for name, low, high in goods
+    ]
+    item_idx = rng.integers(0, len(items), spec.products)
+    categories = np.array([item[0] for item in items], dtype=object)[item_idx]
+    brands = np.array([item[2] for item in items], dtype=object)[item_idx]
+    bases = np.array([item[3] for item in items], dtype=object)[item_idx]
+    low = np.array([item[4] for item in items], dtype=np.float64)[item_idx]
+    high = np.array([item[5] for item in items], dtype=np.float64)[item_idx]
+    models = rng.integers(100, 1000, spec.products).astype(str).astype(object)
+
+    # 热门程度：随机排名上的 Zipf 分布，再乘以品类权重
+    ranks = rng.permutation(spec.products) + 1
+    category_weight = np.array([item[1] for item in items])[item_idx]
+    return {
+        "id": np.arange(1, spec.products + 1),
+        "name": brands + bases + " " + models,
+        "category": categories,
+        "brand": brands,
+        "list_price": np.round(low + (high - low) * rng.beta(2.0, 3.0, spec.products), 2),
+        "popularity": _normalize(category_weight / ranks ** 0.9),
+    }
+
+
+def generate_employees(spec: DatasetSpec) -> dict[str, np.ndarray]:
+    """
+    生成员工表
+
+    Returns:
+        列名 -> 数组（含 sales_weight：销售业绩权重，不写入数据库）
+    """
+    rng = _rng(spec.seed, _STREAM_EMPLOYEES)
+    n = spec.employees
+    names = list(DEPARTMENTS)
+    dept_idx = rng.choice(len(names), n, p=_normalize([DEPARTMENTS[d][0] for d in names]))
+    level = rng.choice(len(_LEVEL_WEIGHTS), n, p=_normalize(_LEVEL_WEIGHTS))
+    positions = np.array([DEPARTMENTS[d][1] for d in names], dtype=object)[dept_idx, level]
+    factor = np.array([DEPARTMENTS[d][2] for d in names])[dept_idx]
+    salary = np.array(_LEVEL_SALARY)[level] * factor * rng.lognormal(0.0, 0.15, n)
+
+    surnames = np.array([s for s, _ in _SURNAMES], dtype=object)
+    given = np.array(_GIVEN_CHARS, dtype=object)
+    full = (
+        surnames[rng.choice(len(surnames), n, p=_normalize([w for _, w in _SURNAMES]))]
+        + given[rng.integers(0, len(given), n)]
+    )
+    second = given[rng.integers(0, len(given), n)]
+    full = np.where(rng.random(n) < 0.6, full + second, full)
+
+    # 入职日期偏向近几年；职级越高入职越早
+    hire_dates = _date_range(_HIRE_START, _HIRE_END)
+    seniority = rng.beta(2.5 - 0.4 * level, 1.0 + 0.5 * level)
+    hire = hire_dates[np.minimum((seniority * len(hire_dates)).astype(np.int64), len(hire_dates) - 1)]
+
+    regions = np.array([r for r, _ in REGIONS], dtype=object)
+    region = regions[rng.choice(len(regions), n, p=_normalize([w for _, w in REGIONS]))]
+    is_sales = np.array(names, dtype=object)[dept_idx] == "销售部"
+    return {
+        "id": np.arange(1, n + 1),
+        "name": full,
+        "department": np.array(names, dtype=object)[dept_idx],
+        "position": positions,
+        "salary": np.round(salary, -1),
+        "hire_date": hire.astype(str).astype(object),
+        "region": region,
+        # 销售业绩集中在少数销售人员身上（帕累托分布）；没有销售人员时退化为全部员工
+        "sales_weight": _normalize(
+            np.where(is_sales, rng.pareto(1.5, n) + 1.0, 0.0) if is_sales.any() else np.ones(n)
+        ),
+    }
+
+
+def iter_sales(
+    spec: DatasetSpec,
+    products: Optional[dict[str, np.ndarray]] = None,
+    employees: Optional[dict[str, np.ndarray]] = None,
+) -> Iterator[list[tuple]]:
+    """
+    按块生成销售明细
+
+    Args:
+        spec: 数据集规模
+        products: generate_products 的结果，为空则重新生成
+        employees: generate_employees 的结果，为空则重新生成
+
+    Yields:
+        每块最多 _CHUNK_ROWS 行，列顺序与 sales 表一致
+    """
+    products = products if products is not None else generate_products(spec)
+    employees = employees if employees is not None else generate_employees(spec)
+
+    dates = _date_range(_SALES_START, _SALES_END)
+    date_p = _sales_date_weights(dates)
+    date_text = dates.astype(str).astype(object)
+    regions = np.array([r for r, _ in REGIONS], dtype=object)
+    region_p = _normalize([w for _, w in REGIONS])
+    discounts = np.array([1.0, 0.95, 0.9, 0.8])
+    discount_p = _normalize([0.55, 0.2, 0.15, 0.1])
+    mean_qty = _mean_quantity(products["list_price"])
+
+    for chunk, start in enumerate(range(0, spec.rows, _CHUNK_ROWS)):
+        rng = _rng(spec.seed, _STREAM_SALES, chunk)
+        n = min(_CHUNK_ROWS, spec.rows - start)
+        product = rng.choice(len(products["id"]), n, p=products["popularity"])
+        quantity = rng.poisson(mean_qty[product]) + 1
+        price = np.round(products["list_price"][product] * rng.choice(discounts, n, p=discount_p), 2)
+        day = rng.choice(len(dates), n, p=date_p)
+        region = rng.choice(len(regions), n, p=region_p)
+        employee = rng.choice(len(employees["id"]), n, p=employees["sales_weight"])
+        yield list(zip(
+            range(start + 1, start + n + 1),
+            products["name"][product].tolist(),
+            products["category"][product].tolist(),
+            quantity.tolist(),
+            price.tolist(),
+            date_text[day].tolist(),
+            regions[region].tolist(),
+            products["id"][product].tolist(),
+            employees["id"][employee].tolist(),
+        ))
+
+
+def _mean_quantity(list_price: np.ndarray) -> np.ndarray:
+    """每单平均数量：单价越低数量越多"""
+    return np.clip(2000.0 / list_price, 1.0, 120.0)
+
+
+def _rows(data: dict[str, np.ndarray], columns: list[str]) -> list[tuple]:
+    return list(zip(*(data[name].tolist() for name in columns)))
+
+
+def generate_dataset(
+    db_path: Optional[str] = None,
+    scale: Union[str, int] = "10k",
+    seed: int = 42,
+    progress: Optional[Callable[[IngestProgress], None]] = None,
+    loader: Optional[BulkLoader] = None,
+) -> SyntheticDataset:
+    """
+    生成合成数据集并写入数据库（已存在的同名表会被删除重建）
+
+    Args:
+        db_path: 数据库文件路径，默认为配置的数据库
+        scale: 规模（10k / 1m / 50m 或行数）
+        seed: 随机种子，相同种子与规模生成完全相同的数据
+        progress: 写入 sales 表时的进度回调
+        loader: 批量写入器，默认按 db_path 创建
+
+    Returns:
+        生成结果（各表行数与耗时）
+    """
+    start = time.perf_counter()
+    spec = DatasetSpec(rows=resolve_scale(scale), seed=seed)
+    db_path = db_path or get_db_path()
+    if loader is None:
+        default = get_bulk_loader()
+        loader = default if default.db_path == db_path else BulkLoader(db_path, batch_rows=default.batch_rows)
+
+    products = generate_products(spec)
+    employees = generate_employees(spec)
+
+    # 维度表
+    sales_staff = employees["id"][employees["department"] == "销售部"]
+    managers = sales_staff[:len(REGIONS)] if len(sales_staff) else employees["id"][:len(REGIONS)]
+    # 年度销售目标：按地区占比分摊三年销售额的年均值，再上浮 10%
+    avg_order = float(np.dot(
+        products["popularity"], products["list_price"] * (_mean_quantity(products["list_price"]) + 1)
+    ))
+    regions = {
+        "id": np.arange(1, len(REGIONS) + 1),
+        "name": np.array([r for r, _ in REGIONS], dtype=object),
+        "manager_id": np.resize(managers, len(REGIONS)),
+        "sales_target": np.round(_normalize([w for _, w in REGIONS]) * spec.rows * avg_order / 3 * 1.1, -3),
+    }
+    dept_names = list(DEPARTMENTS)
+    headcount = np.array([(employees["department"] == d).sum() for d in dept_names])
+    departments = {
+        "id": np.arange(1, len(dept_names) + 1),
+        "name": np.array(dept_names, dtype=object),
+        "budget": np.round(
+            np.array([employees["salary"][employees["department"] == d].sum() for d in dept_names]) * 14, -3
+        ),
+        "headcount": headcount,
+    }
+
+    def sales_rows() -> Iterator[tuple]:
+        for chunk in iter_sales(spec, products, employees):
+            yield from chunk
+
+    data = {"departments": departments, "regions": regions, "products": products, "employees": employees}
+
+    # 先按 TABLE_DDL 建表（保留主键与约束），再以追加模式批量写入
+    columns = {}
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        for table, ddl in TABLE_DDL.items():
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            conn.execute(ddl)
+            columns[table] = [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        conn.commit()
+    finally:
+        conn.close()
+
+    result = SyntheticDataset(db_path=db_path, rows=spec.rows, seed=seed)
+    for table in TABLE_DDL:
+        names = [name for name, _ in columns[table]]
+        loaded = loader.load(
+            table,
+            names,
+            [type_ for _, type_ in columns[table]],
+            sales_rows() if table == "sales" else _rows(data[table], names),
+            mode=MODE_APPEND,
+            indexes=TABLE_INDEXES.get(table, ()),
+            progress=progress if table == "sales" else None,
+        )
+        result.tables[table] = loaded.rows
+
+    result.elapsed_ms = (time.perf_counter() - start) * 1000
+    return result
@@ -5,10 +5,18 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import get_settings
-from app.api import chat, session, database
-from app.db.connection import get_sql_database, ensure_data_dir
+from app.api import admin, chat, session, database
+from app.db.connection import get_sql_database, get_connection_pool, get_query_pool, ensure_data_dir
+from app.core.agent import get_agent_runtime
+from app.core.executor import tool_executor
+from app.core.memory import memory_manager
+from app.core.metrics import agent_metrics
+from app.core.query_cache import plan_cache, query_cache
+from app.db.query_log import query_log
+from app.db.session_store import async_session_store
 
 settings = get_settings()
 
@@ -19,11 +27,24 @@ async def lifespan(app: FastAPI):
     # 启动时：确保数据目录存在，初始化数据库
     ensure_data_dir()
     get_sql_database()  # 触发数据库初始化
+    
+    # 预先构建共享的 Agent 运行时（工具集、预绑定工具的 LLM、结构摘要）
+    try:
+        get_agent_runtime().system_prompt()
+    except ValueError as e:
+        # 未配置 API Key 时仍允许启动，聊天请求会返回错误
+        print(f"Agent runtime not initialized: {e}")
     print("Application started, database initialized.")
     
     yield
     
-    # 关闭时：清理资源
+    # 关闭时：清理资源（写入缓冲的查询日志，停止工具与会话存储线程池，截断 WAL 并关闭连接池）
+    query_log.flush()
+    tool_executor.shutdown()
+    memory_manager.shutdown()
+    async_session_store.shutdown()
+    get_query_pool().close()
+    get_connection_pool().close()
     print("Application shutting down.")
 
 
@@ -48,6 +69,7 @@ app.add_middleware(
 app.include_router(session.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
 app.include_router(database.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/health")
@@ -56,6 +78,20 @@ async def health_check():
     return {"status": "ok", "message": "Service is running"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus 指标（文本格式）：进行中的流、迭代次数、token、SQL 耗时、各阶段耗时与缓存命中"""
+    caches = {
+        "plan": plan_cache.stats(),
+        "query": query_cache.stats(),
+        "memory": memory_manager.stats(),
+    }
+    return PlainTextResponse(
+        agent_metrics.render_prometheus(caches),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -67,5 +103,6 @@ async def root():
             "sessions": "/api/sessions",
             "chat": "/api/chat",
             "database": "/api/database/schema",
+            "metrics": "/metrics",
         }
     }
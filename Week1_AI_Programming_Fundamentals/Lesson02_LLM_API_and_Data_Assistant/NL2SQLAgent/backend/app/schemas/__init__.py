@@ -1,3 +1,4 @@
 # Pydantic schemas
 from app.schemas.chat import *
 from app.schemas.session import *
+from app.schemas.admin import *
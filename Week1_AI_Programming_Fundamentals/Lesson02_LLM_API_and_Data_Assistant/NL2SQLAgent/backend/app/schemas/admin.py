@@ -0,0 +1,23 @@
+"""
+管理接口相关的 Pydantic 模型
+"""
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class IndexSpec(BaseModel):
+    """索引定义"""
+    table: str = Field(..., min_length=1, description="表名")
+    columns: list[str] = Field(..., min_length=1, max_length=4, description="索引列（按顺序）")
+
+
+class IndexAdvisorRequest(BaseModel):
+    """索引顾问分析请求"""
+    top_queries: Optional[int] = Field(None, ge=1, le=500, description="分析总耗时最高的多少条查询，为空则使用配置值")
+    apply: bool = Field(default=False, description="是否直接应用推荐的索引")
+
+
+class ApplyIndexesRequest(BaseModel):
+    """应用索引请求"""
+    indexes: list[IndexSpec] = Field(..., min_length=1, description="要创建的索引")
@@ -1,12 +1,15 @@
 """
 聊天相关的 Pydantic 模型
 """
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
+from app.core.sse import encode_event
+
 
 class MessageRole(str, Enum):
     """消息角色"""
@@ -21,6 +24,9 @@ class SSEEventType(str, Enum):
     TEXT = "text"          # 文本内容
     SQL = "sql"            # 生成的 SQL
     DATA = "data"          # 查询结果数据
+    DATA_HEADER = "data_header"  # 流式结果头（列名、类型）
+    DATA_CHUNK = "data_chunk"    # 流式结果数据块（带序号）
+    DATA_END = "data_end"        # 流式结果尾（总行数、是否截断）
     CHART = "chart"        # 图表配置
     ERROR = "error"        # 错误信息
     DONE = "done"          # 完成标记
@@ -30,6 +36,10 @@ class ChatRequest(BaseModel):
     """聊天请求"""
     session_id: str = Field(..., description="会话 ID")
     message: str = Field(..., min_length=1, description="用户消息")
+    wire_format: Literal["rows", "columnar", "msgpack"] = Field(
+        "rows",
+        description="查询结果的编码：rows（行式，默认）/ columnar（列式 + 字典编码，图表引用数据事件）/ msgpack（columnar 的 MessagePack + base64）",
+    )
 
 
 class ChatMessage(BaseModel):
@@ -45,30 +55,20 @@ class ChatMessage(BaseModel):
         from_attributes = True
 
 
-class SSEEvent(BaseModel):
-    """SSE 事件"""
+@dataclass(slots=True)
+class SSEEvent:
+    """
+    SSE 事件
+    
+    每个 token 与数据块都会创建一个事件，因此使用轻量的 dataclass，
+    不做 Pydantic 校验；编码见 app.core.sse。
+    """
     event: SSEEventType
     data: Any
     
     def to_sse(self) -> str:
-        """转换为 SSE 格式字符串
-        
-        注意：SSE 规范要求多行数据的每行都要以 'data: ' 开头
-        """
-        import json
-        if isinstance(self.data, str):
-            data_str = self.data
-        else:
-            data_str = json.dumps(self.data, ensure_ascii=False)
-        
-        # 处理多行数据：每行都需要 'data: ' 前缀
-        lines = data_str.split('\n')
-        if len(lines) > 1:
-            data_part = '\n'.join(f"data: {line}" for line in lines)
-        else:
-            data_part = f"data: {data_str}"
-        
-        return f"event: {self.event.value}\n{data_part}\n\n"
+        """转换为 SSE 格式字符串（多行数据的每行都以 'data: ' 开头）"""
+        return encode_event(self.event, self.data).decode("utf-8")
 
 
 class ChartType(str, Enum):
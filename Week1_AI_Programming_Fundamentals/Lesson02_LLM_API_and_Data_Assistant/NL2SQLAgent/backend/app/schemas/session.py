@@ -32,3 +32,17 @@ class Session(BaseModel):
 class SessionWithMessages(Session):
     """带消息的会话信息"""
     messages: list = Field(default_factory=list, description="消息列表")
+
+
+class SessionPage(BaseModel):
+    """会话分页结果（游标分页）"""
+    items: list[Session] = Field(default_factory=list, description="会话列表")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多")
+    prev_cursor: Optional[str] = Field(None, description="上一页游标，为空表示已是第一页")
+
+
+class MessagePage(BaseModel):
+    """消息分页结果（游标分页）"""
+    items: list = Field(default_factory=list, description="消息列表（按时间正序）")
+    next_cursor: Optional[str] = Field(None, description="更新消息的游标，为空表示已到最新")
+    prev_cursor: Optional[str] = Field(None, description="更早消息的游标，为空表示已到最早")
@@ -0,0 +1,83 @@
+"""
+Agent 单请求开销基准测试（不含 LLM 调用耗时）
+对比旧实现（每个请求新建 SQLDatabaseToolkit / 工具 / bind_tools，每轮迭代再 bind_tools 一次）
+与共享 AgentRuntime（每个请求只创建轻量上下文）的准备开销
+"""
+import os
+import statistics
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 data/app.db；构造 ChatTongyi 与 bind_tools 不会发起网络请求
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_agent_runtime_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+
+from langchain_community.agent_toolkits import SQLDatabaseToolkit
+
+from app.config import get_settings
+from app.core.agent import QueryExecutor, SQLAgent, SQLQueryTool, get_agent_runtime
+from app.core.llm import SQL_AGENT_SCHEMA_PROMPT, get_llm
+from app.db.catalog import schema_catalog
+from app.db.connection import get_query_pool, get_sql_database
+
+NUM_REQUESTS = 200
+ITERATIONS_PER_REQUEST = 3
+
+
+def legacy_request():
+    """旧实现：构造 SQLAgent 并在每轮迭代重新 bind_tools"""
+    settings = get_settings()
+    db = get_sql_database()
+    llm = get_llm(streaming=True)
+    executor = QueryExecutor(get_query_pool(), max_rows=settings.query_max_rows)
+    query_tool = SQLQueryTool(executor=executor, preview_rows=settings.query_preview_rows)
+    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+    tools = [query_tool if tool.name == "sql_db_query" else tool for tool in toolkit.get_tools()]
+    llm.bind_tools(tools)
+    SQL_AGENT_SCHEMA_PROMPT.format(dialect=db.dialect, top_k=10, schema=schema_catalog.get_schema_digest())
+
+    for _ in range(ITERATIONS_PER_REQUEST):
+        get_llm(streaming=False).bind_tools(tools)
+
+
+def runtime_request():
+    """共享运行时：创建轻量上下文并读取系统提示"""
+    agent = SQLAgent("bench")
+    agent.runtime.system_prompt()
+
+
+def measure(func) -> list[float]:
+    """返回每次调用耗时（ms）"""
+    samples = []
+    for _ in range(NUM_REQUESTS):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)
+
+
+def main():
+    print("=" * 60)
+    print(f"Agent 单请求开销（不含 LLM）: requests={NUM_REQUESTS}, iterations/request={ITERATIONS_PER_REQUEST}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    get_agent_runtime()
+    print(f"启动时构建 AgentRuntime: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # 预热
+    legacy_request()
+    runtime_request()
+
+    results = {"旧实现": measure(legacy_request), "AgentRuntime": measure(runtime_request)}
+
+    print(f"\n{'实现':<16}{'p50 (ms)':>12}{'p95 (ms)':>12}{'mean (ms)':>12}")
+    print("-" * 52)
+    for name, samples in results.items():
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{name:<16}{statistics.median(samples):>12.3f}{p95:>12.3f}{statistics.mean(samples):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
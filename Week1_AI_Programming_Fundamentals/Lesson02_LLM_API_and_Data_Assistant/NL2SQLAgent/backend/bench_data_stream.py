@@ -0,0 +1,85 @@
+"""
+查询结果流式推送内存基准测试
+对比一次性取回（单个 DATA 事件）与分块推送（data_chunk 事件）在不同结果规模下的峰值内存
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+# 使用临时数据库，避免污染 data/app.db；构造 Agent 不会发起 LLM 请求
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_data_stream_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+os.environ["QUERY_MAX_ROWS"] = "10000000"
+os.environ["QUERY_STREAM_MAX_ROWS"] = "10000000"
+os.environ["QUERY_STREAM_MAX_BYTES"] = str(1 << 40)
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+from app.core.agent import SQLAgent
+from app.db.connection import get_db_path, get_sql_database
+
+ROW_COUNTS = [10_000, 100_000, 500_000]
+QUERY = "SELECT id, product_name, category, quantity, price, sale_date, region FROM wide_sales LIMIT {n}"
+
+
+def seed(max_rows: int):
+    get_sql_database()
+    conn = sqlite3.connect(get_db_path())
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS wide_sales (
+            id INTEGER PRIMARY KEY,
+            product_name TEXT, category TEXT, quantity INTEGER,
+            price REAL, sale_date TEXT, region TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO wide_sales VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, f"产品 {i % 997}", f"类别 {i % 13}", i % 100, i * 0.5, "2024-01-01", f"区域 {i % 7}")
+         for i in range(max_rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(func) -> tuple[float, float]:
+    """返回 (峰值内存 MB, 耗时 s)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, elapsed
+
+
+def run_single_event(agent: SQLAgent, sql: str):
+    result = agent.executor.execute(sql)
+    agent._build_data_payload(result)
+
+
+def run_streamed(agent: SQLAgent, sql: str):
+    for item in agent._stream_query(sql):
+        pass
+
+
+def main():
+    print("=" * 70)
+    print("查询结果推送峰值内存（tracemalloc）")
+    print("=" * 70)
+
+    seed(max(ROW_COUNTS))
+    agent = SQLAgent("bench")
+
+    print(f"\n{'rows':<12}{'单事件 MB':>14}{'单事件 s':>12}{'分块 MB':>14}{'分块 s':>12}")
+    print("-" * 70)
+    for n in ROW_COUNTS:
+        sql = QUERY.format(n=n)
+        single_mb, single_s = measure(lambda: run_single_event(agent, sql))
+        stream_mb, stream_s = measure(lambda: run_streamed(agent, sql))
+        print(f"{n:<12}{single_mb:>14.1f}{single_s:>12.2f}{stream_mb:>14.1f}{stream_s:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
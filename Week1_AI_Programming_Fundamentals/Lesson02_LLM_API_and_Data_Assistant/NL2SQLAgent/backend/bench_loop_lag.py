@@ -0,0 +1,97 @@
+"""
+事件循环延迟负载测试
+模拟大量并发 SSE 流，每个流在推送 token 的间隙读写会话存储，
+对比直接调用同步 SessionStore 与使用 AsyncSessionStore 时的事件循环延迟
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 data/app.db
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_loop_lag_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+
+from app.db.session_store import session_store, async_session_store
+
+STREAM_COUNTS = [10, 50, 200]
+TURNS_PER_STREAM = 5
+TOKENS_PER_TURN = 20
+TOKEN_INTERVAL = 0.005
+PROBE_INTERVAL = 0.01
+
+
+class SyncAdapter:
+    """旧调用方式：在 async 函数中直接调用同步方法"""
+
+    async def get_recent_messages(self, session_id: str, limit: int = 10):
+        return session_store.get_recent_messages(session_id, limit)
+
+    async def add_message(self, session_id: str, role: str, content: str):
+        return session_store.add_message(session_id, role, content)
+
+    async def list_sessions(self, limit: int = 50):
+        return session_store.list_sessions(limit=limit)
+
+
+async def simulate_stream(store, session_id: str):
+    """模拟一个聊天流：读历史 -> 写用户消息 -> 推送 token -> 写助手消息"""
+    for turn in range(TURNS_PER_STREAM):
+        await store.get_recent_messages(session_id, 20)
+        await store.add_message(session_id, "user", f"question {turn}")
+        for _ in range(TOKENS_PER_TURN):
+            await asyncio.sleep(TOKEN_INTERVAL)
+        await store.add_message(session_id, "assistant", "answer " * 50)
+        await store.list_sessions(50)
+
+
+async def probe_loop_lag(samples: list, stop: asyncio.Event):
+    """周期性 sleep，记录实际唤醒时间与预期时间的偏差"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def run_case(store, num_streams: int) -> dict:
+    session_ids = [session_store.create_session(f"lag {i}")["id"] for i in range(num_streams)]
+
+    samples: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(samples, stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(simulate_stream(store, sid) for sid in session_ids))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[int(len(samples) * 0.99) - 1],
+        "max": samples[-1],
+        "elapsed": elapsed,
+    }
+
+
+async def main():
+    print("=" * 70)
+    print("事件循环延迟负载测试（单位: ms）")
+    print(f"turns/stream={TURNS_PER_STREAM}, tokens/turn={TOKENS_PER_TURN}")
+    print("=" * 70)
+    print(f"\n{'streams':<10}{'mode':<8}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}{'total s':>10}")
+    print("-" * 70)
+
+    for num_streams in STREAM_COUNTS:
+        for mode, store in (("sync", SyncAdapter()), ("async", async_session_store)):
+            r = await run_case(store, num_streams)
+            print(f"{num_streams:<10}{mode:<8}{r['p50']:>10.2f}{r['p99']:>10.2f}{r['max']:>10.2f}{r['elapsed']:>10.2f}")
+
+    async_session_store.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+会话上下文 token 预算基准测试（本地模拟 LLM 与摘要，不发起网络请求）
+对比固定窗口（保留最近 10 轮，不论长短）与 token 预算 + 滚动摘要两种历史构建方式下，
+长对话中每个请求的输入 token 数（估算值，来自 done 事件）与请求耗时
+"""
+import asyncio
+import dataclasses
+import os
+import statistics
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 data/app.db；关闭计划缓存，保证每次都走 LLM
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_memory_budget_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+os.environ["PLAN_CACHE_ENABLED"] = "false"
+
+import app.core.agent as agent_module
+from app.core.agent import SQLAgent, get_agent_runtime
+from app.core.memory import SessionMemoryManager
+from app.db.session_store import async_session_store
+from app.schemas.chat import SSEEventType
+from bench_support import ScriptedChatModel
+
+NUM_TURNS = 30
+TOKEN_BUDGET = 1500
+SUMMARY_DELAY = 0.2     # 模拟摘要 LLM 调用耗时（秒），在后台执行
+ANSWER = "根据查询结果，各地区销售额差异明显：华东最高，华南次之，华北与西南接近，东北最低。" * 12
+
+
+async def fake_summarize(summary, rows) -> str:
+    """模拟摘要：每条消息保留前 20 个字，总长不超过 300 字"""
+    await asyncio.sleep(SUMMARY_DELAY)
+    lines = [summary] if summary else []
+    lines += [f"{row['role']}: {row['content'][:20]}" for row in rows]
+    return "\n".join(lines)[-300:]
+
+
+async def run_conversation(name: str, manager: SessionMemoryManager) -> tuple[list[int], list[float]]:
+    """执行一段长对话，返回每个请求的输入 token 数与耗时（ms）"""
+    # 记忆管理器是模块级实例，这里替换为待测配置
+    agent_module.memory_manager = manager
+    runtime = dataclasses.replace(
+        get_agent_runtime(),
+        # 模拟 LLM：每次返回同一段较长的文本回答
+        llm_with_tools=ScriptedChatModel(script=[ANSWER]),
+        # 流式与整轮调用不影响 token 数，这里使用整轮调用
+        settings=get_agent_runtime().settings.model_copy(update={"agent_stream_tokens": False}),
+    )
+    session_id = (await async_session_store.create_session(name))["id"]
+
+    tokens, latencies = [], []
+    for turn in range(NUM_TURNS):
+        start = time.perf_counter()
+        async for event in SQLAgent(session_id, runtime=runtime).run(f"第 {turn} 个问题：各地区的销售额是多少？"):
+            if event.event == SSEEventType.DONE:
+                tokens.append(event.data["prompt_tokens"])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return tokens, latencies
+
+
+async def main():
+    print("=" * 60)
+    print(f"会话上下文 token 预算: turns={NUM_TURNS}, 回答长度={len(ANSWER)} 字, budget={TOKEN_BUDGET}")
+    print("=" * 60)
+
+    configs = {
+        "固定窗口 (10 轮)": SessionMemoryManager(
+            token_budget=10 ** 9, max_messages=20, summary_enabled=False
+        ),
+        "token 预算 + 摘要": SessionMemoryManager(
+            token_budget=TOKEN_BUDGET, max_messages=40, summarizer=fake_summarize
+        ),
+    }
+
+    results = {}
+    for name, manager in configs.items():
+        results[name] = await run_conversation(name, manager)
+        # 等待后台摘要任务完成
+        while manager.stats()["summary_pending"]:
+            await asyncio.sleep(0.05)
+
+    print(f"\n{'实现':<20}{'平均 tokens':>12}{'最后一轮 tokens':>16}{'p50 耗时 (ms)':>16}")
+    print("-" * 64)
+    for name, (tokens, latencies) in results.items():
+        print(f"{name:<20}{statistics.mean(tokens):>12.0f}{tokens[-1]:>16}{statistics.median(latencies):>16.2f}")
+
+    stats = configs["token 预算 + 摘要"].stats()
+    print(f"\n摘要刷新次数: {stats['summary_refreshes']}, 失败: {stats['summary_failures']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+查询结果缓存基准测试
+对比同一聚合查询在未命中（执行 SQL）与命中（校验表版本后直接返回）时的延迟，
+并验证写入业务表后缓存自动失效
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 data/app.db；构造 Agent 不会发起 LLM 请求
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_query_cache_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+
+from app.core.agent import SQLAgent
+from app.core.query_cache import query_cache
+from app.db.connection import get_connection_pool, get_db_path, get_sql_database, install_change_tracking
+
+NUM_ROWS = 200_000
+NUM_QUERIES = 20
+QUERIES = [
+    "SELECT category, SUM(quantity * price) FROM wide_sales GROUP BY category",
+    "SELECT region, COUNT(*), AVG(price) FROM wide_sales GROUP BY region ORDER BY 2 DESC",
+    "SELECT product_name, SUM(quantity) FROM wide_sales GROUP BY product_name ORDER BY 2 DESC LIMIT 10",
+]
+
+
+def seed():
+    get_sql_database()
+    conn = sqlite3.connect(get_db_path())
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS wide_sales (
+            id INTEGER PRIMARY KEY,
+            product_name TEXT, category TEXT, quantity INTEGER,
+            price REAL, sale_date TEXT, region TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO wide_sales VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, f"产品 {i % 997}", f"类别 {i % 13}", i % 100, i * 0.5, "2024-01-01", f"区域 {i % 7}")
+         for i in range(NUM_ROWS)),
+    )
+    conn.commit()
+    install_change_tracking(conn)
+    conn.close()
+
+
+def time_query(func, repeat: int = NUM_QUERIES) -> float:
+    """返回平均耗时（ms）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    print("=" * 60)
+    print(f"查询结果缓存基准测试: {NUM_ROWS} 行")
+    print("=" * 60)
+
+    seed()
+    agent = SQLAgent("bench")
+    executor = agent.executor
+
+    print(f"\n{'查询':<10}{'未命中 (ms)':>14}{'命中 (ms)':>14}{'加速':>10}")
+    print("-" * 48)
+    for i, sql in enumerate(QUERIES):
+        def miss():
+            query_cache.clear()
+            executor.execute(sql)
+
+        miss_ms = time_query(miss)
+        executor.execute(sql)
+        hit_ms = time_query(lambda: executor.execute(sql))
+        print(f"{'Q' + str(i + 1):<10}{miss_ms:>14.2f}{hit_ms:>14.3f}{miss_ms / hit_ms:>9.0f}x")
+
+    # 写入后自动失效
+    before = executor.execute(QUERIES[0])
+    with get_connection_pool().connection() as conn:
+        conn.execute("UPDATE wide_sales SET quantity = quantity + 1 WHERE id = 1")
+        conn.commit()
+    after = executor.execute(QUERIES[0])
+    assert after is not before, "写入后缓存未失效"
+
+    print(f"\n写入后失效: OK")
+    print(f"缓存统计: {query_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+数据库结构接口基准测试
+对比旧实现（每次请求 PRAGMA table_info + 全表 COUNT(*)）与结构目录缓存在大表上的延迟
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 data/app.db
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_schema_catalog_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+
+from app.db.catalog import schema_catalog
+from app.db.connection import get_connection_pool, get_db_path, get_sql_database, install_change_tracking
+
+NUM_ROWS = 2_000_000
+NUM_REQUESTS = 20
+
+
+def seed():
+    get_sql_database()
+    conn = sqlite3.connect(get_db_path())
+    conn.execute("CREATE TABLE big_sales (id INTEGER PRIMARY KEY, amount REAL, region TEXT)")
+    conn.executemany(
+        "INSERT INTO big_sales VALUES (?, ?, ?)",
+        ((i, i * 0.5, f"区域 {i % 7}") for i in range(NUM_ROWS)),
+    )
+    conn.commit()
+    install_change_tracking(conn)
+    conn.close()
+
+
+def legacy_schema() -> dict:
+    """旧实现：每个表 PRAGMA table_info + COUNT(*)"""
+    schema = {"dialect": "sqlite", "tables": []}
+    with get_connection_pool().connection() as conn:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT LIKE 'chat_%' AND name != '_table_versions'"
+        )]
+        for table in tables:
+            columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            schema["tables"].append({"name": table, "columns": [col[1] for col in columns], "row_count": row_count})
+    return schema
+
+
+def time_calls(func, repeat: int = NUM_REQUESTS) -> float:
+    """返回平均耗时（ms）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    print("=" * 60)
+    print(f"数据库结构接口基准测试: big_sales {NUM_ROWS} 行")
+    print("=" * 60)
+
+    seed()
+    legacy_ms = time_calls(legacy_schema)
+
+    schema_catalog.get_schema()
+    cached_ms = time_calls(schema_catalog.get_schema)
+
+    # 写入后行数随触发器更新，无需重新计数
+    with get_connection_pool().connection() as conn:
+        conn.execute("INSERT INTO big_sales (amount, region) VALUES (1.0, '区域 0')")
+        conn.commit()
+    counts = {t["name"]: t["row_count"] for t in schema_catalog.get_schema()[0]["tables"]}
+    assert counts["big_sales"] == NUM_ROWS + 1
+
+    print(f"\n{'实现':<16}{'平均延迟 (ms)':>16}")
+    print("-" * 32)
+    print(f"{'旧 COUNT(*)':<16}{legacy_ms:>16.2f}")
+    print(f"{'结构目录':<16}{cached_ms:>16.3f}")
+    print(f"\n写入后行数: {counts['big_sales']}（增量维护）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+会话列表基准测试（百万级消息）
+在旧表结构上写入 NUM_SESSIONS * MESSAGES_PER_SESSION 条消息，
+测量迁移回填耗时，并对比旧 LEFT JOIN ... GROUP BY 查询与 message_count 列的查询延迟
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染 data/app.db
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_session_listing_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+
+from app.db.connection import ConnectionPool
+from app.db.session_store import SessionStore
+
+NUM_SESSIONS = 10_000
+MESSAGES_PER_SESSION = 100
+NUM_QUERIES = 50
+LEGACY_QUERIES = 3  # 旧查询在百万级消息下单次即需数秒
+
+LEGACY_LIST_SQL = """
+    SELECT s.*, COUNT(m.id) as message_count
+    FROM chat_sessions s
+    LEFT JOIN chat_messages m ON s.id = m.session_id
+    GROUP BY s.id
+    ORDER BY s.updated_at DESC
+    LIMIT 50 OFFSET 0
+"""
+
+LEGACY_GET_SQL = """
+    SELECT s.*, COUNT(m.id) as message_count
+    FROM chat_sessions s
+    LEFT JOIN chat_messages m ON s.id = m.session_id
+    WHERE s.id = ?
+    GROUP BY s.id
+"""
+
+
+def seed_legacy_database(db_path: str):
+    """按旧表结构（无计数列、无索引）写入数据"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE chat_sessions (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            sql_query TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    base = datetime(2024, 1, 1)
+    sessions = [
+        (f"s-{i:06d}", f"会话 {i}", base + timedelta(minutes=i), base + timedelta(minutes=i))
+        for i in range(NUM_SESSIONS)
+    ]
+    conn.executemany("INSERT INTO chat_sessions VALUES (?, ?, ?, ?)", sessions)
+
+    def messages():
+        for i in range(NUM_SESSIONS):
+            for j in range(MESSAGES_PER_SESSION):
+                yield (f"s-{i:06d}", "user" if j % 2 == 0 else "assistant", "hello", base + timedelta(minutes=i, seconds=j))
+
+    conn.executemany(
+        "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+        messages(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def time_query(func, repeat: int = NUM_QUERIES) -> float:
+    """返回平均耗时（ms）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    total = NUM_SESSIONS * MESSAGES_PER_SESSION
+    print("=" * 60)
+    print(f"会话列表基准测试: {NUM_SESSIONS} 会话, {total} 条消息")
+    print("=" * 60)
+
+    db_path = os.path.join(_TMP_DIR, "listing.db")
+    start = time.perf_counter()
+    seed_legacy_database(db_path)
+    print(f"写入旧结构数据: {time.perf_counter() - start:.1f}s")
+
+    legacy_conn = sqlite3.connect(db_path)
+    legacy_list = time_query(lambda: legacy_conn.execute(LEGACY_LIST_SQL).fetchall(), LEGACY_QUERIES)
+    legacy_get = time_query(lambda: legacy_conn.execute(LEGACY_GET_SQL, ("s-005000",)).fetchall(), LEGACY_QUERIES)
+    legacy_conn.close()
+
+    pool = ConnectionPool(db_path)
+    start = time.perf_counter()
+    store = SessionStore(pool=pool)
+    print(f"迁移 + 回填计数: {time.perf_counter() - start:.1f}s")
+
+    first_page = store.list_sessions(limit=50)
+    assert first_page[0]["message_count"] == MESSAGES_PER_SESSION
+
+    new_list = time_query(lambda: store.list_sessions(limit=50))
+    new_get = time_query(lambda: store.get_session("s-005000"))
+    pool.close()
+
+    print(f"\n{'查询':<16}{'旧 JOIN (ms)':>16}{'计数列 (ms)':>16}")
+    print("-" * 48)
+    print(f"{'list_sessions':<16}{legacy_list:>16.2f}{new_list:>16.2f}")
+    print(f"{'get_session':<16}{legacy_get:>16.2f}{new_get:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
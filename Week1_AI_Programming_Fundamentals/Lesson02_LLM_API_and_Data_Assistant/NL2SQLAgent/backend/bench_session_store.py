@@ -0,0 +1,91 @@
+"""
+SessionStore 吞吐基准测试
+对比「每次调用新建连接」（旧实现）与「WAL 连接池」两种方式下
+create_session / add_message / list_sessions / get_messages 的吞吐
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+# 使用临时数据库，避免污染 data/app.db
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_session_store_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+
+from app.db.connection import ConnectionPool
+from app.db.session_store import SessionStore
+
+NUM_SESSIONS = 200
+MESSAGES_PER_SESSION = 10
+NUM_READS = 1000
+
+
+class PerCallConnections:
+    """旧实现：每次调用新建连接，用完即关闭"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def run_workload(store: SessionStore) -> dict:
+    """执行固定负载，返回各操作的 ops/s"""
+    results = {}
+
+    start = time.perf_counter()
+    session_ids = [store.create_session(f"bench {i}")["id"] for i in range(NUM_SESSIONS)]
+    results["create_session"] = NUM_SESSIONS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for session_id in session_ids:
+        for j in range(MESSAGES_PER_SESSION):
+            role = "user" if j % 2 == 0 else "assistant"
+            store.add_message(session_id, role, f"message {j}")
+    total = NUM_SESSIONS * MESSAGES_PER_SESSION
+    results["add_message"] = total / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(NUM_READS):
+        store.list_sessions(limit=50)
+    results["list_sessions"] = NUM_READS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(NUM_READS):
+        store.get_messages(session_ids[i % NUM_SESSIONS])
+    results["get_messages"] = NUM_READS / (time.perf_counter() - start)
+
+    return results
+
+
+def main():
+    print("=" * 60)
+    print("SessionStore 吞吐基准测试")
+    print(f"sessions={NUM_SESSIONS}, messages/session={MESSAGES_PER_SESSION}, reads={NUM_READS}")
+    print("=" * 60)
+
+    before_store = SessionStore(pool=PerCallConnections(os.path.join(_TMP_DIR, "before.db")))
+    before = run_workload(before_store)
+
+    pool = ConnectionPool(os.path.join(_TMP_DIR, "after.db"))
+    after_store = SessionStore(pool=pool)
+    after = run_workload(after_store)
+    pool.close()
+
+    print(f"\n{'操作':<16}{'旧实现 ops/s':>16}{'连接池 ops/s':>16}{'提升':>10}")
+    print("-" * 60)
+    for op in before:
+        speedup = after[op] / before[op] if before[op] else 0
+        print(f"{op:<16}{before[op]:>16.0f}{after[op]:>16.0f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+SSE 编码微基准测试
+对比原实现（Pydantic 模型 + 每次调用 import json + 按行拆分再拼接）与 app.core.sse 编码器
+（预编码前缀、直接输出字节、可替换 JSON 后端）在不同事件上的每秒事件数
+"""
+import time
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.core.sse import SSEEncoder, get_json_dumper, orjson
+from app.schemas.chat import SSEEvent, SSEEventType
+
+DURATION = 0.5  # 每组测试的最短运行时间（秒）
+
+
+class LegacySSEEvent(BaseModel):
+    """原 SSEEvent 实现（作为基线）"""
+    event: SSEEventType
+    data: Any
+
+    def to_sse(self) -> str:
+        import json
+        if isinstance(self.data, str):
+            data_str = self.data
+        else:
+            data_str = json.dumps(self.data, ensure_ascii=False)
+
+        lines = data_str.split('\n')
+        if len(lines) > 1:
+            data_part = '\n'.join(f"data: {line}" for line in lines)
+        else:
+            data_part = f"data: {data_str}"
+
+        return f"event: {self.event.value}\n{data_part}\n\n"
+
+
+def _chunk(rows: int) -> dict:
+    return {
+        "seq": 3,
+        "rows": [
+            [i, f"产品 {i % 997}", f"类别 {i % 13}", i % 100, i * 0.5, "2024-01-01", f"区域 {i % 7}"]
+            for i in range(rows)
+        ],
+    }
+
+
+CASES = [
+    ("text token", SSEEventType.TEXT, "销售"),
+    ("多行文本", SSEEventType.TEXT, "各类别销售额如下：\n- 电子产品 255747\n- 家具 44203\n- 办公用品 16525"),
+    ("thinking", SSEEventType.THINKING, "正在执行: sql_db_query"),
+    ("done", SSEEventType.DONE, {"iterations": 2, "prompt_tokens": 1187, "history_tokens": 0,
+                                 "timings": {"total_ms": 77.9, "spans": {"llm": {"ms": 71.9, "count": 2}}}}),
+    ("data_chunk 20 行", SSEEventType.DATA_CHUNK, _chunk(20)),
+    ("data_chunk 500 行", SSEEventType.DATA_CHUNK, _chunk(500)),
+]
+
+
+def rate(func) -> float:
+    """运行至少 DURATION 秒，返回每秒调用次数"""
+    count = 0
+    batch = 1
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        count += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= DURATION:
+            return count / elapsed
+        batch *= 2
+
+
+def _encode_with(encoder: SSEEncoder):
+    """与聊天接口一致：Agent 创建 SSEEvent，再由编码器直接输出字节"""
+    def encode(event_type: SSEEventType, data: Any) -> bytes:
+        event = SSEEvent(event=event_type, data=data)
+        return encoder.encode(event.event, event.data)
+    return encode
+
+
+def main():
+    print("=" * 96)
+    print("SSE 编码：每秒事件数（含创建事件对象）")
+    print("=" * 96)
+
+    # 字符串结果计入 StreamingResponse 写出前的 UTF-8 编码
+    encoders = {
+        "原实现": lambda event, data: LegacySSEEvent(event=event, data=data).to_sse().encode("utf-8"),
+        "to_sse()": lambda event, data: SSEEvent(event=event, data=data).to_sse().encode("utf-8"),
+        "encoder/json": _encode_with(SSEEncoder(dumps=get_json_dumper("json"))),
+    }
+    if orjson is not None:
+        encoders["encoder/orjson"] = _encode_with(SSEEncoder(dumps=get_json_dumper("orjson")))
+    else:
+        print("未安装 orjson，跳过 orjson 后端")
+
+    print(f"{'事件':<20}" + "".join(f"{name:>16}" for name in encoders) + f"{'加速':>10}")
+    print("-" * 96)
+    for name, event_type, data in CASES:
+        rates = []
+        for encode in encoders.values():
+            rates.append(rate(lambda: encode(event_type, data)))
+        print(f"{name:<20}" + "".join(f"{r:>16,.0f}" for r in rates) + f"{rates[-1] / rates[0]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
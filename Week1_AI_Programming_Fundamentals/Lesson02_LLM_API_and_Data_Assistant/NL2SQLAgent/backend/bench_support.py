@@ -0,0 +1,90 @@
+"""
+基准测试共用的模拟 LLM（不发起网络请求）
+按脚本依次返回工具调用或文本回答，供 bench_*.py 与 test_agent_bench.py 替换运行时中的 llm_with_tools
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Iterator, Union
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# 脚本的一步：文本回答，或一组工具调用（tool_call() 的结果）
+ScriptStep = Union[str, list[dict]]
+
+
+def tool_call(name: str, **args) -> dict:
+    """脚本中的一个工具调用"""
+    return {"name": name, "args": args}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    模拟 LLM：按脚本依次返回工具调用或文本回答，脚本用完后重复最后一步
+
+    整轮调用等待首 token 延迟加全部 token 间隔后返回；流式调用中文本每 2 个字符一个 token，
+    工具调用参数每 16 个字符一个分片（tool_call_chunks）。两种调用的总生成时间相同。
+    """
+    script: list[ScriptStep]
+    first_token_delay: float = 0.0     # 首 token 延迟（秒）
+    token_delay: float = 0.0           # 每个 token 的生成间隔（秒）
+    turn: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-bench"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_message(self) -> AIMessage:
+        step = self.script[min(self.turn, len(self.script) - 1)]
+        self.turn += 1
+        if isinstance(step, str):
+            return AIMessage(content=step)
+        return AIMessage(content="", tool_calls=[
+            {**call, "id": f"call_{self.turn}_{i}"} for i, call in enumerate(step)
+        ])
+
+    @staticmethod
+    def _tokens(message: AIMessage) -> list[AIMessageChunk]:
+        """把完整消息拆成流式分片"""
+        chunks = [AIMessageChunk(content=message.content[i:i + 2]) for i in range(0, len(message.content), 2)]
+        for index, call in enumerate(message.tool_calls):
+            args = json.dumps(call["args"], ensure_ascii=False)
+            for i in range(0, len(args), 16):
+                first = i == 0
+                chunks.append(AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": call["name"] if first else None,
+                    "args": args[i:i + 16],
+                    "id": call["id"] if first else None,
+                    "index": index,
+                }]))
+        return chunks
+
+    def _generation_time(self, message: AIMessage) -> float:
+        return self.first_token_delay + self.token_delay * len(self._tokens(message))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message()
+        time.sleep(self._generation_time(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message()
+        await asyncio.sleep(self._generation_time(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        for chunk in self._tokens(self._next_message()):
+            time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self._tokens(self._next_message()):
+            await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
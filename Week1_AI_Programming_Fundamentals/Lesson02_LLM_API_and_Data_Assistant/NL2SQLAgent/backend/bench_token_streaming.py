@@ -0,0 +1,84 @@
+"""
+LLM token 流式输出基准测试（本地模拟 LLM，不发起网络请求）
+对比整轮调用（ainvoke，等待完整响应后一次性推送 TEXT）与流式调用（astream，token 到达即推送）
+的首字节时间（TTFB，首个 TEXT 事件）与总耗时；工具调用参数分片到达，由 Agent 组装后执行
+"""
+import asyncio
+import dataclasses
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Optional
+
+# 使用临时数据库，避免污染 data/app.db；关闭计划缓存，保证每次都走 LLM
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_token_streaming_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+os.environ["PLAN_CACHE_ENABLED"] = "false"
+
+from app.config import get_settings
+from app.core.agent import SQLAgent, get_agent_runtime
+from app.schemas.chat import SSEEventType
+from bench_support import ScriptedChatModel, tool_call
+
+NUM_RUNS = 10
+FIRST_TOKEN_DELAY = 0.3     # 模拟首 token 延迟（秒）
+TOKEN_DELAY = 0.02          # 模拟每个 token 的生成间隔（秒）
+ANSWER = "按类别统计，电子产品销售额最高，其次是家具，办公用品最低。" * 4
+SQL = "SELECT category, SUM(quantity * price) AS total FROM sales GROUP BY category"
+# 第一轮返回 SQL 工具调用，第二轮返回文本回答
+SCRIPT = [[tool_call("sql_db_query", query=SQL)], ANSWER]
+
+
+async def run_once(stream_tokens: bool) -> tuple[Optional[float], float, str, Any]:
+    """执行一次对话，返回 (TTFB ms, 总耗时 ms, 回答文本, 执行的 SQL)"""
+    runtime = dataclasses.replace(
+        get_agent_runtime(),
+        llm_with_tools=ScriptedChatModel(
+            script=SCRIPT, first_token_delay=FIRST_TOKEN_DELAY, token_delay=TOKEN_DELAY
+        ),
+        settings=get_settings().model_copy(update={"agent_stream_tokens": stream_tokens}),
+    )
+    agent = SQLAgent(f"bench-{stream_tokens}-{time.perf_counter_ns()}", runtime=runtime)
+
+    ttfb = None
+    text, sql = "", None
+    start = time.perf_counter()
+    async for event in agent.run("各类别的销售额是多少？"):
+        if event.event == SSEEventType.TEXT:
+            if ttfb is None:
+                ttfb = (time.perf_counter() - start) * 1000
+            text += event.data
+        elif event.event == SSEEventType.SQL:
+            sql = event.data
+    return ttfb, (time.perf_counter() - start) * 1000, text, sql
+
+
+async def main():
+    print("=" * 60)
+    print(f"LLM token 流式输出: runs={NUM_RUNS}, 首 token 延迟={FIRST_TOKEN_DELAY * 1000:.0f} ms, "
+          f"token 间隔={TOKEN_DELAY * 1000:.0f} ms")
+    print("=" * 60)
+
+    get_agent_runtime()
+    results = {}
+    for name, stream_tokens in (("整轮调用 (ainvoke)", False), ("流式调用 (astream)", True)):
+        await run_once(stream_tokens)   # 预热
+        ttfbs, totals = [], []
+        for _ in range(NUM_RUNS):
+            ttfb, total, text, sql = await run_once(stream_tokens)
+            assert text == ANSWER, "回答文本不完整"
+            assert sql == SQL, "工具调用参数组装错误"
+            ttfbs.append(ttfb)
+            totals.append(total)
+        results[name] = (ttfbs, totals)
+
+    print(f"\n{'实现':<20}{'TTFB p50 (ms)':>16}{'总耗时 p50 (ms)':>18}")
+    print("-" * 56)
+    for name, (ttfbs, totals) in results.items():
+        print(f"{name:<20}{statistics.median(ttfbs):>16.1f}{statistics.median(totals):>18.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
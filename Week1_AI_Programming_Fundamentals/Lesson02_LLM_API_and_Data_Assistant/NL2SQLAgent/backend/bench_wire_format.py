@@ -0,0 +1,155 @@
+"""
+查询结果线上编码基准测试
+对比 rows（行式 + name/value 字典 + 图表复制数据）、columnar（列式 + 字典编码，图表引用数据）
+与 msgpack（columnar 的 MessagePack + base64）三种编码的 DATA / CHART 事件字节数与序列化耗时
+"""
+import os
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 data/app.db；构造 Agent 不会发起 LLM 请求
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_wire_format_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+os.environ["QUERY_MAX_ROWS"] = "100000"
+os.environ["QUERY_STREAM_MAX_ROWS"] = "100000"
+os.environ["QUERY_STREAM_MAX_BYTES"] = str(1 << 40)
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+from app.core.agent import SQLAgent
+from app.core.wire import (
+    WIRE_COLUMNAR,
+    WIRE_FORMATS,
+    WIRE_MSGPACK,
+    WIRE_ROWS,
+    decode_columns,
+    resolve_wire_format,
+    unpack,
+)
+from app.db.connection import get_db_path, get_sql_database
+from app.db.synthetic import generate_dataset
+from app.schemas.chat import SSEEvent, SSEEventType
+
+SALES_ROWS = 200_000
+REPEAT = 20
+
+QUERIES = {
+    "分组汇总（5 行）": "SELECT category, SUM(quantity * price) AS revenue FROM sales GROUP BY category",
+    "Top 100 商品": (
+        "SELECT product_name, category, SUM(quantity) AS qty, SUM(quantity * price) AS revenue "
+        "FROM sales GROUP BY product_name ORDER BY revenue DESC LIMIT 100"
+    ),
+    "明细 5000 行": "SELECT id, product_name, category, quantity, price, sale_date, region FROM sales LIMIT 5000",
+    "明细 50000 行": "SELECT id, product_name, category, quantity, price, sale_date, region FROM sales LIMIT 50000",
+}
+
+
+def events_for(agent: SQLAgent, sql: str) -> list:
+    """执行查询并返回 DATA / CHART（或 data_header / data_chunk / data_end）事件"""
+    return [item for item in agent._run_query(sql) if not hasattr(item, "row_count")]
+
+
+def median_ms(func) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def measure_single(agent: SQLAgent, sql: str) -> tuple[int, float]:
+    """
+    单个 DATA 事件：返回 (线上字节数, 构建 DATA / CHART 事件并序列化的耗时 ms)
+
+    查询只执行一次，计时不含 SQL 执行。
+    """
+    result = agent.executor.execute(sql)
+
+    def encode() -> int:
+        if agent.wire_format == WIRE_ROWS:
+            events = [agent._build_data_payload(result), agent._generate_chart_config(sql, result)]
+        else:
+            events = [agent._build_columnar_payload(result, 1), agent._chart_reference(sql, result, 1)]
+        return sum(
+            len(SSEEvent(event=kind, data=data).to_sse().encode("utf-8"))
+            for kind, data in zip((SSEEventType.DATA, SSEEventType.CHART), events) if data
+        )
+
+    return encode(), median_ms(encode)
+
+
+def measure_stream(agent: SQLAgent, sql: str) -> tuple[int, float]:
+    """分块推送：返回 (线上字节数, 执行查询、构建全部事件并序列化的总耗时 ms)"""
+    def encode() -> int:
+        return sum(len(event.to_sse().encode("utf-8")) for event in events_for(agent, sql))
+
+    encode()
+    return encode(), median_ms(encode)
+
+
+def verify(sql: str):
+    """确认 columnar / msgpack 解码后与 rows 编码的数据完全一致（单个 DATA 事件与分块推送）"""
+    rows_event = next(e for e in events_for(make_agent(WIRE_ROWS, False), sql) if e.event.value == "data")
+    expected = [list(row) for row in rows_event.data["raw"]]
+    for fmt in (WIRE_COLUMNAR, WIRE_MSGPACK):
+        data_event = next(e for e in events_for(make_agent(fmt, False), sql) if e.event.value == "data")
+        payload = unpack(data_event.data)
+        columns = decode_columns(payload["data"], payload["dicts"])
+        assert [list(row) for row in zip(*columns)] == expected, fmt
+
+    # 流式结果：各数据块共享字典，按顺序解码后应与行式数据块拼接结果一致
+    expected = [
+        row
+        for e in events_for(make_agent(WIRE_ROWS, True), sql) if e.event.value == "data_chunk"
+        for row in e.data["rows"]
+    ]
+    for fmt in (WIRE_COLUMNAR, WIRE_MSGPACK):
+        state: list = []
+        decoded = []
+        for e in events_for(make_agent(fmt, True), sql):
+            if e.event.value == "data_chunk":
+                payload = unpack(e.data)
+                decoded.extend(list(row) for row in zip(*decode_columns(payload["data"], payload["dicts"], state)))
+        assert decoded == expected, fmt
+
+
+def make_agent(wire_format: str, stream: bool) -> SQLAgent:
+    agent = SQLAgent("bench", wire_format=wire_format)
+    agent.settings = agent.settings.model_copy(update={"query_stream_results": stream})
+    return agent
+
+
+def main():
+    print("=" * 78)
+    print("查询结果线上编码：字节数与序列化耗时")
+    print("=" * 78)
+
+    get_sql_database()
+    dataset = generate_dataset(get_db_path(), SALES_ROWS, seed=42)
+    print(f"sales {dataset.tables['sales']:,} 行，重复 {REPEAT} 次取中位数")
+    if resolve_wire_format(WIRE_MSGPACK) != WIRE_MSGPACK:
+        print("未安装 ormsgpack，msgpack 回退为 columnar")
+
+    for name, sql in QUERIES.items():
+        verify(sql)
+
+    for stream in (False, True):
+        if stream:
+            print("\n[分块推送 data_header / data_chunk / data_end + CHART]  耗时含 SQL 执行")
+        else:
+            print("\n[单个 DATA 事件 + CHART]  耗时为构建事件 + to_sse，不含 SQL 执行")
+        print(f"{'查询':<16}{'编码':<10}{'字节':>12}{'相对 rows':>12}{'耗时 ms':>12}")
+        print("-" * 78)
+        for name, sql in QUERIES.items():
+            baseline = None
+            for fmt in WIRE_FORMATS:
+                agent = make_agent(fmt, stream)
+                size, elapsed_ms = measure_stream(agent, sql) if stream else measure_single(agent, sql)
+                baseline = baseline or size
+                print(f"{name:<16}{fmt:<10}{size:>12,}{size / baseline:>12.0%}{elapsed_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
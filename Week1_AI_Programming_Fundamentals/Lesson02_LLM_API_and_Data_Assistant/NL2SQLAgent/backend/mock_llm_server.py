@@ -0,0 +1,468 @@
+"""
+本地 LLM 模拟服务（DashScope / OpenAI 兼容接口），用于在单机上压测两个后端的 SSE 吞吐与背压
+
+- DashScope 文本生成接口：POST /api/v1/services/aigc/text-generation/generation
+  （ChatTongyi 使用；支持 incremental_output 与累积输出两种流式模式、非流式调用）
+- OpenAI 兼容接口：POST /chat/completions 与 /v1/chat/completions
+  （chatgpt-clone 的 AsyncOpenAI 使用；thinking 开启或模型名含 reasoner 时先输出 reasoning_content）
+
+请求带有 tools 且最后一条消息不是工具结果时返回工具调用（默认调用 sql_db_query），
+否则按配置的速率逐 token 输出回答。可按概率注入延迟尖峰、请求失败（429 / 500）与流中断。
+
+用法：
+    python mock_llm_server.py --port 9000 --token-rate 50 --first-token-ms 300 \\
+        --spike-rate 0.05 --spike-ms 2000 --error-rate 0.02 --stream-error-rate 0.01
+
+    # NL2SQL 后端
+    DASHSCOPE_BASE_URL=http://127.0.0.1:9000/api/v1 DASHSCOPE_API_KEY=mock uvicorn app.main:app --port 8000
+    # chatgpt-clone 后端
+    DEEPSEEK_BASE_URL=http://127.0.0.1:9000 DEEPSEEK_API_KEY=mock uvicorn app.main:app --port 8001
+
+    GET /stats 查看请求数、进行中的流、已发送 token 数与注入的故障次数
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_TEXT = (
+    "根据查询结果，电子产品的销售额最高，占总销售额的四成左右；办公用品销量最大但单价较低；"
+    "家具类销售额位居第三。华东和华南地区贡献了过半的销售额，下半年尤其是十一月出现明显高峰。"
+)
+REASONING_TEXT = (
+    "用户想了解各品类的销售情况。需要按类别分组汇总销售额，再比较各地区和月份的分布，"
+    "最后用简洁的语言总结主要结论。"
+)
+DEFAULT_TOOL_QUERY = "SELECT category, SUM(quantity * price) AS total FROM sales GROUP BY category"
+
+# 每个 token 的字符数（中文约 1~2 个字符一个 token）
+_TOKEN_CHARS = 2
+# 工具调用参数每个分片的字符数
+_ARGUMENT_CHARS = 16
+
+
+@dataclass
+class MockConfig:
+    """模拟行为配置"""
+    first_token_ms: float = 300         # 首 token 延迟（毫秒）
+    token_rate: float = 50              # 每秒输出的 token 数，0 表示不限速
+    answer_tokens: int = 60             # 回答的 token 数
+    reasoning_tokens: int = 40          # 思考模式下 reasoning_content 的 token 数
+    tool_name: str = "sql_db_query"     # 优先调用的工具
+    tool_query: str = DEFAULT_TOOL_QUERY  # sql_db_query 的查询参数
+    spike_rate: float = 0.0             # 请求出现延迟尖峰的概率
+    spike_ms: float = 2000              # 延迟尖峰的时长（毫秒）
+    error_rate: float = 0.0             # 请求直接失败（429 / 500）的概率
+    stream_error_rate: float = 0.0      # 流式输出中途出错的概率
+
+
+@dataclass
+class MockStats:
+    """运行统计"""
+    requests: int = 0
+    streams: int = 0
+    active_streams: int = 0
+    tokens: int = 0
+    tool_calls: int = 0
+    spikes: int = 0
+    errors: int = 0
+    stream_errors: int = 0
+
+
+@dataclass
+class _Plan:
+    """单个请求的响应计划"""
+    reasoning: list[str]
+    content: list[str]
+    tool_call: Optional[dict]       # {id, name, arguments}
+    spike_at: Optional[int]         # 在第几个 token 前插入延迟尖峰
+    fail_at: Optional[int]          # 流式输出到第几个 token 时中断
+    input_tokens: int
+
+    @property
+    def steps(self) -> int:
+        return len(self.reasoning) + len(self.content) + len(self.argument_chunks())
+
+    def argument_chunks(self) -> list[str]:
+        if self.tool_call is None:
+            return []
+        arguments = self.tool_call["arguments"]
+        return [arguments[i:i + _ARGUMENT_CHARS] for i in range(0, len(arguments), _ARGUMENT_CHARS)]
+
+
+class MockLLM:
+    """按配置生成响应计划并控制输出节奏"""
+
+    def __init__(self, config: MockConfig, seed: Optional[int] = None):
+        self.config = config
+        self.stats = MockStats()
+        self._random = random.Random(seed)
+
+    @staticmethod
+    def _tokens(text: str, count: int) -> list[str]:
+        if count <= 0:
+            return []
+        repeated = text * (count * _TOKEN_CHARS // len(text) + 1)
+        return [repeated[i * _TOKEN_CHARS:(i + 1) * _TOKEN_CHARS] for i in range(count)]
+
+    def _tool_call(self, messages: list[dict], tools: Optional[list]) -> Optional[dict]:
+        """带工具且最后一条消息不是工具结果时返回一个工具调用"""
+        if not tools or (messages and messages[-1].get("role") == "tool"):
+            return None
+        functions = [tool.get("function", tool) for tool in tools]
+        function = next((f for f in functions if f.get("name") == self.config.tool_name), functions[0])
+
+        # 必填参数：查询用配置的 SQL，其余参数填表名
+        required = function.get("parameters", {}).get("required", [])
+        args = {
+            name: self.config.tool_query if name == "query" else "sales"
+            for name in required
+        }
+        return {
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "name": function.get("name", "tool"),
+            "arguments": json.dumps(args, ensure_ascii=False),
+        }
+
+    def plan(self, messages: list[dict], tools: Optional[list], thinking: bool) -> _Plan:
+        """
+        生成单个请求的响应计划
+
+        Args:
+            messages: 请求消息
+            tools: 请求中的工具定义
+            thinking: 是否输出思考内容
+
+        Returns:
+            响应计划
+        """
+        config = self.config
+        tool_call = self._tool_call(messages, tools)
+        plan = _Plan(
+            reasoning=self._tokens(REASONING_TEXT, config.reasoning_tokens) if thinking else [],
+            content=[] if tool_call else self._tokens(ANSWER_TEXT, config.answer_tokens),
+            tool_call=tool_call,
+            spike_at=None,
+            fail_at=None,
+            input_tokens=sum(len(str(m.get("content") or "")) for m in messages) // _TOKEN_CHARS,
+        )
+        steps = max(1, plan.steps)
+        if self._random.random() < config.spike_rate:
+            plan.spike_at = self._random.randrange(steps)
+        if self._random.random() < config.stream_error_rate:
+            plan.fail_at = self._random.randrange(steps)
+        return plan
+
+    def should_fail(self) -> Optional[int]:
+        """按概率返回注入的 HTTP 错误状态码"""
+        if self._random.random() < self.config.error_rate:
+            self.stats.errors += 1
+            return self._random.choice([429, 500])
+        return None
+
+    async def first_token(self):
+        await asyncio.sleep(self.config.first_token_ms / 1000)
+
+    async def pace(self, plan: _Plan, index: int):
+        """每个输出步骤前等待：按 token 速率限速，必要时插入延迟尖峰"""
+        if plan.spike_at == index:
+            self.stats.spikes += 1
+            await asyncio.sleep(self.config.spike_ms / 1000)
+        if self.config.token_rate > 0:
+            await asyncio.sleep(1 / self.config.token_rate)
+
+    async def steps(self, plan: _Plan) -> AsyncIterator[tuple[str, str]]:
+        """
+        按节奏产出输出步骤
+
+        Yields:
+            (kind, text)：kind 为 reasoning / content / arguments；
+            到达 fail_at 时产出 ("error", "")并结束
+        """
+        index = 0
+        items = (
+            [("reasoning", t) for t in plan.reasoning]
+            + [("content", t) for t in plan.content]
+            + [("arguments", t) for t in plan.argument_chunks()]
+        )
+        await self.first_token()
+        for kind, text in items:
+            if plan.fail_at == index:
+                self.stats.stream_errors += 1
+                yield "error", ""
+                return
+            await self.pace(plan, index)
+            self.stats.tokens += 1
+            index += 1
+            yield kind, text
+        if plan.tool_call is not None:
+            self.stats.tool_calls += 1
+
+    async def total_delay(self, plan: _Plan):
+        """非流式调用：等待与流式输出相同的总时长"""
+        await self.first_token()
+        if plan.spike_at is not None:
+            self.stats.spikes += 1
+            await asyncio.sleep(self.config.spike_ms / 1000)
+        if self.config.token_rate > 0:
+            await asyncio.sleep(plan.steps / self.config.token_rate)
+        self.stats.tokens += plan.steps
+        if plan.tool_call is not None:
+            self.stats.tool_calls += 1
+
+
+def _usage(plan: _Plan) -> dict:
+    output = plan.steps
+    return {"input_tokens": plan.input_tokens, "output_tokens": output, "total_tokens": plan.input_tokens + output}
+
+
+def create_app(mock: MockLLM) -> FastAPI:
+    """
+    创建模拟服务应用
+
+    Args:
+        mock: 模拟 LLM
+
+    Returns:
+        FastAPI 应用
+    """
+    app = FastAPI(title="Mock LLM Server")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return {**asdict(mock.stats), "config": asdict(mock.config)}
+
+    @app.post("/api/v1/services/aigc/text-generation/generation")
+    async def dashscope_generation(request: Request):
+        body = await request.json()
+        mock.stats.requests += 1
+        request_id = str(uuid.uuid4())
+        parameters = body.get("parameters", {})
+        messages = body.get("input", {}).get("messages", [])
+
+        status = mock.should_fail()
+        if status is not None:
+            code = "Throttling.RateQuota" if status == 429 else "InternalError"
+            return JSONResponse(
+                status_code=status,
+                content={"code": code, "message": f"模拟错误（{status}）", "request_id": request_id},
+            )
+
+        plan = mock.plan(messages, parameters.get("tools"), bool(parameters.get("enable_thinking")))
+        stream = (
+            request.headers.get("x-dashscope-sse", "").lower() == "enable"
+            or "text/event-stream" in request.headers.get("accept", "")
+            or bool(parameters.get("stream"))
+        )
+
+        def output(message: dict, finish_reason: str) -> dict:
+            return {
+                "output": {"choices": [{"finish_reason": finish_reason, "message": message}]},
+                "usage": _usage(plan),
+                "request_id": request_id,
+            }
+
+        def message(reasoning: str, content: str, arguments: Optional[str]) -> dict:
+            data = {"role": "assistant", "content": content}
+            if reasoning:
+                data["reasoning_content"] = reasoning
+            if arguments is not None:
+                call = plan.tool_call
+                data["tool_calls"] = [{
+                    "index": 0, "id": call["id"], "type": "function",
+                    "function": {"name": call["name"], "arguments": arguments},
+                }]
+            return data
+
+        finish = "tool_calls" if plan.tool_call else "stop"
+        if not stream:
+            await mock.total_delay(plan)
+            arguments = plan.tool_call["arguments"] if plan.tool_call else None
+            return output(message("".join(plan.reasoning), "".join(plan.content), arguments), finish)
+
+        incremental = bool(parameters.get("incremental_output"))
+
+        async def events() -> AsyncIterator[str]:
+            mock.stats.streams += 1
+            mock.stats.active_streams += 1
+            seq = 0
+            reasoning = content = arguments = ""
+            arguments_sent = False
+            try:
+                async for kind, text in mock.steps(plan):
+                    seq += 1
+                    if kind == "error":
+                        error = {"code": "InternalError", "message": "模拟流式输出中断", "request_id": request_id}
+                        yield f"id:{seq}\nevent:error\n:HTTP_STATUS/500\ndata:{json.dumps(error)}\n\n"
+                        return
+                    # 增量模式只发送本次片段，累积模式发送截至目前的全部内容
+                    if not incremental:
+                        reasoning, content, arguments = (
+                            reasoning + (text if kind == "reasoning" else ""),
+                            content + (text if kind == "content" else ""),
+                            arguments + (text if kind == "arguments" else ""),
+                        )
+                        data = message(reasoning, content, arguments if kind == "arguments" else None)
+                    else:
+                        data = message(
+                            text if kind == "reasoning" else "",
+                            text if kind == "content" else "",
+                            text if kind == "arguments" else None,
+                        )
+                        if kind == "arguments" and arguments_sent:
+                            # 增量模式下工具名与 ID 只在第一个分片中出现
+                            call = data["tool_calls"][0]
+                            call.pop("id")
+                            call["function"].pop("name")
+                        arguments_sent = arguments_sent or kind == "arguments"
+                    payload = json.dumps(output(data, "null"), ensure_ascii=False)
+                    yield f"id:{seq}\nevent:result\n:HTTP_STATUS/200\ndata:{payload}\n\n"
+
+                final = (
+                    message(reasoning, content, arguments if plan.tool_call else None) if not incremental
+                    else message("", "", None)
+                )
+                payload = json.dumps(output(final, finish), ensure_ascii=False)
+                yield f"id:{seq + 1}\nevent:result\n:HTTP_STATUS/200\ndata:{payload}\n\n"
+            finally:
+                mock.stats.active_streams -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        mock.stats.requests += 1
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock")
+
+        status = mock.should_fail()
+        if status is not None:
+            kind = "rate_limit_error" if status == 429 else "server_error"
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": f"模拟错误（{status}）", "type": kind, "code": kind}},
+            )
+
+        thinking = (body.get("thinking") or {}).get("type") == "enabled" or "reasoner" in model
+        plan = mock.plan(body.get("messages", []), body.get("tools"), thinking)
+        finish = "tool_calls" if plan.tool_call else "stop"
+        created = int(time.time())
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None, usage: bool = False) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage:
+                data["usage"] = {
+                    "prompt_tokens": plan.input_tokens,
+                    "completion_tokens": plan.steps,
+                    "total_tokens": plan.input_tokens + plan.steps,
+                }
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        if not body.get("stream"):
+            await mock.total_delay(plan)
+            message = {"role": "assistant", "content": "".join(plan.content)}
+            if plan.reasoning:
+                message["reasoning_content"] = "".join(plan.reasoning)
+            if plan.tool_call:
+                call = plan.tool_call
+                message["tool_calls"] = [{
+                    "id": call["id"], "type": "function",
+                    "function": {"name": call["name"], "arguments": call["arguments"]},
+                }]
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+                "usage": {
+                    "prompt_tokens": plan.input_tokens,
+                    "completion_tokens": plan.steps,
+                    "total_tokens": plan.input_tokens + plan.steps,
+                },
+            }
+
+        async def events() -> AsyncIterator[str]:
+            mock.stats.streams += 1
+            mock.stats.active_streams += 1
+            started = False
+            try:
+                yield chunk({"role": "assistant", "content": ""})
+                async for kind, text in mock.steps(plan):
+                    if kind == "error":
+                        # OpenAI SDK 遇到带 error 的数据块会抛出 APIError
+                        error = {"message": "模拟流式输出中断", "type": "server_error", "code": "server_error"}
+                        yield f"data: {json.dumps({'error': error}, ensure_ascii=False)}\n\n"
+                        return
+                    if kind == "reasoning":
+                        yield chunk({"reasoning_content": text})
+                    elif kind == "content":
+                        yield chunk({"content": text})
+                    else:
+                        call = {"index": 0, "function": {"arguments": text}}
+                        if not started:
+                            call.update(id=plan.tool_call["id"], type="function")
+                            call["function"]["name"] = plan.tool_call["name"]
+                            started = True
+                        yield chunk({"tool_calls": [call]})
+                yield chunk({}, finish, usage=True)
+                yield "data: [DONE]\n\n"
+            finally:
+                mock.stats.active_streams -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    return app
+
+
+def main():
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="本地 LLM 模拟服务（DashScope / OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--first-token-ms", type=float, default=defaults.first_token_ms, help="首 token 延迟（毫秒）")
+    parser.add_argument("--token-rate", type=float, default=defaults.token_rate, help="每秒输出的 token 数，0 表示不限速")
+    parser.add_argument("--answer-tokens", type=int, default=defaults.answer_tokens, help="回答的 token 数")
+    parser.add_argument("--reasoning-tokens", type=int, default=defaults.reasoning_tokens, help="思考内容的 token 数")
+    parser.add_argument("--tool-name", default=defaults.tool_name, help="优先调用的工具名")
+    parser.add_argument("--tool-query", default=defaults.tool_query, help="sql_db_query 工具调用的 SQL")
+    parser.add_argument("--spike-rate", type=float, default=defaults.spike_rate, help="请求出现延迟尖峰的概率")
+    parser.add_argument("--spike-ms", type=float, default=defaults.spike_ms, help="延迟尖峰时长（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="请求直接失败（429 / 500）的概率")
+    parser.add_argument("--stream-error-rate", type=float, default=defaults.stream_error_rate, help="流式输出中途出错的概率")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子（故障注入可复现）")
+    args = parser.parse_args()
+
+    config = MockConfig(**{
+        name: getattr(args, name) for name in MockConfig.__dataclass_fields__
+    })
+    print("=" * 60)
+    print(f"Mock LLM Server: http://{args.host}:{args.port}")
+    print(f"  DashScope: DASHSCOPE_BASE_URL=http://{args.host}:{args.port}/api/v1")
+    print(f"  OpenAI 兼容: DEEPSEEK_BASE_URL=http://{args.host}:{args.port}")
+    print("=" * 60)
+    uvicorn.run(create_app(MockLLM(config, seed=args.seed)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Agent 离线基准测试（pytest，本地模拟 LLM，不发起网络请求）
+用脚本化的 BaseChatModel 按固定顺序回放工具调用，驱动 SQLAgent.run，
+分阶段统计 p50 / p95 / p99：LLM 等待、工具执行、结果解析、图表构建、SSE 序列化
+
+运行：python -m pytest -q -s test_agent_bench.py
+可用环境变量调整：BENCH_RUNS（每个场景运行次数）、BENCH_SCALE（合成数据规模）、
+BENCH_FIRST_TOKEN_MS / BENCH_TOKEN_MS（模拟首 token 延迟与 token 间隔）
+"""
+import asyncio
+import copy
+import dataclasses
+import datetime
+import decimal
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+# 使用临时数据库，避免污染 data/app.db；关闭计划缓存与结果缓存，保证每次都调用 LLM 并执行 SQL
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_agent_phases_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}"
+os.environ.setdefault("DASHSCOPE_API_KEY", "bench-placeholder")
+os.environ["PLAN_CACHE_ENABLED"] = "false"
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+import pytest
+
+from app.config import get_settings
+from app.core import sse as sse_module
+from app.core.agent import SQLAgent, get_agent_runtime
+from app.core.cost_guard import ACTION_ALLOW, ACTION_LIMIT, ACTION_REJECT, QueryCostGuard
+from app.db.connection import get_db_path
+from app.db.synthetic import generate_dataset
+from app.schemas.chat import SSEEvent, SSEEventType
+from bench_support import ScriptedChatModel, tool_call
+
+NUM_RUNS = int(os.environ.get("BENCH_RUNS", "20"))
+DATA_SCALE = os.environ.get("BENCH_SCALE", "10k")
+FIRST_TOKEN_DELAY = float(os.environ.get("BENCH_FIRST_TOKEN_MS", "20")) / 1000
+TOKEN_DELAY = float(os.environ.get("BENCH_TOKEN_MS", "1")) / 1000
+
+PHASES = ["llm_wait", "tool_execution", "result_parsing", "chart_building", "sse_serialization"]
+PHASE_NAMES = {
+    "llm_wait": "LLM 等待",
+    "tool_execution": "工具执行",
+    "result_parsing": "结果解析",
+    "chart_building": "图表构建",
+    "sse_serialization": "SSE 序列化",
+}
+ANSWER = "按类别统计，电子产品销售额最高，其次是办公用品，日用品最低。"
+
+
+# 场景：每轮 LLM 响应为一组工具调用，或最终回答（字符串）
+SCENARIOS = {
+    "aggregate": [
+        [tool_call("sql_db_query", query="SELECT category, SUM(quantity * price) AS total FROM sales GROUP BY category")],
+        ANSWER,
+    ],
+    "discovery": [
+        [tool_call("sql_db_list_tables")],
+        [tool_call("sql_db_schema", table_names="sales, products")],
+        [tool_call("sql_db_query", query=(
+            "SELECT p.brand, COUNT(*) AS orders FROM sales s JOIN products p ON p.id = s.product_id "
+            "GROUP BY p.brand ORDER BY orders DESC LIMIT 10"
+        ))],
+        ANSWER,
+    ],
+    "wide_result": [
+        [tool_call("sql_db_query", query="SELECT sale_date, region, price, quantity FROM sales ORDER BY id LIMIT 5000")],
+        ANSWER,
+    ],
+}
+
+
+class InstrumentedAgent(SQLAgent):
+    """
+    记录各阶段耗时的 Agent
+
+    只统计各阶段自身的执行时间：异步 / 同步生成器按每次取下一项的耗时累加，
+    不包括调用方处理事件的时间。工具执行包含其中的结果解析与图表构建。
+    """
+
+    def __init__(self, session_id: str, runtime, phases: dict[str, list[float]]):
+        # 结果解析包括列式转换（流式推送时的逐块转换）与 DATA 负载构建
+        executor = copy.copy(runtime.executor)
+        executor.to_columns = self._timed(executor.to_columns, phases["result_parsing"])
+        super().__init__(session_id, runtime=dataclasses.replace(runtime, executor=executor))
+        self.phases = phases
+
+    @staticmethod
+    def _timed(func, samples: list[float]):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                samples.append((time.perf_counter() - start) * 1000)
+        return wrapper
+
+    async def _call_llm(self, messages):
+        start = time.perf_counter()
+        try:
+            return await super()._call_llm(messages)
+        finally:
+            self.phases["llm_wait"].append((time.perf_counter() - start) * 1000)
+
+    async def _stream_llm(self, messages):
+        elapsed = 0.0
+        items = super()._stream_llm(messages)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.phases["llm_wait"].append(elapsed * 1000)
+            await items.aclose()
+
+    def _tool_steps(self, tool_call):
+        elapsed = 0.0
+        steps = super()._tool_steps(tool_call)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(steps)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.phases["tool_execution"].append(elapsed * 1000)
+            steps.close()
+
+    def _build_data_payload(self, result):
+        return self._timed(super()._build_data_payload, self.phases["result_parsing"])(result)
+
+    def _generate_chart_config(self, sql, result):
+        return self._timed(super()._generate_chart_config, self.phases["chart_building"])(sql, result)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """最近秩百分位数"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+async def run_scenario(name: str, settings_update: dict, phases: dict[str, list[float]]) -> list:
+    """运行一次场景，返回收到的事件；SSE 序列化耗时按事件计入 phases"""
+    runtime = dataclasses.replace(
+        get_agent_runtime(),
+        llm_with_tools=ScriptedChatModel(
+            script=SCENARIOS[name], first_token_delay=FIRST_TOKEN_DELAY, token_delay=TOKEN_DELAY
+        ),
+        settings=get_settings().model_copy(update=settings_update),
+    )
+    agent = InstrumentedAgent(f"bench-{name}-{time.perf_counter_ns()}", runtime, phases)
+
+    events = []
+    async for event in agent.run("各类别的销售额是多少？"):
+        start = time.perf_counter()
+        event.to_sse()
+        phases["sse_serialization"].append((time.perf_counter() - start) * 1000)
+        events.append(event)
+    return events
+
+
+def print_report(title: str, phases: dict[str, list[float]]):
+    print("\n" + "=" * 72)
+    print(title)
+    print("=" * 72)
+    print(f"{'阶段':<14}{'样本':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}{'总计 (ms)':>12}")
+    print("-" * 72)
+    for phase in PHASES:
+        samples = phases[phase]
+        if not samples:
+            print(f"{PHASE_NAMES[phase]:<14}{0:>8}")
+            continue
+        print(f"{PHASE_NAMES[phase]:<14}{len(samples):>8}{percentile(samples, 50):>12.3f}"
+              f"{percentile(samples, 95):>12.3f}{percentile(samples, 99):>12.3f}{sum(samples):>12.1f}")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def dataset():
+    """标准合成数据集（在构建 Agent 运行时之前写入，使 SQLDatabase 能看到全部表）"""
+    result = generate_dataset(get_db_path(), DATA_SCALE, seed=42)
+    get_agent_runtime()
+    return result
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 95) == 95
+    assert percentile(samples, 99) == 99
+    assert percentile([3.0], 99) == 3.0
+
+
+def test_scripted_model_replays_script():
+    """脚本化模型按顺序回放，流式分片能组装回完整的工具调用"""
+    phases = defaultdict(list)
+    events = asyncio.run(run_scenario("discovery", {"agent_stream_tokens": True}, phases))
+
+    types = [event.event for event in events]
+    assert SSEEventType.ERROR not in types
+    assert types[-1] == SSEEventType.DONE
+    assert events[-1].data["iterations"] == len(SCENARIOS["discovery"])
+    assert "".join(e.data for e in events if e.event == SSEEventType.TEXT) == ANSWER
+    assert [e.data for e in events if e.event == SSEEventType.SQL] == [SCENARIOS["discovery"][2][0]["args"]["query"]]
+    assert len(phases["llm_wait"]) == len(SCENARIOS["discovery"])
+    assert min(phases["llm_wait"]) >= FIRST_TOKEN_DELAY * 1000
+
+
+def test_plan_cache_lookups_run_off_the_event_loop(monkeypatch):
+    """计划缓存的 schema 指纹与查找都读 SQLite，必须在工具线程池中执行，不阻塞事件循环"""
+    import app.core.agent as agent_module
+
+    threads = []
+    fingerprint = agent_module.get_schema_fingerprint
+    lookup = agent_module.plan_cache.get
+
+    def record_fingerprint(conn):
+        threads.append(("fingerprint", threading.current_thread()))
+        return fingerprint(conn)
+
+    def record_lookup(*args):
+        threads.append(("lookup", threading.current_thread()))
+        return lookup(*args)
+
+    monkeypatch.setattr(agent_module, "get_schema_fingerprint", record_fingerprint)
+    monkeypatch.setattr(agent_module.plan_cache, "get", record_lookup)
+    for _ in range(2):
+        asyncio.run(run_scenario("aggregate", {"plan_cache_enabled": True}, defaultdict(list)))
+
+    assert {name for name, _ in threads} == {"fingerprint", "lookup"}
+    assert all(thread is not threading.main_thread() for _, thread in threads)
+
+
+def test_streamed_result_types():
+    """只有一个数据块的流式结果，data_end 的列类型与 data_header 一致（构建结果头时不能清空累积的类型集合）"""
+    agent = SQLAgent("bench")
+    agent.settings = agent.settings.model_copy(update={"query_stream_results": True})
+    events = {
+        item.event: item.data
+        for item in agent._run_query("SELECT id, product_name, price FROM sales LIMIT 300")
+        if isinstance(item, SSEEvent)
+    }
+    expected = ["integer", "text", "real"]
+    assert events[SSEEventType.DATA_HEADER]["types"] == expected
+    assert events[SSEEventType.DATA_END]["types"] == expected
+
+
+@pytest.mark.skipif(sse_module.orjson is None, reason="orjson 未安装")
+def test_json_backends_produce_same_bytes():
+    """orjson 与标准库对查询结果中常见的值输出相同的字节"""
+    data = {
+        "rows": [[1, 2.5, "中文", None, True], [float("nan"), float("inf"), decimal.Decimal("1.50"), b"ab"]],
+        "at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+        "day": datetime.date(2024, 1, 2),
+        "time": datetime.time(3, 4, 5),
+        "keys": {1: "a", None: "b"},
+    }
+    assert sse_module.get_json_dumper("orjson")(data) == sse_module.get_json_dumper("json")(data)
+
+
+def test_cost_guard_limit_keeps_column_names():
+    """自动添加 LIMIT 后结果列名不变（连接查询中重名的 id 列不能被改名为 id:1）"""
+    sql = "SELECT s.id, e.id, e.name FROM sales s JOIN employees e ON e.id = s.employee_id"
+    with get_agent_runtime().executor.pool.connection() as conn:
+        decision = QueryCostGuard().review(conn, sql, fetch_limit=10)
+        assert decision.action == ACTION_LIMIT
+        original = [column[0] for column in conn.execute(sql).description]
+        rewritten = conn.execute(decision.sql)
+        assert [column[0] for column in rewritten.description] == original == ["id", "id", "name"]
+        assert len(rewritten.fetchall()) == 10
+
+        # 分号后的行尾注释：追加的 LIMIT 不能落在第二条语句或注释里
+        decision = QueryCostGuard().review(conn, "SELECT id, product_name FROM sales; -- 全部明细\n", fetch_limit=10)
+        assert decision.action == ACTION_LIMIT
+        assert len(conn.execute(decision.sql).fetchall()) == 10
+
+
+def test_cost_guard_allows_single_table_aggregates():
+    """单表聚合超过扫描上限时不拒绝；不带 GROUP BY 的聚合估算为一行输出"""
+    guard = QueryCostGuard(max_rows_examined=1)
+    with get_agent_runtime().executor.pool.connection() as conn:
+        decision = guard.review(conn, "SELECT COUNT(*) FROM sales", fetch_limit=10)
+        assert (decision.action, decision.estimated_output) == (ACTION_ALLOW, 1)
+        decision = guard.review(conn, "SELECT category, SUM(quantity * price) FROM sales GROUP BY category")
+        assert decision.action == ACTION_ALLOW
+        decision = guard.review(conn, "SELECT s.id, e.name FROM sales s, employees e")
+        assert decision.action == ACTION_REJECT
+    assert guard.stats()["warned"] == 2
+
+
+@pytest.mark.parametrize("stream_tokens,stream_results", [(False, False), (True, True)])
+def test_phase_latency(stream_tokens: bool, stream_results: bool, capsys):
+    """各场景运行 NUM_RUNS 次，输出各阶段延迟分布"""
+    settings_update = {"agent_stream_tokens": stream_tokens, "query_stream_results": stream_results}
+    phases = defaultdict(list)
+
+    async def run_all():
+        for name in SCENARIOS:
+            await run_scenario(name, settings_update, defaultdict(list))     # 预热
+        for _ in range(NUM_RUNS):
+            for name in SCENARIOS:
+                events = await run_scenario(name, settings_update, phases)
+                assert events[-1].event == SSEEventType.DONE, events[-1].data
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+
+    with capsys.disabled():
+        print_report(
+            f"Agent 分阶段延迟: runs={NUM_RUNS}, 场景={len(SCENARIOS)}, 数据={DATA_SCALE}, "
+            f"流式 token={stream_tokens}, 流式结果={stream_results}, 总耗时 {elapsed:.1f} s",
+            phases,
+        )
+
+    for phase in PHASES:
+        assert phases[phase], f"阶段 {phase} 没有样本"
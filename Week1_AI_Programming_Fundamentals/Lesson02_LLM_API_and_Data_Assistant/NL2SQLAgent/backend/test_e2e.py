@@ -146,7 +146,7 @@ def test_full_flow():
     
     response = requests.get(f"{BASE_URL}/api/sessions/{session_id}/messages")
     assert response.status_code == 200, f"获取消息失败: {response.status_code}"
-    messages = response.json()
+    messages = response.json()["items"]
     
     assert len(messages) >= 2, f"消息数量不正确: {len(messages)}"
     print(f"✓ 会话中有 {len(messages)} 条消息")
@@ -220,7 +220,7 @@ def test_multiple_queries():
     
     # 验证消息数量
     response = requests.get(f"{BASE_URL}/api/sessions/{session_id}/messages")
-    messages = response.json()
+    messages = response.json()["items"]
     print(f"\n总消息数: {len(messages)}")
     assert len(messages) >= 6, "多轮对话消息数量不正确"
     
@@ -8,7 +8,7 @@ export function DataTable({ data }: DataTableProps) {
   const { columns, rows, raw } = data
 
   // 优先使用 raw 数据（原始行数据），如果没有则使用 rows
-  const displayRows = raw && raw.length > 0 ? raw : rows.map(row => [row.name, row.value])
+  const displayRows = raw && raw.length > 0 ? raw : rows.map(row => [row.name, ...(Array.isArray(row.value) ? row.value : [row.value])])
   
   if (displayRows.length === 0) {
     return (
@@ -10,7 +10,8 @@ export function ChartPanel() {
   // 检查是否有数据
   const hasData = chartConfig || tableData
   const hasChartData = chartConfig && chartConfig.data && chartConfig.data.length > 0
-  const hasTableData = tableData && tableData.rows && tableData.rows.length > 0
+  const tableRowCount = tableData?.row_count ?? (tableData?.raw?.length || tableData?.rows?.length || 0)
+  const hasTableData = tableData && ((tableData.raw?.length || 0) > 0 || (tableData.rows?.length || 0) > 0)
 
   const chartTypes: { type: ChartConfig['type']; icon: React.ReactNode; label: string }[] = [
     { type: 'bar', icon: <BarChart3 className="w-4 h-4" />, label: '柱状图' },
@@ -126,7 +127,8 @@ export function ChartPanel() {
       <div className="px-4 py-3 border-t border-slate-700/50">
         <div className="flex items-center justify-between text-xs text-slate-500">
           <span>
-            数据行数: {tableData?.rows?.length || chartConfig?.data?.length || 0}
+            数据行数: {tableRowCount || chartConfig?.data?.length || 0}
+            {tableData?.truncated ? '（已截断）' : ''}
           </span>
           <span>{hasData ? '实时数据' : '等待查询'}</span>
         </div>
@@ -5,15 +5,25 @@ import type { Message } from '../../types'
 interface MessageListProps {
   messages: Message[]
   isStreaming: boolean
+  hasEarlier: boolean
+  isLoadingEarlier: boolean
+  onLoadEarlier: () => void
 }
 
-export function MessageList({ messages, isStreaming }: MessageListProps) {
+export function MessageList({
+  messages,
+  isStreaming,
+  hasEarlier,
+  isLoadingEarlier,
+  onLoadEarlier,
+}: MessageListProps) {
   const bottomRef = useRef<HTMLDivElement>(null)
+  const lastMessage = messages[messages.length - 1]
 
-  // 自动滚动到底部
+  // 末尾消息变化时自动滚动到底部（在顶部插入更早的消息时保持位置）
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: 'smooth' })
-  }, [messages])
+  }, [lastMessage])
 
   if (messages.length === 0) {
     return (
@@ -65,6 +75,19 @@ export function MessageList({ messages, isStreaming }: MessageListProps) {
   return (
     <div className="flex-1 overflow-y-auto px-6 py-4">
       <div className="max-w-3xl mx-auto space-y-6">
+        {/* 加载更早的消息 */}
+        {hasEarlier && (
+          <div className="flex justify-center">
+            <button
+              onClick={onLoadEarlier}
+              disabled={isLoadingEarlier}
+              className="px-3 py-1 text-xs bg-slate-800 text-slate-400 rounded-lg hover:bg-slate-700 transition-colors disabled:opacity-50"
+            >
+              {isLoadingEarlier ? '加载中...' : '加载更早的消息'}
+            </button>
+          </div>
+        )}
+        
         {messages.map((message) => (
           <MessageItem key={message.id} message={message} />
         ))}
@@ -1,11 +1,32 @@
+import { useCallback, useState } from 'react'
 import { MessageList } from './MessageList'
 import { ChatInput } from './ChatInput'
 import { useAppStore } from '../../store/useAppStore'
 import { useChat } from '../../hooks/useChat'
+import { sessionApi } from '../../services/api'
+import type { Message } from '../../types'
 
 export function ChatArea() {
-  const { messages, currentSessionId } = useAppStore()
+  const { messages, currentSessionId, earlierCursor, prependMessages } = useAppStore()
   const { sendMessage, isStreaming, abort } = useChat()
+  const [isLoadingEarlier, setIsLoadingEarlier] = useState(false)
+
+  // 按 prev_cursor 加载更早的一页消息，插入到列表顶部
+  const loadEarlier = useCallback(async () => {
+    if (!currentSessionId || !earlierCursor) return
+    setIsLoadingEarlier(true)
+    try {
+      const { items, prev_cursor } = await sessionApi.getMessages(currentSessionId, earlierCursor)
+      // 加载期间切换了会话则丢弃结果
+      if (useAppStore.getState().currentSessionId === currentSessionId) {
+        prependMessages(items as Message[], prev_cursor)
+      }
+    } catch (e) {
+      console.error('Failed to load earlier messages:', e)
+    } finally {
+      setIsLoadingEarlier(false)
+    }
+  }, [currentSessionId, earlierCursor, prependMessages])
 
   const handleSend = async (content: string) => {
     if (!currentSessionId) {
@@ -32,7 +53,13 @@ export function ChatArea() {
       </div>
 
       {/* 消息列表 */}
-      <MessageList messages={messages} isStreaming={isStreaming} />
+      <MessageList
+        messages={messages}
+        isStreaming={isStreaming}
+        hasEarlier={earlierCursor !== null}
+        isLoadingEarlier={isLoadingEarlier}
+        onLoadEarlier={loadEarlier}
+      />
 
       {/* 输入框 */}
       <ChatInput
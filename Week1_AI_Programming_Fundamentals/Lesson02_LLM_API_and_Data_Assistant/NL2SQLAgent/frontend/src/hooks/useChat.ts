@@ -64,6 +64,7 @@ export function useChat() {
     const sse = api.chat({
       session_id: sessionId!,
       message: content,
+      wire_format: 'columnar',
     })
     
     // 保存 abort 函数
@@ -96,6 +97,23 @@ export function useChat() {
         setTableData(tableData)
       },
       
+      onDataHeader: (header) => {
+        // 流式结果：先展示表头，数据块到达后逐步追加
+        setTableData({ columns: header.columns, rows: [], raw: [], streaming: true })
+      },
+      
+      onDataChunk: (chunk) => {
+        const current = useAppStore.getState().tableData
+        if (!current) return
+        setTableData({ ...current, raw: [...(current.raw || []), ...chunk.rows] })
+      },
+      
+      onDataEnd: (end) => {
+        const current = useAppStore.getState().tableData
+        if (!current) return
+        setTableData({ ...current, row_count: end.row_count, truncated: end.truncated, streaming: false })
+      },
+      
       onChart: (config: SSEChartPayload) => {
         // 转换为图表配置格式
         const chartConfig: ChartConfig = {
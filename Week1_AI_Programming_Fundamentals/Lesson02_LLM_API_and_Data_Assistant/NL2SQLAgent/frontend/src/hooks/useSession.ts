@@ -28,12 +28,12 @@ export function useSession() {
     setError(null)
     
     try {
-      const data = await sessionApi.list()
-      setSessions(data)
+      const { items } = await sessionApi.list()
+      setSessions(items)
       
       // 如果有会话但没有选中的，选中第一个
-      if (data.length > 0 && !currentSessionId) {
-        selectSession(data[0].id)
+      if (items.length > 0 && !currentSessionId) {
+        selectSession(items[0].id)
       }
     } catch (e) {
       setError((e as Error).message)
@@ -77,8 +77,9 @@ export function useSession() {
     setError(null)
     
     try {
-      const messages = await sessionApi.getMessages(sessionId)
-      setMessages(messages as Message[])
+      // 从最新一页开始加载，更早的消息通过 prev_cursor 按需加载
+      const { items, prev_cursor } = await sessionApi.getMessages(sessionId)
+      setMessages(items as Message[], prev_cursor)
     } catch (e) {
       setError((e as Error).message)
       console.error('Failed to load messages:', e)
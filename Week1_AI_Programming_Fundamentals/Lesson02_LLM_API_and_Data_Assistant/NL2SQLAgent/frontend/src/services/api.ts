@@ -44,6 +44,13 @@ export interface SessionWithMessages extends Session {
   messages: Message[]
 }
 
+// 游标分页结果
+export interface Page<T> {
+  items: T[]
+  next_cursor: string | null
+  prev_cursor: string | null
+}
+
 // Database 相关类型
 export interface TableInfo {
   name: string
@@ -59,9 +66,10 @@ export interface DatabaseSchema {
  * Session API
  */
 export const sessionApi = {
-  // 获取所有会话列表
-  list: (): Promise<Session[]> => {
-    return request<Session[]>('/sessions')
+  // 获取会话列表（游标分页）
+  list: (cursor?: string): Promise<Page<Session>> => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+    return request<Page<Session>>(`/sessions${query}`)
   },
   
   // 创建新会话
@@ -92,9 +100,10 @@ export const sessionApi = {
     })
   },
   
-  // 获取会话消息列表
-  getMessages: (id: string): Promise<Message[]> => {
-    return request<Message[]>(`/sessions/${id}/messages`)
+  // 获取会话消息列表（默认从最新消息开始，用 prev_cursor 向前加载更早的消息）
+  getMessages: (id: string, cursor?: string): Promise<Page<Message>> => {
+    const query = cursor ? `cursor=${encodeURIComponent(cursor)}` : 'tail=true'
+    return request<Page<Message>>(`/sessions/${id}/messages?${query}`)
   },
 }
 
@@ -119,17 +128,43 @@ export const databaseApi = {
 export interface ChatRequest {
   session_id: string
   message: string
+  // 查询结果编码：rows（行式，默认）/ columnar（列式 + 字典编码，图表引用数据事件）
+  wire_format?: 'rows' | 'columnar'
 }
 
 export interface SSEEventData {
-  event: 'thinking' | 'text' | 'sql' | 'data' | 'chart' | 'error' | 'done'
+  event: 'thinking' | 'text' | 'sql' | 'data' | 'data_header' | 'data_chunk' | 'data_end' | 'chart' | 'error' | 'done'
   data: string | object
 }
 
 export interface SSEDataPayload {
   columns: string[]
-  rows: Array<{ name: string; value: number | string }>
+  types?: Array<'integer' | 'real' | 'text' | 'blob' | 'null' | 'mixed'>
+  // 两列结果的 value 为第二列取值，多列结果为其余各列取值组成的数组
+  rows: Array<{ name: string; value: number | string | Array<string | number | null> }>
   raw: Array<Array<string | number>>
+  row_count?: number
+  truncated?: boolean
+}
+
+// 流式结果：头 -> 数据块（按 seq 递增）-> 尾
+export interface SSEDataHeaderPayload {
+  columns: string[]
+  types: Array<'integer' | 'real' | 'text' | 'blob' | 'null' | 'mixed'>
+  chunk_rows: number
+}
+
+export interface SSEDataChunkPayload {
+  seq: number
+  rows: Array<Array<string | number | null>>
+}
+
+export interface SSEDataEndPayload {
+  row_count: number
+  chunks: number
+  bytes: number
+  types: Array<'integer' | 'real' | 'text' | 'blob' | 'null' | 'mixed'>
+  truncated: boolean
 }
 
 export interface SSEChartPayload {
@@ -141,6 +176,104 @@ export interface SSEChartPayload {
   seriesField?: string
 }
 
+// columnar 编码：列数组 + 各列新增的字典项（null 表示该列未做字典编码）
+type Cell = string | number | null
+
+interface ColumnarChunk {
+  data: Cell[][]
+  dicts: Array<Cell[] | null>
+}
+
+interface ColumnarDataPayload extends ColumnarChunk {
+  format: 'columnar'
+  id: number
+  columns: string[]
+  types: SSEDataPayload['types']
+  row_count: number
+  truncated: boolean
+}
+
+interface ChartReferencePayload {
+  type: SSEChartPayload['type']
+  title: string
+  source: number
+  x: number
+  y: number
+  limit: number
+}
+
+/**
+ * columnar 编码的解码状态（每个 SSE 连接一份）
+ * 
+ * 流式结果的各数据块共享字典；图表按 id 引用数据事件，保留各结果的首批列数据用于绘图。
+ */
+interface WireState {
+  dicts: Array<Cell[] | null> | null
+  streamId: number | null
+  sources: Map<number, Cell[][]>
+}
+
+function createWireState(): WireState {
+  return { dicts: null, streamId: null, sources: new Map() }
+}
+
+function decodeColumns(chunk: ColumnarChunk, state: WireState): Cell[][] {
+  if (!state.dicts) {
+    state.dicts = chunk.dicts.map(added => (added === null ? null : []))
+  }
+  const dicts = state.dicts
+  return chunk.data.map((values, i) => {
+    const dict = dicts[i]
+    if (!dict) return values
+    dict.push(...(chunk.dicts[i] || []))
+    return values.map(code => (code === null ? null : dict[code as number]))
+  })
+}
+
+function columnsToRows(columns: Cell[][]): Cell[][] {
+  const count = columns.length > 0 ? columns[0].length : 0
+  const rows: Cell[][] = []
+  for (let r = 0; r < count; r++) {
+    rows.push(columns.map(column => column[r]))
+  }
+  return rows
+}
+
+function decodeData(payload: ColumnarDataPayload, state: WireState): SSEDataPayload {
+  state.dicts = null
+  const columns = decodeColumns(payload, state)
+  state.sources.set(payload.id, columns)
+  const raw = columnsToRows(columns) as Array<Array<string | number>>
+  // 与 rows 编码一致：第一列为名称，其余列为取值
+  const rows = payload.columns.length >= 2
+    ? raw.map(row => ({
+        name: String(row[0]),
+        value: payload.columns.length === 2 ? row[1] : row.slice(1),
+      }))
+    : []
+  return {
+    columns: payload.columns,
+    types: payload.types,
+    rows,
+    raw,
+    row_count: payload.row_count,
+    truncated: payload.truncated,
+  }
+}
+
+function decodeChart(payload: ChartReferencePayload, state: WireState): SSEChartPayload {
+  const columns = state.sources.get(payload.source) || []
+  const names = (columns[payload.x] || []).slice(0, payload.limit)
+  const values = columns[payload.y] || []
+  return {
+    type: payload.type,
+    title: payload.title,
+    data: names.map((name, i) => ({ name: String(name), value: values[i] as number })),
+    xField: 'name',
+    yField: 'value',
+  }
+}
+
 /**
  * 创建 SSE 聊天连接
  * 
@@ -159,6 +292,9 @@ export function createChatSSE(request: ChatRequest) {
       onText?: (text: string) => void
       onSql?: (sql: string) => void
       onData?: (data: SSEDataPayload) => void
+      onDataHeader?: (header: SSEDataHeaderPayload) => void
+      onDataChunk?: (chunk: SSEDataChunkPayload) => void
+      onDataEnd?: (end: SSEDataEndPayload) => void
       onChart?: (config: SSEChartPayload) => void
       onError?: (error: string) => void
       onDone?: () => void
@@ -184,7 +320,11 @@ export function createChatSSE(request: ChatRequest) {
         }
         
         const decoder = new TextDecoder()
+        const wire = createWireState()
         let buffer = ''
+        // 事件可能跨多次 read() 到达，解析状态需在循环外保留
+        let currentEvent = ''
+        const dataLines: string[] = []
         
         while (true) {
           const { done, value } = await reader.read()
@@ -200,14 +340,11 @@ export function createChatSSE(request: ChatRequest) {
           const lines = buffer.split('\n')
           buffer = lines.pop() || '' // 保留不完整的行
           
-          let currentEvent = ''
-          const dataLines: string[] = []
-          
           for (const line of lines) {
             if (line.startsWith('event: ')) {
               // 如果有待处理的事件，先处理它
               if (currentEvent && dataLines.length > 0) {
-                processEvent(currentEvent, dataLines.join('\n'), handlers)
+                processEvent(currentEvent, dataLines.join('\n'), handlers, wire)
               }
               currentEvent = line.slice(7).trim()
               dataLines.length = 0
@@ -216,7 +353,7 @@ export function createChatSSE(request: ChatRequest) {
               dataLines.push(line.slice(6))
             } else if (line === '' && currentEvent && dataLines.length > 0) {
               // 空行表示事件结束
-              processEvent(currentEvent, dataLines.join('\n'), handlers)
+              processEvent(currentEvent, dataLines.join('\n'), handlers, wire)
               currentEvent = ''
               dataLines.length = 0
             }
@@ -249,10 +386,14 @@ function processEvent(
     onText?: (text: string) => void
     onSql?: (sql: string) => void
     onData?: (data: SSEDataPayload) => void
+    onDataHeader?: (header: SSEDataHeaderPayload) => void
+    onDataChunk?: (chunk: SSEDataChunkPayload) => void
+    onDataEnd?: (end: SSEDataEndPayload) => void
     onChart?: (config: SSEChartPayload) => void
     onError?: (error: string) => void
     onDone?: () => void
-  }
+  },
+  wire: WireState
 ) {
   try {
     switch (event) {
@@ -268,15 +409,53 @@ function processEvent(
         handlers.onSql?.(data)
         break
         
-      case 'data':
-        const dataPayload = JSON.parse(data) as SSEDataPayload
-        handlers.onData?.(dataPayload)
+      case 'data': {
+        const dataPayload = JSON.parse(data)
+        handlers.onData?.(
+          dataPayload.format === 'columnar'
+            ? decodeData(dataPayload as ColumnarDataPayload, wire)
+            : dataPayload as SSEDataPayload
+        )
         break
+      }
         
-      case 'chart':
-        const chartPayload = JSON.parse(data) as SSEChartPayload
-        handlers.onChart?.(chartPayload)
+      case 'data_header': {
+        const header = JSON.parse(data)
+        // columnar 编码：新结果开始，重置字典并记录数据编号
+        wire.dicts = null
+        wire.streamId = header.format === 'columnar' ? header.id : null
+        handlers.onDataHeader?.(header as SSEDataHeaderPayload)
+        break
+      }
+        
+      case 'data_chunk': {
+        const chunk = JSON.parse(data)
+        if (wire.streamId !== null) {
+          const columns = decodeColumns(chunk as ColumnarChunk, wire)
+          // 图表只引用首块数据
+          if (!wire.sources.has(wire.streamId)) {
+            wire.sources.set(wire.streamId, columns)
+          }
+          handlers.onDataChunk?.({ seq: chunk.seq, rows: columnsToRows(columns) })
+        } else {
+          handlers.onDataChunk?.(chunk as SSEDataChunkPayload)
+        }
         break
+      }
+        
+      case 'data_end':
+        handlers.onDataEnd?.(JSON.parse(data) as SSEDataEndPayload)
+        break
+        
+      case 'chart': {
+        const chartPayload = JSON.parse(data)
+        handlers.onChart?.(
+          chartPayload.source !== undefined
+            ? decodeChart(chartPayload as ChartReferencePayload, wire)
+            : chartPayload as SSEChartPayload
+        )
+        break
+      }
         
       case 'error':
         handlers.onError?.(data)
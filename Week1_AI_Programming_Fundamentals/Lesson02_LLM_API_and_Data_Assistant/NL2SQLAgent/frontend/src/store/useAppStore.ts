@@ -14,6 +14,7 @@ interface AppState {
   
   // 消息状态
   messages: Message[]
+  earlierCursor: string | null  // 更早消息的分页游标，为空表示已加载全部历史
   isStreaming: boolean
   currentSql: string | null
   
@@ -31,7 +32,8 @@ interface AppState {
   updateSessionTitle: (id: string, title: string) => void
   
   // 消息操作
-  setMessages: (messages: Message[]) => void
+  setMessages: (messages: Message[], earlierCursor?: string | null) => void
+  prependMessages: (messages: Message[], earlierCursor: string | null) => void
   addMessage: (message: Omit<Message, 'id' | 'created_at'>) => void
   addMessageFromServer: (message: Message) => void
   updateLastMessage: (content: string) => void
@@ -52,6 +54,7 @@ export const useAppStore = create<AppState>((set, get) => ({
   sessions: [],
   currentSessionId: null,
   messages: [],
+  earlierCursor: null,
   isStreaming: false,
   currentSql: null,
   chartConfig: null,
@@ -81,6 +84,7 @@ export const useAppStore = create<AppState>((set, get) => ({
       sessions: [newSession, ...state.sessions],
       currentSessionId: newSession.id,
       messages: [],
+      earlierCursor: null,
       chartConfig: null,
       tableData: null,
       currentSql: null,
@@ -92,6 +96,7 @@ export const useAppStore = create<AppState>((set, get) => ({
     set({
       currentSessionId: id,
       messages: [],
+      earlierCursor: null,
       chartConfig: null,
       tableData: null,
       currentSql: null,
@@ -108,6 +113,7 @@ export const useAppStore = create<AppState>((set, get) => ({
         sessions: newSessions,
         currentSessionId: newCurrentId,
         messages: state.currentSessionId === id ? [] : state.messages,
+        earlierCursor: state.currentSessionId === id ? null : state.earlierCursor,
       }
     })
   },
@@ -121,8 +127,15 @@ export const useAppStore = create<AppState>((set, get) => ({
   },
   
   // 消息操作
-  setMessages: (messages: Message[]) => {
-    set({ messages })
+  setMessages: (messages: Message[], earlierCursor: string | null = null) => {
+    set({ messages, earlierCursor })
+  },
+  
+  prependMessages: (messages: Message[], earlierCursor: string | null) => {
+    set((state) => ({
+      messages: [...messages, ...state.messages],
+      earlierCursor,
+    }))
   },
   
   addMessage: (message) => {
@@ -184,7 +197,7 @@ export const useAppStore = create<AppState>((set, get) => ({
   },
   
   clearMessages: () => {
-    set({ messages: [], chartConfig: null, tableData: null, currentSql: null })
+    set({ messages: [], earlierCursor: null, chartConfig: null, tableData: null, currentSql: null })
   },
   
   setStreaming: (streaming: boolean) => {
@@ -30,17 +30,20 @@ export interface ChartConfig {
 // 表格数据类型
 export interface TableData {
   columns: string[]
-  rows: Array<{ name: string; value: number | string }>
-  raw?: Array<Array<string | number>>
+  rows: Array<{ name: string; value: number | string | Array<string | number | null> }>
+  raw?: Array<Array<string | number | null>>
+  row_count?: number
+  truncated?: boolean
+  streaming?: boolean
 }
 
 // SSE 事件类型
-export type SSEEventType = 'thinking' | 'text' | 'sql' | 'data' | 'chart' | 'error' | 'done'
+export type SSEEventType = 'thinking' | 'text' | 'sql' | 'data' | 'data_header' | 'data_chunk' | 'data_end' | 'chart' | 'error' | 'done'
 
 // SSE 数据响应
 export interface SSEDataResponse {
   columns: string[]
-  rows: Array<{ name: string; value: number | string }>
+  rows: Array<{ name: string; value: number | string | Array<string | number | null> }>
   raw: Array<Array<string | number>>
 }
 